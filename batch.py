@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import argparse
+import csv
+from concurrent.futures import as_completed
+
+from src.batch import plan_workers, create_pool, render_job
+
+def build_jobs(manifest, output_root, threads_per_worker):
+    """
+    Expands a manifest into per-run jobs. Each run may set layout, seed, title,
+    frames and overrides; anything missing comes from the manifest's "defaults".
+    """
+    defaults = manifest.get('defaults', {})
+    jobs = []
+    for index, run in enumerate(manifest['runs']):
+        job = {**defaults, **run}
+        job['overrides'] = {**defaults.get('overrides', {}), **run.get('overrides', {})}
+        job.setdefault('name', f"run_{index:03d}")
+        job.setdefault('config', 'config.json')
+        job.setdefault('layout', 'base_layouts.json')
+        job['output_dir'] = os.path.join(output_root, job['name'])
+        job['threads'] = threads_per_worker
+        jobs.append(job)
+    return jobs
+
+def write_profile_csv(results, path):
+    """One row per (run, stage) from the runs rendered with run_settings.profile enabled."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['run', 'stage', 'p50_ms', 'p95_ms', 'max_ms', 'mean_ms', 'count'])
+        for result in results:
+            for stage, s in sorted(result.get('profile', {}).items()):
+                writer.writerow([result['name'], stage, s['p50'], s['p95'], s['max'], s['mean'], s['count']])
+
+def run_batch(args):
+    with open(args.manifest, 'r') as f: manifest = json.load(f)
+    output_root = args.output or manifest.get('output_dir') or os.path.join("output", f"batch_{int(time.time())}")
+    workers, threads_per_worker = plan_workers(args.workers or manifest.get('workers'), args.threads_per_worker)
+    jobs = build_jobs(manifest, output_root, threads_per_worker)
+    if args.encoder:
+        for job in jobs: job.update(encoder=args.encoder)
+    os.makedirs(output_root, exist_ok=True)
+
+    print(f"Rendering {len(jobs)} runs on {workers} workers x {threads_per_worker} threads into {output_root}")
+    start = time.perf_counter()
+    results = []
+    with create_pool(workers, threads_per_worker) as pool:
+        futures = {pool.submit(render_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            summary = future.result()
+            results.append(summary)
+            if 'error' in summary: print(f"[{summary['name']}] FAILED: {summary['error']}")
+            else: print(f"[{summary['name']}] winner={summary['winner']} kills={summary['kill_counts']} {summary['render_fps']:.1f} fps")
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda r: r['name'])
+    total_frames = sum(r.get('frames', 0) for r in results)
+    batch_summary = {'workers': workers, 'threads_per_worker': threads_per_worker, 'wall_seconds': elapsed,
+                     'total_frames': total_frames, 'aggregate_fps': total_frames / elapsed if elapsed > 0 else 0.0, 'runs': results}
+    with open(os.path.join(output_root, "batch_summary.json"), 'w') as f: json.dump(batch_summary, f, indent=4)
+    if any('profile' in r for r in results): write_profile_csv(results, os.path.join(output_root, "batch_profile.csv"))
+    print(f"Batch complete: {len(results)} runs, {total_frames} frames in {elapsed:.1f}s ({batch_summary['aggregate_fps']:.1f} fps aggregate)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render many ChromaPlasm videos in parallel from a manifest.")
+    parser.add_argument('manifest', help="JSON manifest: {\"defaults\": {...}, \"runs\": [{\"name\", \"layout\", \"seed\", \"title\", \"overrides\"}, ...]}")
+    parser.add_argument('--workers', type=int, default=None, help="Processes to run at once (defaults to one per core).")
+    parser.add_argument('--threads-per-worker', type=int, default=None, help="Numba/encoder threads per process (defaults to cores / workers).")
+    parser.add_argument('--output', default=None, help="Output root directory.")
+    parser.add_argument('--encoder', choices=['auto', 'ffmpeg', 'jpeg'], default=None)
+    run_batch(parser.parse_args())
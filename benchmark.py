@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+from src.batch import plan_workers, create_pool
+from src.benchmark import run_case, environment_info, compare
+
+def build_cases(args):
+    cases = []
+    for area in args.area:
+        for worlds in args.worlds:
+            for teams in args.teams:
+                for agents in args.agents:
+                    # The default arena and single worlds keep the plain names so older baselines still compare
+                    name = f"teams{teams}_agents{agents}{f'_area{area:g}' if area != 1 else ''}{f'_worlds{worlds}' if worlds > 1 else ''}{'_render' if args.render else ''}"
+                    cases.append({'name': name, 'teams': teams, 'agents': agents, 'area': area, 'worlds': worlds,
+                                  'seed': args.seed, 'frames': args.frames, 'warmup': args.warmup, 'render': args.render and worlds == 1, 'config': args.config})
+    return cases
+
+def run_benchmarks(args):
+    _, threads = plan_workers(1, args.threads)
+    results = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment_info(), 'threads': threads, 'cases': []}
+    # One fresh process per case (run one at a time) so compile time and peak RSS are not shared between cases
+    for case in build_cases(args):
+        with create_pool(1, threads) as pool: result = pool.submit(run_case, case).result()
+        results['cases'].append(result)
+        print(f"{result['name']:<28} {result['fps']:8.1f} fps  {result['agents_per_second'] / 1e6:7.2f} M agents/s  "
+              f"first step {result['first_step_seconds']:6.2f}s  peak RSS {result['peak_rss_mb']:7.1f} MB", flush=True)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f: json.dump(results, f, indent=4)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for message in regressions: print(f"  {message}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the simulation (and optionally rendering) hot paths with fixed seeds.")
+    parser.add_argument('--teams', type=int, nargs='+', default=[2, 4, 10], help="Team counts (bases on a ring layout).")
+    parser.add_argument('--agents', type=int, nargs='+', default=[1000, 10000, 100000], help="Initial agent counts.")
+    parser.add_argument('--area', type=float, nargs='+', default=[1], help="Arena areas as multiples of the default 540x720 arena (e.g. 1 2 4 8).")
+    parser.add_argument('--worlds', type=int, nargs='+', default=[1], help="Worlds per case; above 1, a WorldBatch steps them all in one kernel call (e.g. 1 256).")
+    parser.add_argument('--frames', type=int, default=100, help="Measured frames per case.")
+    parser.add_argument('--warmup', type=int, default=20, help="Frames run after the first (compiling) step before measuring.")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--render', action='store_true', help="Also compose a video frame per step.")
+    parser.add_argument('--threads', type=int, default=None, help="Numba threads (defaults to all cores).")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--output', default=os.path.join("output", "benchmarks", "latest.json"))
+    parser.add_argument('--baseline', default=None, help="Earlier results JSON to compare against; exits 1 on regression.")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Allowed fractional slowdown before a case counts as a regression.")
+    run_benchmarks(parser.parse_args())
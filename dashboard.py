@@ -1,3 +1,5 @@
+import time
+_IMPORT_START = time.perf_counter()
 import pygame
 import pygame_gui
 import sys
@@ -8,17 +10,33 @@ import shutil
 from types import SimpleNamespace
 import numpy as np
 from src.constants import *
-from src.simulation import Simulation
+from src.simulation import Simulation, start_kernel_compile, warm_up_kernels, STAT_AGENTS, STAT_ARMOR
 from src.vfx import VFXManager
 from src.audio_manager import AudioManager
 from src.live_renderer import LiveRenderer
 from src.viewport import Viewport
-from src.video_utils import render_simulation_to_frames, assemble_video, cleanup_frames
+from src.profiler import PROFILER
+from src.metrics import TEAM_METRICS
+from src.columnar import default_extension
+from src.pheromone import pheromone_precision
+from src.scheduler import FrameGovernor
+from src.sim_process import SimulationProcess, SimulationView
+from src.video_utils import render_simulation_to_frames, assemble_video, cleanup_frames, mux_audio, FFmpegPipeSink, checkpoint_path, checkpoint_frames
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
+# What F5 cycles the metrics sparkline through (None hides it), and how many recent frames it spans
+SPARKLINE_METRICS = ('agents', 'armor', 'kills', 'combat_initiated', 'pheromone_mass', 'frame_ms', None)
+SPARKLINE_RECORDS = 600
 
 class Dashboard:
     def __init__(self):
+        init_start = time.perf_counter()
+        self.startup_timings = {'imports': _IMPORT_SECONDS}
         with open('config.json', 'r') as f: config_data = json.load(f)
-        self.config = SimpleNamespace(**config_data['run_settings'], **config_data['engine_settings'], **config_data['spawning_settings'], **config_data['camera_settings'])
+        # Compile/load the Numba kernel while the window and UI are built
+        self.warmup_thread, self.kernel_warmup = start_kernel_compile(pheromone_precision(SimpleNamespace(**config_data['engine_settings'])))
+
+        self.config = SimpleNamespace(**config_data['run_settings'], **config_data['engine_settings'], **config_data['spawning_settings'], **config_data['camera_settings'], **config_data.get('narrative_cues', {}))
         self.presentation_params = SimpleNamespace(**config_data['presentation_settings'])
         
         pygame.init()
@@ -31,6 +49,9 @@ class Dashboard:
         self.is_paused = False
         self.sim_speed = 1
         self.speed_options = [1, 2, 4, 8]
+        self.target_fps = getattr(self.config, 'dashboard_fps', 60)
+        # Runs up to sim_speed steps per displayed frame, as many as fit in the frame budget
+        self.governor = FrameGovernor(self.target_fps, shed_load=getattr(self.config, 'governor_shed_load', False))
         self.show_pheromones = True
         self.shorts_title_text = self.presentation_params.question_text
         
@@ -50,14 +71,24 @@ class Dashboard:
         self.viewport = Viewport(pygame.Rect(0, 0, 1, 1))
         self.ui_elements = {'global': {}, 'selection': {}, 'alliance': {}, 'presentation': {}}
         self.alliance_map = list(range(len(TEAMS)))
+        self.checkpoint_dir = os.path.join("output", "checkpoints")
+        self.profile_font = None
+        self.sparkline_index = 0
+        self.stats_labels = {}; self._stats_team_ids = None
+        self.stats_refresh_seconds = 0.25; self._stats_next_refresh = 0.0
         
         self.audio_manager = AudioManager(self.config)
         self.vfx_manager = VFXManager(self.audio_manager)
         self.simulation = Simulation(self.config, self.vfx_manager, self.audio_manager)
+        self.viewport.set_world(self.simulation.grid_size)
         self.renderer = LiveRenderer(self.presentation_params)
+        # With run_settings.dashboard_sim_process a child process steps the simulation while playing; sim_view draws its frames
+        self.sim_process, self.sim_view = None, None
+        self.is_recording = False
         
         self.build_ui_layout()
         self._refresh_dynamic_panels()
+        self.startup_timings['ui_build'] = time.perf_counter() - init_start
         print("Dashboard initialized.")
 
     def _create_parameter_row(self, parent, y_offset, name, value_range, current_value, is_int=False):
@@ -79,7 +110,11 @@ class Dashboard:
         self.toggle_pheromones_button = pygame_gui.elements.UIButton(relative_rect=pygame.Rect(280, 10, 180, 30), text='Pheromones: ON', manager=self.ui_manager, container=self.bottom_panel)
         self.toggle_editor_button = pygame_gui.elements.UIButton(relative_rect=pygame.Rect(280, 40, 180, 30), text='Enter Editor', manager=self.ui_manager, container=self.bottom_panel)
         self.record_button = pygame_gui.elements.UIButton(relative_rect=pygame.Rect(470, 10, 120, 60), text='Record', manager=self.ui_manager, container=self.bottom_panel, object_id='#record_button')
-        self.stats_container = pygame_gui.elements.UIPanel(relative_rect=pygame.Rect(600, 10, 710, 60), manager=self.ui_manager, container=self.bottom_panel)
+        self.save_checkpoint_button = pygame_gui.elements.UIButton(relative_rect=pygame.Rect(600, 10, 120, 30), text='Save Checkpoint', manager=self.ui_manager, container=self.bottom_panel)
+        self.checkpoint_dropdown = None
+        self._refresh_checkpoint_dropdown()
+        self.stats_container = pygame_gui.elements.UIPanel(relative_rect=pygame.Rect(730, 10, 710, 60), manager=self.ui_manager, container=self.bottom_panel)
+        self._stats_team_ids = None # Labels are (re)built on the next stats refresh
 
         self.sim_ui_group = pygame_gui.elements.UIPanel(relative_rect=pygame.Rect(10, 10, content_width, -1), manager=self.ui_manager, container=self.right_panel)
         self.editor_ui_group = pygame_gui.elements.UIPanel(relative_rect=pygame.Rect(10, 10, content_width, 270), manager=self.ui_manager, container=self.right_panel)
@@ -147,7 +182,8 @@ class Dashboard:
         self.selection_panel.set_relative_position((10, self.sim_ui_group.relative_rect.bottom + 10))
 
     def _update_simulation_alliances(self):
-        self.simulation.alliance_map = np.array(self.alliance_map, dtype=np.int32)
+        self.simulation.set_alliance_map(self.alliance_map)
+        if self.sim_process is not None: self.sim_process.send('alliances', list(self.alliance_map))
         
     def _update_alliance_dropdowns(self):
         alliance_group_options = [f"Group {i+1}" for i in range(len(TEAMS))]
@@ -162,12 +198,14 @@ class Dashboard:
             else: self.current_mode = 'SIMULATION'
         if self.current_mode == 'EDITOR':
             self.is_paused = True
+            self._sync_sim_process() # The editor works on the dashboard's own Simulation
             self.play_pause_button.disable()
             self.toggle_editor_button.set_text('Exit Editor')
             self.sim_ui_group.hide()
             self.editor_ui_group.show()
             self.selection_panel.set_relative_position((10, 290))
         else:
+            self.simulation.recount_team_stats() # Bases may have been added, moved or resized
             self.play_pause_button.enable()
             self.toggle_editor_button.set_text('Enter Editor')
             self.sim_ui_group.show()
@@ -238,10 +276,16 @@ class Dashboard:
             create_entry('units_per_spawn', self.simulation.get_param(base.team_id, 'units_per_spawn'), y_offset)
 
     def handle_events(self):
-        time_delta = self.clock.tick(60) / 1000.0
+        t = PROFILER.start()
+        time_delta = self.clock.tick(self.target_fps) / 1000.0
+        t = PROFILER.lap('ui.frame_cap_wait', t)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.is_running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3: self.toggle_profiler()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and PROFILER.enabled: self.export_profile()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F5: self.sparkline_index = (self.sparkline_index + 1) % len(SPARKLINE_METRICS)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F6: self.export_metrics()
             
             ui_consumed_event = self.ui_manager.process_events(event)
 
@@ -252,6 +296,7 @@ class Dashboard:
                 elif event.ui_element == self.toggle_pheromones_button: self.toggle_pheromone_display()
                 elif event.ui_element == self.toggle_editor_button: self.toggle_editor_mode()
                 elif event.ui_element == self.record_button: self.render_video()
+                elif event.ui_element == self.save_checkpoint_button: self.save_checkpoint()
                 elif event.ui_element == self.save_layout_button: self.save_layout_to_file()
                 elif event.ui_element == self.editor_add_base_button:
                     new_base = self.simulation.add_new_base()
@@ -296,6 +341,9 @@ class Dashboard:
                     self.handle_text_entry(event.ui_element)
 
             if event.type == pygame_gui.UI_DROP_DOWN_MENU_CHANGED:
+                if event.ui_element == self.checkpoint_dropdown:
+                    self.load_checkpoint(event.text)
+                    continue
                 is_alliance_dropdown = False
                 for team_id in range(len(TEAMS)):
                     if event.ui_element == self.ui_elements['alliance'].get(f'team_{team_id}_dropdown'):
@@ -308,6 +356,7 @@ class Dashboard:
                         self.selected_object.update_attributes(team_name=event.text)
                     if event.ui_element == self.ui_elements['selection'].get('shape_dropdown'):
                         self.selected_object.update_attributes(shape_name=event.text)
+                    self.simulation.recount_team_stats()
                     self.update_selection_panel()
 
             if not ui_consumed_event:
@@ -319,34 +368,122 @@ class Dashboard:
                         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                             grid_pos = self.viewport.get_grid_pos(event.pos)
                             self.select_object_at(grid_pos[0], grid_pos[1]) if grid_pos else self.select_object_at(None, None)
+        PROFILER.lap('ui.events', t)
         return time_delta
 
+    def finish_startup(self):
+        """Waits for the background kernel warm-up, renders the first frame and prints the startup timing report."""
+        start = time.perf_counter()
+        self.warmup_thread.join()
+        warm_up_kernels(pheromone_precision(self.config)) # Already compiled; only the tiny first call remains
+        self.startup_timings['warmup_wait'] = time.perf_counter() - start
+        if getattr(self.config, 'dashboard_sim_process', False): # Started once the kernel cache is warm
+            self.sim_process = SimulationProcess(self.config, self.simulation.grid_size, self.simulation.max_agents, self.simulation.layout_path)
+        start = time.perf_counter()
+        self.update_layout()
+        self.renderer.draw(self.screen, self.simulation, self.vfx_manager, self.viewport, self.show_pheromones, title_text=self.shorts_title_text)
+        pygame.display.flip()
+        self.startup_timings['first_frame'] = time.perf_counter() - start
+        warmup = self.kernel_warmup
+        print("--- Startup ---")
+        for name, seconds in self.startup_timings.items(): print(f"{name:<12} {seconds * 1000:8.1f} ms")
+        if warmup:
+            cache_state = 'cache hit' if warmup['cache_hits'] else 'compiled, cache written'
+            print(f"kernel       {warmup['compile_seconds'] * 1000:8.1f} ms in background ({cache_state})")
+
     def run(self):
+        self.finish_startup()
         while self.is_running:
             time_delta = self.handle_events()
+            frame_start = t = PROFILER.start()
             self.ui_manager.update(time_delta)
+            t = PROFILER.lap('ui.update', t)
             self.vfx_manager.update_effects()
-
-            if not self.is_paused:
-                for _ in range(self.sim_speed):
-                    self.simulation.step(self.frame_count)
+            t = PROFILER.lap('vfx.update', t)
+
+            work_start = time.perf_counter(); sim_seconds = 0.0; steps = 0
+            if self.sim_process is not None:
+                # The child steps on its own; draw the latest frame it completed, if there is a new one
+                self._sync_sim_process()
+                arrays = self.sim_process.acquire() if self.sim_process.running else None
+                if arrays is not None:
+                    self.sim_view.update(arrays, colourise=self.show_pheromones)
+                    self.frame_count = self.sim_view.frame_count + 1
+                t = PROFILER.lap('sim.total', t)
+            elif not self.is_paused:
+                # Only the last substep is displayed, so earlier ones skip cosmetic stages (pheromone colourisation)
+                steps = self.governor.plan(self.sim_speed)
+                for substep in range(steps):
+                    step_start = time.perf_counter()
+                    self.simulation.step(self.frame_count, render=self.show_pheromones and substep == steps - 1)
+                    step_seconds = time.perf_counter() - step_start
+                    self.governor.record_step(step_seconds); sim_seconds += step_seconds
                     self.frame_count += 1
+                    t = PROFILER.lap('sim.total', t)
             
             if self.current_mode == 'EDITOR':
-                self.simulation.render_grid.fill(EMPTY)
-                self.simulation.draw_bases_to_grid()
+                self.simulation.rebuild_terrain()
 
             self.update_layout()
             self.update_stats_panel()
+            t = PROFILER.lap('ui.stats', t)
             
             self.screen.fill((25, 25, 35))
-            self.renderer.draw(self.screen, self.simulation, self.vfx_manager, self.viewport, self.show_pheromones, self.selected_object, self.is_editing_spawns, self.shorts_title_text)
+            self.renderer.draw(self.screen, self.display_simulation, self.vfx_manager, self.viewport, self.show_pheromones, self.selected_object, self.is_editing_spawns, self.shorts_title_text)
+            t = PROFILER.lap('render.total', t)
             self.ui_manager.draw_ui(self.screen)
+            self.draw_sparkline()
+            if PROFILER.enabled: self.draw_profile_overlay()
+            t = PROFILER.lap('ui.draw', t)
             pygame.display.flip()
+            PROFILER.lap('display.flip', t)
+            PROFILER.lap('frame.total', frame_start)
+            self.governor.end_frame(self.sim_speed, time.perf_counter() - work_start, sim_seconds, steps, self.simulation.scheduler)
         
+        if self.sim_process is not None: self.sim_process.close()
         pygame.quit()
         sys.exit()
 
+    @property
+    def display_simulation(self):
+        """What is drawn: the child's latest frame while it runs, otherwise the dashboard's own Simulation."""
+        return self.sim_view if self.sim_view is not None else self.simulation
+
+    def _sync_sim_process(self):
+        """Starts the child simulation process from the dashboard's state when playing, and stops it otherwise."""
+        if self.sim_process is None: return
+        if not self.sim_process.alive: # Fall back to stepping in this process
+            print(f"ERROR: simulation process exited (code {self.sim_process.process.exitcode}); stepping in the dashboard instead.")
+            # Rewind to the last pushed state: what the child stepped since is lost, and the view has edited the bases
+            next_frame = self.sim_process.restore_pushed(self.simulation)
+            if next_frame is not None:
+                self.frame_count = next_frame; self.selected_object = None
+                self.renderer.clear_trails()
+                self.alliance_map = [int(group) for group in self.simulation.alliance_map]
+                self._refresh_dynamic_panels(); self.update_selection_panel()
+            self.sim_process.close(); self.sim_process, self.sim_view = None, None
+            return
+        wanted = not self.is_paused and self.current_mode == 'SIMULATION' and not self.is_recording
+        if wanted and not self.sim_process.running:
+            self.sim_process.push_state(self.simulation, self.frame_count)
+            self.sim_view = SimulationView(self.simulation, self.vfx_manager)
+            self.sim_process.run(self.sim_speed * self.target_fps)
+        elif not wanted and self.sim_process.running:
+            self._stop_sim_process()
+
+    def _stop_sim_process(self, pull=True):
+        """Pauses the child; with pull, the dashboard's Simulation takes over the state the child reached."""
+        if self.sim_process is None: return
+        if not pull: self.sim_process.pushed = None # The caller replaces the dashboard's state itself
+        if not self.sim_process.running: return
+        self.sim_process.pause(); self.sim_view = None
+        if not pull: return
+        selected_index = self.simulation.bases.index(self.selected_object) if self.selected_object in self.simulation.bases else None
+        next_frame = self.sim_process.pull_state(self.simulation)
+        if next_frame is not None: self.frame_count = next_frame
+        # load_checkpoint rebuilt the bases, so keep the same base selected
+        self.selected_object = self.simulation.bases[selected_index] if selected_index is not None else None
+
     def render_video(self):
         self.is_recording = True
         self.record_button.set_text("Preparing...")
@@ -355,20 +492,26 @@ class Dashboard:
         output_folder = os.path.join("output", "frames")
         audio_path = os.path.join("output", "final_audio.wav")
         video_path = os.path.join("output", "final_video.mp4")
+        silent_video_path = os.path.join("output", "final_video_noaudio.mp4")
         
         cleanup_frames(output_folder)
         os.makedirs(output_folder, exist_ok=True)
 
         self.reset_simulation()
         
-        render_duration_frames = 4000
+        render_duration_frames = getattr(self.config, 'record_frames', 4000)
         fps = self.config.fps
 
-        # Call the new utility function to handle the render loop
-        render_completed = render_simulation_to_frames(self, output_folder, render_duration_frames, fps)
+        # Stream frames straight into FFmpeg when it is available, otherwise fall back to a JPEG sequence
+        use_pipe = FFmpegPipeSink.is_available()
+        sink = FFmpegPipeSink(silent_video_path, (VIDEO_WIDTH, VIDEO_HEIGHT), fps) if use_pipe else None
+        render_completed = render_simulation_to_frames(self, output_folder, render_duration_frames, fps, sink=sink,
+                                                       checkpoint_dir=self.checkpoint_dir, checkpoint_interval=getattr(self.config, 'checkpoint_interval', 0))
+        self._refresh_checkpoint_dropdown()
 
         if not render_completed:
             cleanup_frames(output_folder)
+            if use_pipe and os.path.exists(silent_video_path): os.remove(silent_video_path)
             self.record_button.set_text("Record")
             print("Recording cancelled.")
             self.is_recording = False
@@ -382,13 +525,91 @@ class Dashboard:
         print("Compiling video with FFmpeg...")
         self.record_button.set_text("Encoding...")
         
-        assemble_video(output_folder, audio_path, video_path, fps)
+        muxed = True
+        if use_pipe:
+            muxed = mux_audio(silent_video_path, audio_path, video_path)
+            if muxed: os.remove(silent_video_path)
+            else: print(f"Adding audio failed; the video without audio is kept at {silent_video_path}")
+        else:
+            assemble_video(output_folder, audio_path, video_path, fps)
         cleanup_frames(output_folder)
         
-        self.record_button.set_text("Record")
+        self.record_button.set_text("Record" if muxed else "Mux Failed")
         self.is_recording = False
 
 
+    def _refresh_checkpoint_dropdown(self):
+        if self.checkpoint_dropdown is not None: self.checkpoint_dropdown.kill()
+        options = [f"Frame {frame_num}" for frame_num in checkpoint_frames(self.checkpoint_dir)] or ['No Checkpoints']
+        self.checkpoint_dropdown = pygame_gui.elements.UIDropDownMenu(options_list=options, starting_option=options[-1], relative_rect=pygame.Rect(600, 40, 120, 30), manager=self.ui_manager, container=self.bottom_panel)
+
+    def save_checkpoint(self):
+        self._stop_sim_process() # Resumes from the saved state on the next frame
+        self.simulation.save_checkpoint(checkpoint_path(self.checkpoint_dir, self.frame_count), self.frame_count)
+        print(f"Checkpoint saved at frame {self.frame_count}.")
+        self._refresh_checkpoint_dropdown()
+
+    def load_checkpoint(self, option_text):
+        if not option_text.startswith('Frame '): return
+        path = checkpoint_path(self.checkpoint_dir, int(option_text.split(' ')[1]))
+        self._stop_sim_process(pull=False)
+        try: self.frame_count = self.simulation.load_checkpoint(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERROR loading checkpoint '{path}': {e}"); return
+        self.vfx_manager.particles.clear()
+        self.renderer.clear_trails()
+        self.selected_object = None
+        self.alliance_map = [int(group) for group in self.simulation.alliance_map]
+        self._refresh_dynamic_panels()
+        self.update_selection_panel()
+        print(f"Restored checkpoint at frame {self.frame_count}.")
+
+    def toggle_profiler(self):
+        PROFILER.set_enabled(not PROFILER.enabled)
+        if PROFILER.enabled: PROFILER.reset()
+        print(f"Profiler {'enabled (F4 exports)' if PROFILER.enabled else 'disabled'}.")
+
+    def export_profile(self):
+        os.makedirs("output", exist_ok=True)
+        for path in (os.path.join("output", "profile.csv"), os.path.join("output", "profile.json")): PROFILER.export(path)
+        print("Profile exported to output/profile.csv and output/profile.json.")
+
+    def export_metrics(self):
+        metrics = self.display_simulation.metrics
+        if metrics is None or not len(metrics): return
+        os.makedirs("output", exist_ok=True)
+        path = metrics.export(os.path.join("output", f"metrics{default_extension()}"), list(self._stats_team_ids or ()) or None)
+        print(f"Metrics exported to {path}.")
+
+    def draw_sparkline(self):
+        """Plots the last SPARKLINE_RECORDS frames of the selected metric, one line per team, straight from the simulation's metrics buffers."""
+        metrics, metric = self.display_simulation.metrics, SPARKLINE_METRICS[self.sparkline_index]
+        if metric is None or metrics is None or len(metrics) < 2: return
+        if self.profile_font is None: self.profile_font = pygame.font.SysFont('monospace', 14)
+        frames, frame_ms, values = metrics.window(SPARKLINE_RECORDS)
+        if metric == 'frame_ms': lines = [((220, 220, 230), frame_ms)]
+        else: lines = [(TEAMS[team_id]['color'], values[:, team_id, TEAM_METRICS.index(metric)]) for team_id in self._stats_team_ids or ()]
+        peak = max((float(series.max()) for _, series in lines), default=0.0)
+        width, height = 320, 60
+        x, y = self.viewport.rect.x + 10, self.viewport.rect.bottom - height - 34
+        title = self.profile_font.render(f"{metric.upper()} max {peak:.0f}, frames {frames[0]}-{frames[-1]}  F5 next, F6 export", True, (220, 220, 230))
+        backdrop = pygame.Surface((max(width, title.get_width()) + 10, height + 34), pygame.SRCALPHA); backdrop.fill((10, 10, 15, 200))
+        self.screen.blit(backdrop, (x - 5, y - 5))
+        self.screen.blit(title, (x, y))
+        xs = np.linspace(x, x + width, len(frames))
+        for color, series in lines:
+            ys = y + 24 + height - series * (height / peak if peak > 0 else 0.0)
+            pygame.draw.lines(self.screen, color, False, np.column_stack((xs, ys)).tolist())
+
+    def draw_profile_overlay(self):
+        if self.profile_font is None: self.profile_font = pygame.font.SysFont('monospace', 14)
+        lines = [f"STAGE TIMINGS (ms, last {PROFILER.window} samples)  F3 off, F4 export"] + PROFILER.report_lines()
+        x, y = self.viewport.rect.x + 10, self.viewport.rect.y + 10
+        backdrop = pygame.Surface((560, 18 * len(lines) + 10), pygame.SRCALPHA); backdrop.fill((10, 10, 15, 200))
+        self.screen.blit(backdrop, (x - 5, y - 5))
+        for line in lines:
+            self.screen.blit(self.profile_font.render(line, True, (220, 220, 230)), (x, y)); y += 18
+
     def select_object_at(self, world_y, world_x):
         clicked_object = self.simulation.get_base_at(world_y, world_x) if world_y is not None else None
         if self.selected_object != clicked_object:
@@ -397,17 +618,21 @@ class Dashboard:
             self.update_selection_panel()
             
     def reset_simulation(self):
+        self._stop_sim_process(pull=False)
         for base in self.simulation.bases:
             base.recalculate_geometry(final_calculation=True, regenerate_ports=False)
             base.last_damage_frame = -100 
         self.simulation.reset_dynamic_state()
+        self.governor.reset(self.simulation.scheduler) # Recordings start from the configured stage rates
         self.vfx_manager.particles.clear()
+        self.audio_manager.clear_sfx()
         if hasattr(self, 'renderer'):
             self.renderer.clear_trails()
         self.frame_count = 0
         if self.current_mode == 'SIMULATION':
             self.is_paused = False
             self.play_pause_button.set_text('PAUSE')
+        self._sync_sim_process()
         print("Simulation reset.")
 
     def update_layout(self):
@@ -432,12 +657,14 @@ class Dashboard:
             return
         self.is_paused = not self.is_paused
         self.play_pause_button.set_text('PLAY' if self.is_paused else 'PAUSE')
+        self._sync_sim_process()
 
     def cycle_speed(self):
         current_index = self.speed_options.index(self.sim_speed)
         next_index = (current_index + 1) % len(self.speed_options)
         self.sim_speed = self.speed_options[next_index]
         self.speed_button.set_text(f'{self.sim_speed}x')
+        if self.sim_process is not None and self.sim_process.running: self.sim_process.run(self.sim_speed * self.target_fps)
 
     def handle_slider_move(self, slider):
         slider_id = slider.object_ids[-1].replace('#', '').replace('_slider', '')
@@ -449,6 +676,7 @@ class Dashboard:
             if hasattr(self.config, slider_id):
                 setattr(self.config, slider_id, current_value)
                 self.simulation._compile_team_params()
+                if self.sim_process is not None: self.sim_process.send('config', {slider_id: current_value})
         elif slider_id in self.ui_elements['presentation']:
             param = self.ui_elements['presentation'][slider_id]
             if param['is_int']: param['label'].set_text(str(int(current_value)))
@@ -462,6 +690,7 @@ class Dashboard:
             param['label'].set_text(param['text_map'].get(size_val, "Custom"))
             self.selected_object.scale = new_scale
             self.selected_object.recalculate_geometry(final_calculation=False, regenerate_ports=False)
+            self.simulation.recount_team_stats()
 
     def handle_text_entry(self, entry_line):
         if not self.selected_object:
@@ -475,10 +704,12 @@ class Dashboard:
                     self.simulation.team_params_overrides[base.team_id] = {}
                 self.simulation.team_params_overrides[base.team_id][entry_id] = new_value
                 self.simulation._compile_team_params()
+                if self.sim_process is not None: self.sim_process.send('team_param', base.team_id, entry_id, new_value)
             elif entry_id in ['core_thickness', 'armor_thickness']:
                 new_value = max(1, int(float(entry_line.get_text())))
                 setattr(base, entry_id, new_value)
                 base.recalculate_geometry(final_calculation=False, regenerate_ports=False)
+                self.simulation.recount_team_stats()
         except (ValueError, TypeError):
             self.update_selection_panel()
 
@@ -486,30 +717,44 @@ class Dashboard:
         """Fills the trail surface with transparency, instantly clearing it."""
         self.trail_surface.fill((0, 0, 0, 0))
     
-    def update_stats_panel(self):
+    def _build_stats_labels(self, team_ids):
+        """Creates the stats panel's labels once per set of teams; update_stats_panel only changes their text."""
         for element in self.stats_container.get_container().elements[:]:
             element.kill()
-        active_teams = sorted(list(set(base.team_name for base in self.simulation.bases)))
-        if not active_teams: return
-        num_teams = len(active_teams)
+        self.stats_labels = {}; self._stats_team_ids = team_ids
         container_width = self.stats_container.get_container().get_rect().width
-        block_width = (container_width - (10 * (num_teams + 1))) / num_teams if num_teams > 0 else container_width - 20
-        x_offset = 10
-        for team_name in active_teams:
-            agent_count = self.simulation.get_team_agent_count(team_name)
-            base_health = self.simulation.get_team_base_health(team_name)
-            team_color_hex = '#ffffff'
-            for team_data in TEAMS:
-                if team_data['name'].lower() == team_name.lower():
-                    team_color_hex = '#%02x%02x%02x' % team_data['color']
-                    break
-            pygame_gui.elements.UILabel(relative_rect=pygame.Rect(x_offset, 0, block_width, 20), text=f'{team_name.upper()}', manager=self.ui_manager, container=self.stats_container, object_id=f'@{team_color_hex}')
-            pygame_gui.elements.UILabel(relative_rect=pygame.Rect(x_offset, 20, block_width, 20), text=f'Agents: {agent_count}', manager=self.ui_manager, container=self.stats_container)
-            pygame_gui.elements.UILabel(relative_rect=pygame.Rect(x_offset, 40, block_width, 20), text=f'Health: {base_health}', manager=self.ui_manager, container=self.stats_container)
-            x_offset += block_width + 10
+        block_width = (container_width - (10 * (len(team_ids) + 2))) / (len(team_ids) + 1)
+        def block(x_offset, key, title, object_id=None):
+            pygame_gui.elements.UILabel(relative_rect=pygame.Rect(x_offset, 0, block_width, 20), text=title, manager=self.ui_manager, container=self.stats_container, object_id=object_id)
+            for row, field in ((1, 'top'), (2, 'bottom')):
+                self.stats_labels[(key, field)] = pygame_gui.elements.UILabel(relative_rect=pygame.Rect(x_offset, 20 * row, block_width, 20), text='', manager=self.ui_manager, container=self.stats_container)
+        block(10, 'sim', 'SIM')
+        for i, team_id in enumerate(team_ids):
+            block(10 + (i + 1) * (block_width + 10), team_id, TEAMS[team_id]['name'].upper(), f"@{'#%02x%02x%02x' % TEAMS[team_id]['color']}")
+
+    def update_stats_panel(self, force=False):
+        """Refreshes the stats panel from Simulation.team_stats at most every stats_refresh_seconds."""
+        now = time.perf_counter()
+        if not force and now < self._stats_next_refresh: return
+        self._stats_next_refresh = now + self.stats_refresh_seconds
+        if self.current_mode == 'EDITOR': self.simulation.recount_team_stats() # Bases may have been added, moved or resized
+        team_ids = tuple(sorted({base.team_id for base in self.simulation.bases}, key=lambda team_id: TEAMS[team_id]['name']))
+        if team_ids != self._stats_team_ids: self._build_stats_labels(team_ids)
+        if not team_ids: return
+        # Effective simulation rate: the governor may run fewer substeps than the requested speed
+        sim_rate = 0.0 if self.is_paused else self.sim_process.sim_rate if self.sim_view is not None else self.governor.sim_rate
+        shed = f' shed {self.simulation.scheduler.shed_level}' if self.simulation.scheduler.shed_level else ''
+        texts = {('sim', 'top'): f'{sim_rate:.0f} steps/s', ('sim', 'bottom'): f'{sim_rate / self.target_fps:.1f}x of {self.sim_speed}x{shed}'}
+        stats = self.display_simulation.team_stats
+        for team_id in team_ids:
+            texts[(team_id, 'top')] = f'Agents: {stats[team_id, STAT_AGENTS]}'
+            texts[(team_id, 'bottom')] = f'Health: {stats[team_id, STAT_ARMOR]}'
+        for key, text in texts.items():
+            label = self.stats_labels[key]
+            if label.text != text: label.set_text(text)
 
     def save_layout_to_file(self):
-        layout_data = {"initial_layout": []}
+        layout_data = {"grid_size": list(self.simulation.grid_size), "initial_layout": []}
         for base in self.simulation.bases:
             base_config = {"team": base.team_name, "shape_name": base.shape_name, "pivot": list(base.pivot), "scale": base.scale, "core_thickness": base.core_thickness, "armor_thickness": base.armor_thickness, "exit_ports": [list(p) for p in base.exit_ports]}
             layout_data["initial_layout"].append(base_config)
@@ -612,6 +857,7 @@ class Dashboard:
             if self.drag_type == 'base' and self.dragged_object:
                 # NEW: Perform one final, high-quality update on mouse release
                 self.dragged_object.recalculate_geometry(final_calculation=True, regenerate_ports=False)
+                self.simulation.recount_team_stats()
             self.dragged_object, self.drag_type, self.selected_port_index = None, None, -1
 
 
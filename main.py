@@ -1,61 +1,34 @@
 import os
 import json
 import time
-from types import SimpleNamespace
-from tqdm import tqdm
+import argparse
 
-from src.constants import *
-from src.simulation import Simulation
-from src.renderer import Renderer
-from src.vfx import VFXManager
-from src.audio_manager import AudioManager
-from src.video_utils import assemble_video, cleanup_frames
+from src.headless import load_config, parse_override, render_headless, render_replay
 
-def run_simulation():
-    with open('config.json', 'r') as f:
-        config_data = json.load(f)
+def run_simulation(args):
+    config, presentation_params = load_config(args.config, dict(parse_override(o) for o in args.override))
+    video_id = f"{config.video_id_prefix}_{int(time.time())}"
+    run_output_dir = args.output or os.path.join("output", video_id)
 
-    config = SimpleNamespace(
-        **config_data['run_settings'],
-        **config_data['engine_settings'],
-        **config_data['spawning_settings'],
-        **config_data['camera_settings'],
-        **config_data['presentation_settings']
-    )
-
-    config.video_id = f"{config.video_id_prefix}_{int(time.time())}"
-
-
-    run_output_dir = os.path.join("output", config.video_id)
-    os.makedirs(run_output_dir, exist_ok=True)
-    frames_dir = os.path.join(run_output_dir, "frames")
-    output_audio_path = os.path.join(run_output_dir, f"audio_{config.video_id}.wav")
-    output_video_path = os.path.join(run_output_dir, f"video_{config.video_id}.mp4")
-
-    config.beat_drop_frame = config_data['narrative_cues']['beat_drop_frame']
-    
-    audio_manager = AudioManager(config)
-    vfx_manager = VFXManager(audio_manager)
-
-    sim = Simulation(config, vfx_manager, audio_manager)
-    renderer = Renderer(config, output_dir=frames_dir)
-
-
-    print(f"Generating {config.total_frames} frames for video '{config.video_id}'...")
+    print(f"Rendering video '{video_id}' headless...")
     print(f"Output will be saved in: {run_output_dir}")
-    for _ in tqdm(range(config.total_frames), desc="Rendering Frames"):
-        sim.step()
-        
-        vfx_manager.update_effects()
-        
-        viewbox = sim.get_viewbox()
-        renderer.render_frame(sim.render_grid, vfx_manager, viewbox=viewbox)
+    if args.replay:
+        summary = render_replay(args.replay, presentation_params, run_output_dir, title_text=args.title, encoder=args.encoder)
+    else:
+        summary = render_headless(config, presentation_params, run_output_dir, layout_path=args.layout, title_text=args.title, total_frames=args.frames, encoder=args.encoder)
 
-    print("\n--- Post-Production ---")
-    audio_manager.export_final_track(config.total_frames, config.fps, output_audio_path)
-    assemble_video(frames_dir, output_audio_path, output_video_path, config.fps)
-    cleanup_frames(frames_dir)
+    print("\n--- Summary ---")
+    print(json.dumps(summary, indent=4))
     print("\nProcess Complete.")
 
 if __name__ == '__main__':
-    run_simulation()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Render a ChromaPlasm match to video without opening a window.")
+    parser.add_argument('--config', default='config.json', help="Run configuration file.")
+    parser.add_argument('--layout', default='base_layouts.json', help="Base layout file.")
+    parser.add_argument('--title', default=None, help="Shorts title text (defaults to presentation_settings.question_text).")
+    parser.add_argument('--frames', type=int, default=None, help="Frames to render (defaults to run_settings.record_frames).")
+    parser.add_argument('--output', default=None, help="Output directory (defaults to output/<video_id>).")
+    parser.add_argument('--encoder', choices=['auto', 'ffmpeg', 'jpeg'], default='auto', help="Stream into FFmpeg, or write a JPEG sequence.")
+    parser.add_argument('--replay', default=None, metavar='DIR', help="Re-render a recorded replay instead of simulating (presentation overrides apply).")
+    parser.add_argument('--override', action='append', default=[], metavar='KEY=VALUE', help="Override any config value, e.g. --override combat_chance=0.4")
+    run_simulation(parser.parse_args())
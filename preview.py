@@ -0,0 +1,51 @@
+import os
+import json
+import time
+import argparse
+
+from src.headless import parse_override
+from src.batch import plan_workers, create_pool
+from src.preview import MAX_FIDELITY_LEVEL, preview_match, summarize_layout, rank_layouts
+
+def run_preview(args):
+    workers, threads_per_worker = plan_workers(args.workers, args.threads_per_worker)
+    overrides = dict(parse_override(o) for o in args.override)
+    if args.frames: overrides['total_frames'] = args.frames
+    jobs = [{'config': args.config, 'layout': layout, 'seed': seed, 'fidelity': args.fidelity, 'overrides': overrides}
+            for layout in args.layouts for seed in args.seeds]
+
+    print(f"Previewing {len(args.layouts)} layouts x {len(args.seeds)} seeds at fidelity level {args.fidelity} on {workers} workers x {threads_per_worker} threads")
+    start = time.perf_counter()
+    with create_pool(workers, threads_per_worker) as pool: results = list(pool.map(preview_match, jobs))
+    for result in results:
+        if 'error' in result: print(f"[{result['layout']} seed {result['seed']}] FAILED: {result['error']}")
+    elapsed = time.perf_counter() - start
+
+    summaries = rank_layouts([summarize_layout(layout, [r for r in results if r['layout'] == layout], args.early_fraction) for layout in args.layouts])
+    print(f"Preview complete: {len(results)} matches in {elapsed:.1f}s")
+    for s in summaries:
+        if not s['matches']: print(f"  {s['layout']}: every match failed"); continue
+        odds = ' '.join(f"{team}={p:.0%}" for team, p in s['win_probability'].items())
+        print(f"  {s['layout']}: {odds} draw={s['draw_probability']:.0%} | finish ~{s['expected_finish_seconds']:.0f}s "
+              f"(frames {s['finish_frame_p10']:.0f}-{s['finish_frame_p90']:.0f}), {s['elimination_share']:.0%} by elimination, {s['early_finish_share']:.0%} early | "
+              f"lead changes {s['mean_kill_lead_changes']:.1f} kills / {s['mean_armor_lead_changes']:.1f} armor")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'fidelity': args.fidelity, 'seeds': args.seeds, 'overrides': overrides, 'wall_seconds': elapsed, 'layouts': summaries, 'matches': results}, f, indent=4)
+        print(f"Written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate how candidate layouts play out by running them headless at reduced fidelity over several seeds.")
+    parser.add_argument('layouts', nargs='+', help="Layout JSON files to preview.")
+    parser.add_argument('--seeds', type=int, nargs='+', default=list(range(1, 9)), help="Seeds to play each layout with (default 1-8).")
+    parser.add_argument('--fidelity', type=int, default=2, choices=range(MAX_FIDELITY_LEVEL + 1),
+                        help="0 = full simulation; each level halves the pheromone resolution and the AI retarget and blur rates (default 2).")
+    parser.add_argument('--frames', type=int, default=None, help="Match length in frames (defaults to the config's total_frames).")
+    parser.add_argument('--early-fraction', type=float, default=0.5, help="Matches that finish before this share of the match count as early finishes.")
+    parser.add_argument('--config', default='config.json', help="Path to the config file.")
+    parser.add_argument('--override', action='append', default=[], metavar='KEY=VALUE', help="Override any config value, e.g. --override combat_chance=0.4")
+    parser.add_argument('--workers', type=int, default=None, help="Processes to run at once (defaults to one per core).")
+    parser.add_argument('--threads-per-worker', type=int, default=None, help="Numba threads per process (defaults to cores / workers).")
+    parser.add_argument('--output', default=None, help="Write the per-layout estimates and per-match metrics to this JSON file.")
+    run_preview(parser.parse_args())
@@ -1,162 +1,308 @@
 import numpy as np
-from pydub import AudioSegment
 import random
 import os
+import time
+import wave
+import json
+from src.cues import CueTimeline, load_cue_file, analyse_soundtrack
 
-# This explicit setting is robust and good to keep.
-try:
-    AudioSegment.converter = "ffmpeg"
-except FileNotFoundError:
-    print("!!! pydub could not find FFmpeg. Exporting audio will fail. !!!")
+SFX_NAMES = ('pop', 'boom', 'crack')
+
+class SFXBank:
+    """
+    Pre-rendered variants of each procedural effect. Variant i of an effect has a
+    fixed pitch offset and its own seeded noise, is rendered once on first use and
+    then reused, so synthesis cost no longer grows with the number of events.
+    Banks are shared between AudioManagers in the same process (see shared()).
+    """
+    _shared_banks = {}
+
+    def __init__(self, sample_rate=44100, variants=8, pitch_range=15.0, seed=0):
+        self.sample_rate, self.variants, self.pitch_range, self.seed = sample_rate, max(1, int(variants)), pitch_range, seed
+        self._variant_cache = {}
+        self._pitch_cache = {}
+        self._time_axes = {}
+        self._generators = {'pop': self._generate_pop, 'boom': self._generate_boom, 'crack': self._generate_crack}
+
+    @classmethod
+    def shared(cls, sample_rate=44100, variants=8, pitch_range=15.0, seed=0):
+        """Returns the process-wide bank for these settings, creating it on first use."""
+        key = (sample_rate, int(variants), pitch_range, seed)
+        if key not in cls._shared_banks: cls._shared_banks[key] = cls(sample_rate, variants, pitch_range, seed)
+        return cls._shared_banks[key]
+
+    def variant_pitch(self, variant):
+        """Variants are spread evenly across [-pitch_range, +pitch_range]."""
+        if self.variants == 1: return 0.0
+        return -self.pitch_range + 2 * self.pitch_range * variant / (self.variants - 1)
+
+    def get(self, sfx_name, variant):
+        """Samples for one pre-rendered variant (memoised)."""
+        key = (sfx_name, variant % self.variants)
+        sound = self._variant_cache.get(key)
+        if sound is None and sfx_name in self._generators:
+            rng = np.random.default_rng((self.seed, SFX_NAMES.index(sfx_name), key[1]))
+            sound = self._generators[sfx_name](self.variant_pitch(key[1]), rng)
+            self._variant_cache[key] = sound
+        return sound
+
+    def get_pitched(self, sfx_name, pitch_variation):
+        """Samples for an explicit pitch offset (the 'pitch_variation' SFX param), memoised to 0.1 Hz."""
+        key = (sfx_name, round(pitch_variation, 1))
+        sound = self._pitch_cache.get(key)
+        if sound is None and sfx_name in self._generators:
+            rng = np.random.default_rng((self.seed, SFX_NAMES.index(sfx_name), self.variants + len(self._pitch_cache)))
+            sound = self._generators[sfx_name](key[1], rng)
+            self._pitch_cache[key] = sound
+        return sound
+
+    def prerender(self):
+        """Renders every variant up front instead of lazily."""
+        for sfx_name in SFX_NAMES:
+            for variant in range(self.variants): self.get(sfx_name, variant)
+
+    def _time_axis(self, duration_s):
+        t = self._time_axes.get(duration_s)
+        if t is None:
+            t = np.linspace(0., duration_s, int(self.sample_rate * duration_s), endpoint=False)
+            self._time_axes[duration_s] = t
+        return t
+
+    def _generate_pop(self, pitch_variation, rng):
+        frequency = 500 + pitch_variation; duration_s = 0.08
+        t = self._time_axis(duration_s)
+        envelope = np.exp(-t * 60); tone = np.sin(2. * np.pi * frequency * t); noise = rng.uniform(-1, 1, len(t)) * 0.8
+        data = (tone * 0.2 + noise) * envelope
+        return (np.clip(data, -1, 1) * 0.4).astype(np.float32)
+
+    def _generate_boom(self, pitch_variation, rng):
+        frequency = 70 + pitch_variation; duration_s = 0.3
+        t = self._time_axis(duration_s)
+        envelope = np.exp(-t * 15); data = np.sin(2. * np.pi * frequency * t)
+        data += np.sin(2. * np.pi * (frequency * 1.5) * t) * 0.5; data *= envelope
+        return (np.clip(data, -1, 1) * 0.6).astype(np.float32)
+    
+    def _generate_crack(self, pitch_variation, rng):
+        """Generates a multi-layered, crunchy sound for armor hits."""
+        duration_s = 0.2
+        t = self._time_axis(duration_s)
+        
+        # 1. The initial "crack" - a sharp burst of noise
+        noise = rng.uniform(-1, 1, len(t))
+        crack_envelope = np.exp(-t * 200) # Very fast decay
+        crack_sound = noise * crack_envelope
+
+        # 2. The metallic "ring" - two detuned high-frequency sine waves
+        freq1 = 880 + pitch_variation
+        freq2 = freq1 * 1.505 # A slightly detuned musical fifth for a metallic sound
+        ring_tone = (np.sin(2. * np.pi * freq1 * t) * 0.5 + 
+                     np.sin(2. * np.pi * freq2 * t) * 0.5)
+        ring_envelope = np.exp(-t * 30) # Slower decay
+        ring_sound = ring_tone * ring_envelope
+        
+        # 3. Mix the two parts together, with the crack being more prominent
+        data = crack_sound * 0.6 + ring_sound * 0.4
+        
+        # 4. Normalize the audio to prevent clipping and ensure it's audible
+        peak = np.max(np.abs(data))
+        if peak > 0:
+            data /= peak # Normalize to a range of [-1, 1]
+        
+        # 5. Set amplitude (50% volume) as float samples for the mixer
+        return (data * 0.5).astype(np.float32)
+
+SFX_EVENT_DTYPE = np.dtype([('frame', np.int32), ('sfx_id', np.uint8), ('variant', np.uint8), ('gain', np.float32), ('pitch', np.float32)])
+
+class SFXEventLog:
+    """
+    Compact SFX timeline: a preallocated structured array (grown by doubling) of
+    frame, effect id, variant, gain and an optional explicit pitch (NaN = use the variant).
+
+    A voice limiter allows at most `max_voices` events of one effect per frame.
+    Further events are folded into an existing voice by summing power
+    (n overlapping hits play at sqrt(n) gain, capped at `max_gain`), so big fights
+    still sound denser while memory and mix time stay bounded by frames x effects.
+    """
+    def __init__(self, max_voices=3, max_gain=4.0, capacity=4096):
+        self.max_voices, self.max_gain = max(1, int(max_voices)), max_gain
+        self.events = np.zeros(capacity, dtype=SFX_EVENT_DTYPE)
+        self.count = 0
+        self.collapsed = 0
+        self._voice_frame = None
+        self._voices = {}
+
+    def add(self, frame_num, sfx_id, variant, gain=1.0, pitch=np.nan):
+        if frame_num != self._voice_frame: self._voice_frame, self._voices = frame_num, {}
+        voices = self._voices.setdefault(sfx_id, [0])
+        if len(voices) > self.max_voices:
+            # voices[0] counts folded events so they rotate across the frame's voices
+            target = voices[1 + voices[0] % self.max_voices]; voices[0] += 1
+            self.events['gain'][target] = min(self.max_gain, np.sqrt(self.events['gain'][target]**2 + gain**2))
+            self.collapsed += 1
+            return
+        if self.count == len(self.events):
+            grown = np.zeros(len(self.events) * 2, dtype=SFX_EVENT_DTYPE); grown[:self.count] = self.events; self.events = grown
+        self.events[self.count] = (frame_num, sfx_id, variant, gain, pitch)
+        voices.append(self.count)
+        self.count += 1
+
+    def view(self):
+        return self.events[:self.count]
+
+    def clear(self):
+        self.count = 0; self.collapsed = 0
+        self._voice_frame, self._voices = None, {}
+
+    def __len__(self):
+        return self.count
 
 class AudioManager:
     """
     Manages a main soundtrack, procedural sound effects, and a timeline of cues
     to synchronize the simulation with audio events.
     """
-    def __init__(self, config):
+    SFX_GAIN = 10 ** (-8 / 20) # SFX sit 8 dB under the soundtrack
+    def __init__(self, config, seed=None):
         self.config = config
         self.sample_rate = 44100
 
         # --- Soundtrack ---
         self.main_track = None
-        self._load_soundtrack() # Placeholder for loading a main song
+        self.soundtrack_path = None
+        self._load_soundtrack()
 
         # --- Procedural SFX ---
-        self.sfx_events = []
+        self.sfx_events = SFXEventLog(getattr(config, 'sfx_max_voices', 3), getattr(config, 'sfx_max_gain', 4.0))
+        self.sfx_bank = SFXBank.shared(self.sample_rate, getattr(config, 'sfx_variants', 8))
+        self.sfx_rng = random.Random(seed if seed is not None else getattr(config, 'seed', None))
 
         # --- Cue Timeline ---
-        # A list of tuples: (frame_number, event_name, data)
-        # This is the core of the new system.
-        self.cue_points = []
-        self._generate_initial_cues() # Placeholder for pre-generating cues
+        # Cues are bucketed by frame so the per-frame lookup is O(1).
+        self.cue_points = CueTimeline()
+        self._generate_initial_cues()
 
     def _load_soundtrack(self):
         """
-        Placeholder for loading a main audio file (e.g., an MP3).
-        In the future, this will load from a path in the config.
-        For now, it does nothing.
+        Loads the main audio file named by config 'soundtrack_path' (any format
+        pydub/FFmpeg can read). Without one, the mix starts from silence.
         """
-        pass
+        soundtrack_path = getattr(self.config, 'soundtrack_path', None)
+        if not soundtrack_path: return
+        try:
+            # pydub is only needed to decode a soundtrack, so headless runs without one never import it
+            from pydub import AudioSegment
+            AudioSegment.converter = "ffmpeg"
+            self.main_track = AudioSegment.from_file(soundtrack_path)
+            self.soundtrack_path = soundtrack_path
+            print(f"Loaded soundtrack '{soundtrack_path}' ({len(self.main_track) / 1000:.1f}s).")
+        except Exception as e:
+            print(f"!!! Could not load soundtrack '{soundtrack_path}': {e} !!!")
 
     def _generate_initial_cues(self):
         """
-        Placeholder for analyzing a soundtrack or loading pre-defined cues.
-        This is where you would do beat detection on self.main_track.
-        For now, we can manually add a cue from the config for demonstration.
+        Builds the cue timeline from the config: the 'beat_drop_frame' cue, any cues
+        in the JSON 'cue_file', and a 'BEAT' cue per beat detected in the soundtrack
+        (analysed once per file and cached on disk).
         """
+        fps = getattr(self.config, 'fps', 60)
         beat_drop_frame = getattr(self.config, 'beat_drop_frame', None)
         if beat_drop_frame:
             print(f"Audio Cue: Scheduled 'BEAT_DROP' event at frame {beat_drop_frame}.")
-            self.cue_points.append((beat_drop_frame, 'BEAT_DROP', {}))
+            self.cue_points.add(beat_drop_frame, 'BEAT_DROP')
+
+        cue_file = getattr(self.config, 'cue_file', None)
+        if cue_file:
+            try:
+                for frame_num, event_name, data in load_cue_file(cue_file, fps): self.cue_points.add(frame_num, event_name, data)
+            except (FileNotFoundError, json.JSONDecodeError, KeyError) as e: print(f"ERROR loading cue file '{cue_file}': {e}")
+
+        if self.main_track and getattr(self.config, 'detect_beats', True):
+            analysis = analyse_soundtrack(self.soundtrack_path, self._segment_to_array(self.main_track), self.sample_rate)
+            for time_s, strength in analysis['beats']:
+                self.cue_points.add(int(round(time_s * fps)), 'BEAT', {'strength': strength, 'tempo_bpm': analysis['tempo_bpm']})
+            print(f"Audio Cue: {len(analysis['beats'])} beats at ~{analysis['tempo_bpm']:.0f} BPM.")
 
     def get_cues_for_frame(self, frame_num):
         """
         Called by the simulation every frame to check for events.
-        Returns a list of all events scheduled for the current frame.
+        Returns the events scheduled for the current frame (an empty tuple on most frames).
         """
-        triggered_cues = []
-        for cue_frame, event_name, data in self.cue_points:
-            if cue_frame == frame_num:
-                triggered_cues.append({'event': event_name, 'data': data})
-        return triggered_cues
+        return self.cue_points.cues_for_frame(frame_num)
 
     # --- SFX Generation ---
     def add_sfx(self, frame_num, sfx_name, custom_params=None):
-        """Logs a request to play a procedural sound effect."""
-        self.sfx_events.append({
-            'frame': frame_num,
-            'name': sfx_name,
-            'params': custom_params or {}
-        })
-
-    def _generate_sfx(self, sfx_name, params):
-        """Generates the actual sound wave for a requested SFX."""
-        pitch_var = params.get('pitch_variation', random.uniform(-15, 15))
-        if sfx_name == 'pop':
-            return self._generate_pop(pitch_variation=pitch_var)
-        if sfx_name == 'boom':
-            return self._generate_boom(pitch_variation=pitch_var)
-        if sfx_name == 'crack':
-            return self._generate_crack(pitch_variation=pitch_var)
-        return None
+        """Logs a request to play a procedural sound effect, picking one of the bank's variants."""
+        if sfx_name not in SFX_NAMES: return
+        params = custom_params or {}
+        self.sfx_events.add(frame_num, SFX_NAMES.index(sfx_name), self.sfx_rng.randrange(self.sfx_bank.variants),
+                            params.get('gain', 1.0), params.get('pitch_variation', np.nan))
+
+    def clear_sfx(self):
+        """Forgets all logged SFX, e.g. when the simulation is reset before a recording."""
+        self.sfx_events.clear()
+
+    def _generate_sfx(self, sfx_name, variant=0, pitch_variation=np.nan):
+        """Looks up the sound wave for a requested SFX as float32 samples."""
+        if not np.isnan(pitch_variation): return self.sfx_bank.get_pitched(sfx_name, pitch_variation)
+        return self.sfx_bank.get(sfx_name, variant)
 
     def export_final_track(self, total_frames, fps, output_path):
-        """Builds and exports the complete audio track."""
-        duration_ms = (total_frames / fps) * 1000
-        
-        # Start with the main soundtrack, or silence if none is loaded.
+        """
+        Mixes the soundtrack and every logged SFX into one preallocated float32 sample
+        buffer in a single pass, soft-clips it and writes a 16-bit WAV.
+        """
+        start_time = time.perf_counter()
+        num_samples = int(round(total_frames / fps * self.sample_rate))
+        mix = np.zeros(num_samples, dtype=np.float32)
+
+        # Start with the main soundtrack, or silence if none is loaded; it is trimmed to the video length.
         if self.main_track and len(self.main_track) > 0:
-            # Trim or pad the main track to match the video length
-            final_track = self.main_track[:duration_ms]
-            if len(final_track) < duration_ms:
-                final_track += AudioSegment.silent(duration=duration_ms - len(final_track))
-        else:
-            final_track = AudioSegment.silent(duration=duration_ms)
-
-        # Overlay the procedural SFX
-        if self.sfx_events:
-            print(f"Overlaying {len(self.sfx_events)} sound effects...")
-            for event in self.sfx_events:
-                sound = self._generate_sfx(event['name'], event['params'])
-                if sound:
-                    position_ms = (event['frame'] / fps) * 1000
-                    final_track = final_track.overlay(sound - 8, position=position_ms)
-        
+            soundtrack = self._segment_to_array(self.main_track)[:num_samples]
+            mix[:len(soundtrack)] += soundtrack
+
+        # Add each procedural SFX at its frame offset
+        events = self.sfx_events.view()
+        if len(events):
+            print(f"Mixing {len(events)} sound effects ({self.sfx_events.collapsed} more folded in by the voice limiter)...")
+            starts = (events['frame'] * (self.sample_rate / fps)).astype(np.int64)
+            gains = events['gain'] * np.float32(self.SFX_GAIN)
+            for k in range(len(events)):
+                start = starts[k]
+                if start >= num_samples: continue
+                sound = self._generate_sfx(SFX_NAMES[events['sfx_id'][k]], events['variant'][k], events['pitch'][k])
+                end = min(num_samples, start + len(sound))
+                mix[start:end] += sound[:end - start] * gains[k]
+
         print(f"Attempting to export final audio mix to: {output_path}")
         try:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            final_track.export(output_path, format="wav")
-            print(f"SUCCESS: Audio track saved to {output_path}")
+            self._write_wav(output_path, self._soft_clip(mix))
+            print(f"SUCCESS: Audio track saved to {output_path} ({time.perf_counter() - start_time:.2f}s)")
             return True
         except Exception as e:
             print(f"!!! CRITICAL ERROR during audio export: {e} !!!")
             return False
 
-    def _generate_pop(self, pitch_variation=0):
-        frequency = 500 + pitch_variation; duration_s = 0.08
-        t = np.linspace(0., duration_s, int(self.sample_rate * duration_s), endpoint=False)
-        envelope = np.exp(-t * 60); tone = np.sin(2. * np.pi * frequency * t); noise = np.random.uniform(-1, 1, len(t)) * 0.8
-        data = (tone * 0.2 + noise) * envelope; amplitude = np.iinfo(np.int16).max * 0.4
-        data = (np.clip(data, -1, 1) * amplitude).astype(np.int16)
-        return AudioSegment(data.tobytes(), frame_rate=self.sample_rate, sample_width=2, channels=1)
+    def _segment_to_array(self, segment):
+        """Converts a pydub AudioSegment into mono float32 samples at our sample rate."""
+        segment = segment.set_channels(1).set_frame_rate(self.sample_rate).set_sample_width(2)
+        return np.array(segment.get_array_of_samples(), dtype=np.float32) / 32768.0
 
-    def _generate_boom(self, pitch_variation=0):
-        frequency = 70 + pitch_variation; duration_s = 0.3
-        t = np.linspace(0., duration_s, int(self.sample_rate * duration_s), endpoint=False)
-        envelope = np.exp(-t * 15); data = np.sin(2. * np.pi * frequency * t)
-        data += np.sin(2. * np.pi * (frequency * 1.5) * t) * 0.5; data *= envelope
-        amplitude = np.iinfo(np.int16).max * 0.6; data = (np.clip(data, -1, 1) * amplitude).astype(np.int16)
-        return AudioSegment(data.tobytes(), frame_rate=self.sample_rate, sample_width=2, channels=1)
-    
-    def _generate_crack(self, pitch_variation=0):
-        """Generates a multi-layered, crunchy sound for armor hits."""
-        duration_s = 0.2
-        t = np.linspace(0., duration_s, int(self.sample_rate * duration_s), endpoint=False)
-        
-        # 1. The initial "crack" - a sharp burst of noise
-        noise = np.random.uniform(-1, 1, len(t))
-        crack_envelope = np.exp(-t * 200) # Very fast decay
-        crack_sound = noise * crack_envelope
+    @staticmethod
+    def _soft_clip(mix, knee=0.8):
+        """Leaves samples below the knee untouched and smoothly compresses peaks into [-1, 1]."""
+        magnitude = np.abs(mix)
+        over = magnitude > knee
+        if np.any(over):
+            compressed = knee + (1.0 - knee) * np.tanh((magnitude[over] - knee) / (1.0 - knee))
+            mix[over] = np.copysign(compressed, mix[over])
+        return mix
 
-        # 2. The metallic "ring" - two detuned high-frequency sine waves
-        freq1 = 880 + pitch_variation
-        freq2 = freq1 * 1.505 # A slightly detuned musical fifth for a metallic sound
-        ring_tone = (np.sin(2. * np.pi * freq1 * t) * 0.5 + 
-                     np.sin(2. * np.pi * freq2 * t) * 0.5)
-        ring_envelope = np.exp(-t * 30) # Slower decay
-        ring_sound = ring_tone * ring_envelope
-        
-        # 3. Mix the two parts together, with the crack being more prominent
-        data = crack_sound * 0.6 + ring_sound * 0.4
-        
-        # 4. Normalize the audio to prevent clipping and ensure it's audible
-        peak = np.max(np.abs(data))
-        if peak > 0:
-            data /= peak # Normalize to a range of [-1, 1]
-        
-        # 5. Set amplitude and convert to 16-bit format for pydub
-        amplitude = np.iinfo(np.int16).max * 0.5 # 50% volume
-        data_16bit = (data * amplitude).astype(np.int16)
-        
-        return AudioSegment(data_16bit.tobytes(), frame_rate=self.sample_rate, sample_width=2, channels=1)
+    def _write_wav(self, output_path, samples):
+        """Writes mono float samples in [-1, 1] as a 16-bit PCM WAV."""
+        pcm = (samples * np.iinfo(np.int16).max).astype('<i2')
+        with wave.open(output_path, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(pcm.tobytes())
@@ -1,9 +1,7 @@
 from collections import deque
 import numpy as np
-import random
 from src.constants import *
 import json
-import pygame
 
 class Base:
     def __init__(self, team_name, pivot_y, pivot_x, shape_name, config, grid_h, grid_w):
@@ -40,6 +38,34 @@ class Base:
             if e2 > -dy: err -= dy; x1 += sx
             if e2 < dx: err += dx; y1 += sy
 
+    def _fill_polygon(self, points):
+        """
+        Scanline fill of a polygon given as integer (y, x) vertices, clipped to the grid.
+        Mirrors pygame's draw.polygon (truncated edge intersections, horizontal edges
+        filled separately) pixel for pixel, so the sim core needs no display library.
+        """
+        ys = [p[0] for p in points]; xs = [p[1] for p in points]; n = len(points)
+        min_y, max_y = min(ys), max(ys); pixels = set()
+        def span(y, x1, x2):
+            if not 0 <= y < self.grid_h: return
+            if x1 > x2: x1, x2 = x2, x1
+            for x in range(max(0, x1), min(self.grid_w - 1, x2) + 1): pixels.add((y, x))
+        if min_y == max_y:
+            span(min_y, min(xs), max(xs)); return pixels
+        for y in range(max(min_y, 0), min(max_y, self.grid_h - 1) + 1):
+            crossings = []
+            for i in range(n):
+                y1, x1, y2, x2 = ys[i - 1], xs[i - 1], ys[i], xs[i]
+                if y1 == y2: continue
+                if y1 > y2: y1, x1, y2, x2 = y2, x2, y1, x1
+                if y1 <= y < y2 or (y == max_y == y2):
+                    crossings.append(x1 + int((y - y1) * (x2 - x1) / (y2 - y1)))
+            crossings.sort()
+            for i in range(0, len(crossings) - 1, 2): span(y, crossings[i], crossings[i + 1])
+        for i in range(n):
+            if min_y < ys[i] < max_y and ys[i - 1] == ys[i]: span(ys[i], xs[i - 1], xs[i])
+        return pixels
+
     def _get_shape_template(self, name):
         if name == 'Y': return [ ((-1, 0), (4, 0)), ((-1, 0), (-4, -3)), ((-1, 0), (-4, 3)) ]
         if name == 'N': return [ ((4, -2), (-4, -2)), ((-4, 2), (4, 2)), ((-4, -2), (4, 2)) ]
@@ -73,13 +99,8 @@ class Base:
                 abs_y1, abs_x1, abs_y2, abs_x2 = self.pivot[0] + y1, self.pivot[1] + x1, self.pivot[0] + y2, self.pivot[1] + x2
                 for y, x in self._bresenham_line(abs_y1, abs_x1, abs_y2, abs_x2): thin_line_pixels.add((y, x))
         else:
-            points = [(self.pivot[1] + p[1]*self.scale, self.pivot[0] + p[0]*self.scale) for p in self.core_template]
-            temp_surf = pygame.Surface((self.grid_w, self.grid_h))
-            if len(points) > 2: pygame.draw.polygon(temp_surf, (255,255,255), points)
-            px_array_2d = pygame.surfarray.pixels2d(temp_surf)
-            indices = np.nonzero(px_array_2d)
-            thin_line_pixels.update(zip(indices[1], indices[0]))
-            del px_array_2d
+            points = [(int(self.pivot[0] + p[0]*self.scale), int(self.pivot[1] + p[1]*self.scale)) for p in self.core_template]
+            if len(points) > 2: thin_line_pixels.update(self._fill_polygon(points))
 
         core_set = set()
         for y, x in thin_line_pixels:
@@ -122,10 +143,38 @@ class Base:
         
         self.current_armor_pixels = list(armor_set)
         self.all_base_pixels = core_set.union(armor_set)
+        self._update_rim_pixels()
+
+    def _update_rim_pixels(self):
         self.rim_pixels = set()
         for y, x in self.all_base_pixels:
             if not all(((y+dy, x+dx) in self.all_base_pixels for dy, dx in [(0,1),(0,-1),(1,0),(-1,0)])):
                 self.rim_pixels.add((y, x))
+
+    def get_state(self):
+        """Scalar state for checkpoints; pixel lists are stored separately as arrays."""
+        return {'team_name': self.team_name, 'shape_name': self.shape_name, 'pivot': list(self.pivot), 'scale': self.scale,
+                'core_thickness': self.core_thickness, 'armor_thickness': self.armor_thickness,
+                'exit_ports': [[int(v) for v in p] for p in self._relative_exit_ports], 'last_damage_frame': self.last_damage_frame,
+                'spawn_cooldown': self.spawn_cooldown}
+
+    @classmethod
+    def from_state(cls, state, config, grid_h, grid_w, core_pixels, armor_pixels, all_pixels):
+        """Rebuilds a base from a checkpoint without re-running the geometry pass."""
+        base = cls.__new__(cls)
+        base.team_name = state['team_name']; base.team_id = TEAM_NAME_TO_ID.get(base.team_name.lower(), 0)
+        base.pivot = tuple(state['pivot']); base.shape_name = state['shape_name']; base.config = config
+        base.id = f"{base.team_name}_{base.shape_name}_{base.pivot[0]}_{base.pivot[1]}"; base.grid_h, base.grid_w = grid_h, grid_w
+        base.scale = state['scale']; base.core_thickness, base.armor_thickness = state['core_thickness'], state['armor_thickness']
+        base._relative_exit_ports = [tuple(p) for p in state['exit_ports']]; base.last_damage_frame = state['last_damage_frame']
+        base.shape_type = 'lines' if base.shape_name in ['Y', 'N'] else 'polygon'
+        base.core_template = base._get_shape_template(base.shape_name)
+        base.current_core_pixels = [tuple(p) for p in core_pixels.tolist()]
+        base.current_armor_pixels = [tuple(p) for p in armor_pixels.tolist()]
+        base.all_base_pixels = set(tuple(p) for p in all_pixels.tolist())
+        base._update_rim_pixels()
+        base.spawn_cooldown = state['spawn_cooldown']
+        return base
     
     def _load_template(self):
         try:
@@ -153,9 +202,9 @@ class Base:
         self.spawn_cooldown -= 1
         if self.spawn_cooldown <= 0:
             units_to_spawn = int(sim.get_param(self.team_id, 'units_per_spawn'))
-            open_ports = [(y, x) for y, x in self.exit_ports if 0 <= y < SIM_HEIGHT and 0 <= x < SIM_WIDTH]
+            open_ports = [(y, x) for y, x in self.exit_ports if 0 <= y < self.grid_h and 0 <= x < self.grid_w]
             if not open_ports: self.spawn_cooldown = int(sim.get_param(self.team_id, 'spawn_rate')); return
             for _ in range(units_to_spawn):
-                spawn_y, spawn_x = random.choice(open_ports)
-                sim.add_soldier(spawn_y, spawn_x, self.team_id, np.random.uniform(0, 2 * np.pi))
+                spawn_y, spawn_x = open_ports[sim.rng.integers(len(open_ports))]
+                sim.add_soldier(spawn_y, spawn_x, self.team_id, sim.rng.uniform(0, 2 * np.pi))
             self.spawn_cooldown = int(sim.get_param(self.team_id, 'spawn_rate'))
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+THREAD_ENV_VARS = ('NUMBA_NUM_THREADS', 'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+def init_worker(threads_per_worker):
+    """
+    Pool initializer: caps Numba (and any BLAS/OpenMP pool) in each worker so that
+    N workers x their kernel threads never exceed the machine's cores.
+    Runs before the worker imports the simulation, so NUMBA_NUM_THREADS takes effect.
+    """
+    for var in THREAD_ENV_VARS: os.environ[var] = str(threads_per_worker)
+    import numba
+    numba.set_num_threads(threads_per_worker)
+
+def plan_workers(workers=None, threads_per_worker=None):
+    """Splits the machine's cores into (processes, threads per process)."""
+    cpus = os.cpu_count() or 1
+    workers = max(1, workers or cpus)
+    threads_per_worker = max(1, threads_per_worker or cpus // workers)
+    return workers, threads_per_worker
+
+def create_pool(workers, threads_per_worker):
+    """A spawn-based process pool; fork is unsafe once Numba's or SDL's threads exist."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=init_worker, initargs=(threads_per_worker,))
+
+def render_job(job):
+    """Pool entry point: renders one manifest run headless and returns its summary."""
+    from src.headless import load_config, render_headless
+    start = time.perf_counter()
+    try:
+        config, presentation_params = load_config(job['config'], job.get('overrides'))
+        summary = render_headless(config, presentation_params, job['output_dir'], layout_path=job['layout'],
+                                  title_text=job.get('title'), total_frames=job.get('frames'), encoder=job.get('encoder', 'auto'),
+                                  log_prefix=f"[{job['name']}] ", seed=job.get('seed'), encode_threads=job.get('threads'))
+    except Exception as e:
+        summary = {'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()}
+    summary.update({'name': job['name'], 'layout': job['layout'], 'title': job.get('title'), 'wall_seconds': time.perf_counter() - start})
+    return summary
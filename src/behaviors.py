@@ -2,19 +2,25 @@ import numpy as np
 import random
 from src.constants import *
 from numba import jit
+from src.pheromone import pheromone_at
 
 @jit(nopython=True, fastmath=True, cache=True)
 def get_next_move(y, x, heading, pheromone_grid, grid_h, grid_w, 
-                  sensor_angle_rad, rotation_angle_rad, sensor_dist):
+                  sensor_angle_rad, rotation_angle_rad, sensor_dist, rand_u):
     """
     A Numba-optimized function that performs the SENSE->ROTATE->MOVE cycle.
+    rand_u is a uniform [0, 1) draw supplied by the caller so the tie-break turn is seedable.
+    A pheromone grid smaller than the world (pheromone_resolution > 1) is sampled proportionally,
+    and a float16 one (pheromone_precision) is passed as its uint16 view and read as float32.
     """
+    ph_h, ph_w = pheromone_grid.shape
     # 1. SENSE: Check pheromones at three sensor points
     def get_scent_at(angle):
         sensor_y = int(y + sensor_dist * np.sin(angle))
         sensor_x = int(x + sensor_dist * np.cos(angle))
         if 0 <= sensor_y < grid_h and 0 <= sensor_x < grid_w:
-            return pheromone_grid[sensor_y, sensor_x]
+            if ph_h != grid_h or ph_w != grid_w: sensor_y, sensor_x = sensor_y * ph_h // grid_h, sensor_x * ph_w // grid_w
+            return pheromone_at(pheromone_grid, sensor_y, sensor_x)
         return 0.0
 
     scent_forward = get_scent_at(heading)
@@ -30,7 +36,7 @@ def get_next_move(y, x, heading, pheromone_grid, grid_h, grid_w,
     elif scent_right > scent_left:
         heading += rotation_angle_rad
     else: # If scents are equal (and not zero), randomly choose a turn
-        heading += random.uniform(-rotation_angle_rad, rotation_angle_rad)
+        heading += (2.0 * rand_u - 1.0) * rotation_angle_rad
 
     # 3. MOVE: Calculate the new position one step along the new heading
     final_y = y + np.sin(heading)
@@ -59,7 +65,7 @@ class SlimeMoldBehavior(Behavior):
             soldier.y, soldier.x, soldier.heading, pheromone_grid,
             sim.grid_size[0], sim.grid_size[1],
             sensor_angle_rad, rotation_angle_rad,
-            params['sensor_distance']
+            params['sensor_distance'], random.random()
         )
         
         soldier.heading = new_heading
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import tempfile
+import numpy as np
+from src.constants import *
+
+def ring_layout(num_teams, grid_size=(SIM_HEIGHT, SIM_WIDTH), shape_name='BOX', scale=None):
+    """
+    A canned layout in base_layouts.json format: `num_teams` bases evenly spaced on a
+    ring around the centre of a `grid_size` arena, each with four exit ports just outside its armor.
+    Bases shrink with arenas smaller than the default one so they still fit on the ring.
+    """
+    grid_h, grid_w = grid_size
+    if scale is None: scale = max(2.0, (8.0 if num_teams <= 4 else 5.0) * min(1.0, min(grid_h, grid_w) / SIM_HEIGHT))
+    radius = min(grid_h, grid_w) * 0.35
+    port_offset = int(4 * scale) + 6
+    layout = []
+    for i in range(num_teams):
+        angle = 2 * np.pi * i / num_teams
+        pivot = [int(grid_h / 2 + radius * np.sin(angle)), int(grid_w / 2 + radius * np.cos(angle))]
+        ports = [[pivot[0] + dy, pivot[1] + dx] for dy, dx in ((-port_offset, 0), (port_offset, 0), (0, -port_offset), (0, port_offset))]
+        layout.append({"team": TEAMS[i]['name'], "shape_name": shape_name, "pivot": pivot, "scale": scale,
+                       "core_thickness": 1, "armor_thickness": 2, "exit_ports": ports})
+    return {"grid_size": [grid_h, grid_w], "initial_layout": layout}
+
+def populate(sim, num_agents, rng):
+    """Scatters `num_agents` agents over empty cells, teams assigned round-robin across the layout's bases."""
+    team_ids = [base.team_id for base in sim.bases]
+    empty_y, empty_x = np.nonzero(sim.render_grid == EMPTY)
+    cells = rng.choice(len(empty_y), size=min(num_agents, len(empty_y)), replace=False)
+    for n, cell in enumerate(cells):
+        sim.add_soldier(float(empty_y[cell]) + 0.5, float(empty_x[cell]) + 0.5, team_ids[n % len(team_ids)], rng.uniform(0, 2 * np.pi))
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KiB elsewhere
+
+def run_case(case):
+    """
+    Pool entry point: benchmarks one (teams, agents) case in a fresh process so that
+    Numba warm-up and peak RSS are measured in isolation. Returns a JSON-serialisable result.
+    """
+    if case.get('worlds', 1) > 1: return run_batch_case(case)
+    from src.headless import init_headless_display, load_config
+    if case.get('render'): init_headless_display() # sim-only cases never load pygame
+    import numba
+    from src.simulation import Simulation
+    from src.profiler import PROFILER
+    from src.vfx import VFXManager
+    from src.audio_manager import AudioManager
+
+    grid_size = scaled_arena_size(case.get('area', 1))
+    overrides = {**case.get('overrides', {}), 'max_agents': max(10000, int(case['agents'] * 1.5)), 'arena_size': list(grid_size)}
+    config, presentation_params = load_config(case.get('config', 'config.json'), overrides)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(ring_layout(case['teams'], grid_size), f); layout_path = f.name
+    try:
+        audio_manager = AudioManager(config, seed=case['seed'])
+        vfx_manager = VFXManager(audio_manager)
+        sim = Simulation(config, vfx_manager, audio_manager, layout_path=layout_path, seed=case['seed'], render_pheromones=bool(case.get('render')))
+    finally:
+        os.remove(layout_path)
+    populate(sim, case['agents'], np.random.default_rng(case['seed']))
+    renderer = None
+    if case.get('render'):
+        from src.live_renderer import LiveRenderer
+        renderer = LiveRenderer(presentation_params)
+
+    start = time.perf_counter()
+    for base in sim.bases: base.recalculate_geometry(final_calculation=True, regenerate_ports=False)
+    geometry_ms = (time.perf_counter() - start) * 1000.0 / max(1, len(sim.bases))
+    sim.recount_team_stats()
+
+    # The first step includes compiling the kernel (or loading it from Numba's cache)
+    start = time.perf_counter()
+    sim.step(0)
+    first_step_seconds = time.perf_counter() - start
+    frame = 1
+    for _ in range(case['warmup']):
+        sim.step(frame); frame += 1
+        if renderer: renderer.render_video_frame(sim, vfx_manager)
+
+    PROFILER.set_enabled(True); PROFILER.reset()
+    agent_updates = 0
+    start = time.perf_counter()
+    for _ in range(case['frames']):
+        agent_updates += sim.agent_count
+        sim.step(frame); frame += 1
+        vfx_manager.update_effects()
+        if renderer: renderer.render_video_frame(sim, vfx_manager)
+    elapsed = time.perf_counter() - start
+    PROFILER.set_enabled(False)
+
+    stages = {stage: {'p50': s['p50'], 'p95': s['p95'], 'max': s['max']} for stage, s in PROFILER.stats().items()}
+    return {
+        'name': case['name'], 'teams': case['teams'], 'agents': case['agents'], 'render': bool(renderer), 'grid_size': list(sim.grid_size),
+        'frames': case['frames'], 'fps': case['frames'] / elapsed, 'agents_per_second': agent_updates / elapsed,
+        'ms_per_frame': elapsed * 1000.0 / case['frames'], 'final_agent_count': int(sim.agent_count),
+        'first_step_seconds': first_step_seconds, 'geometry_ms_per_base': geometry_ms,
+        'stages_ms': stages, 'peak_rss_mb': peak_rss_mb(), 'numba_threads': numba.get_num_threads(),
+    }
+
+def run_batch_case(case):
+    """
+    run_case for `worlds` independent worlds stepped together by a WorldBatch, each seeded
+    and populated like the single-world case. fps counts batch steps; agents_per_second
+    counts agent updates over all worlds, so it compares directly with the single-world case.
+    """
+    from src.headless import load_config
+    import numba
+    from src.world_batch import WorldBatch
+
+    grid_size = scaled_arena_size(case.get('area', 1))
+    overrides = {**case.get('overrides', {}), 'max_agents': max(10000, int(case['agents'] * 1.5)), 'arena_size': list(grid_size)}
+    config, _ = load_config(case.get('config', 'config.json'), overrides)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(ring_layout(case['teams'], grid_size), f); layout_path = f.name
+    try: batch = WorldBatch(config, [case['seed'] + w for w in range(case['worlds'])], layout_path=layout_path)
+    finally: os.remove(layout_path)
+    rng = np.random.default_rng(case['seed'])
+    empty_y, empty_x = np.nonzero(batch.terrain[0] == EMPTY)
+    for w in range(batch.num_worlds):
+        cells = rng.choice(len(empty_y), size=min(case['agents'], len(empty_y)), replace=False)
+        for n, cell in enumerate(cells):
+            batch.add_agent(w, float(empty_y[cell]) + 0.5, float(empty_x[cell]) + 0.5, batch.teams[n % len(batch.teams)], rng.uniform(0, 2 * np.pi))
+
+    start = time.perf_counter()
+    batch.step()
+    first_step_seconds = time.perf_counter() - start
+    for _ in range(case['warmup']): batch.step()
+
+    agent_updates = 0
+    start = time.perf_counter()
+    for _ in range(case['frames']):
+        agent_updates += int(batch.agent_counts[~batch.finished].sum())
+        batch.step()
+    elapsed = time.perf_counter() - start
+    return {
+        'name': case['name'], 'teams': case['teams'], 'agents': case['agents'], 'worlds': batch.num_worlds, 'render': False, 'grid_size': list(batch.grid_size),
+        'frames': case['frames'], 'fps': case['frames'] / elapsed, 'agents_per_second': agent_updates / elapsed,
+        'ms_per_frame': elapsed * 1000.0 / case['frames'], 'final_agent_count': int(batch.agent_counts.sum()),
+        'finished_worlds': int(batch.finished.sum()), 'first_step_seconds': first_step_seconds, 'batch_mb': batch.nbytes / 2**20,
+        'peak_rss_mb': peak_rss_mb(), 'numba_threads': numba.get_num_threads(),
+    }
+
+def environment_info():
+    import numba
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'numba': numba.__version__,
+            'machine': platform.machine(), 'system': platform.system(), 'cpu_count': os.cpu_count()}
+
+def compare(results, baseline, threshold):
+    """
+    Compares throughput against a baseline result file. A case regresses when its fps
+    or agents/sec falls more than `threshold` (a fraction) below the baseline.
+    Returns a list of human-readable regression messages.
+    """
+    baseline_cases = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results['cases']:
+        old = baseline_cases.get(case['name'])
+        if old is None: continue
+        for metric in ('fps', 'agents_per_second'):
+            if old[metric] > 0 and case[metric] < old[metric] * (1 - threshold):
+                regressions.append(f"{case['name']}: {metric} {case[metric]:.1f} vs baseline {old[metric]:.1f} ({case[metric] / old[metric] - 1:+.1%})")
+    return regressions
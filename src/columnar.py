@@ -0,0 +1,50 @@
+import csv
+import numpy as np
+
+FORMATS = ('.parquet', '.npz', '.csv')
+
+def parquet_available():
+    """True when pyarrow is installed; Parquet output is optional, like the other heavy dependencies."""
+    try: import pyarrow
+    except ImportError: return False
+    return True
+
+def default_extension():
+    return '.parquet' if parquet_available() else '.npz'
+
+def rows_to_columns(rows):
+    """Turns a list of row dicts into ordered columns; keys missing from a row become None."""
+    names = list(dict.fromkeys(key for row in rows for key in row))
+    return {name: [row.get(name) for row in rows] for name in names}
+
+def _as_array(values):
+    """A typed NumPy column: arrays as they are; otherwise numbers (None -> NaN), bools, or strings (None -> '')."""
+    if isinstance(values, np.ndarray): return values
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (bool, np.bool_)) for v in present) and len(present) == len(values):
+        return np.asarray(values, dtype=np.bool_)
+    if all(isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_)) for v in present):
+        if len(present) == len(values) and all(isinstance(v, (int, np.integer)) for v in present): return np.asarray(values, dtype=np.int64)
+        return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.asarray(['' if v is None else str(v) for v in values])
+
+def write_columns(columns, path):
+    """
+    Writes equal-length columns (name -> values) to `path` in the format its extension
+    names: .parquet (needs pyarrow), .npz (one array per column) or .csv.
+    """
+    extension = path[path.rfind('.'):].lower() if '.' in path else ''
+    if extension not in FORMATS: raise ValueError(f"Unsupported results format '{extension}'; use one of {', '.join(FORMATS)}.")
+    arrays = {name: _as_array(values) for name, values in columns.items()}
+    if extension == '.parquet':
+        import pyarrow
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(pyarrow.table(arrays), path)
+    elif extension == '.npz':
+        np.savez_compressed(path, **arrays)
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(arrays.keys())
+            writer.writerows(zip(*(array.tolist() for array in arrays.values())))
+    return path
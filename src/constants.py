@@ -52,6 +52,30 @@ VIDEO_GAME_AREA_WIDTH = VIDEO_WIDTH
 SIM_HEIGHT = VIDEO_GAME_AREA_HEIGHT // PIXEL_SCALE
 SIM_WIDTH = VIDEO_GAME_AREA_WIDTH // PIXEL_SCALE
 
+def arena_size(config):
+    """
+    (height, width) of the simulation grid: engine_settings 'arena_size' [height, width]
+    when set, otherwise the default SIM_HEIGHT x SIM_WIDTH that maps 1:PIXEL_SCALE onto
+    the video game area. The world size is independent of the output resolution.
+    """
+    size = getattr(config, 'arena_size', None)
+    return (int(size[0]), int(size[1])) if size else (SIM_HEIGHT, SIM_WIDTH)
+
+def scaled_arena_size(area_factor):
+    """The default arena grown to `area_factor` times its area, keeping its aspect ratio."""
+    side = float(np.sqrt(area_factor))
+    return (int(round(SIM_HEIGHT * side)), int(round(SIM_WIDTH * side)))
+
+def arena_transform(grid_size):
+    """
+    (scale, x0, y0) placing a grid of `grid_size` in the video frame: cell (y, x) lands
+    at video pixel (x0 + x * scale, y0 + y * scale). The arena is fitted (and centred)
+    inside the game area, so scale < 1 means the renderer downsamples.
+    """
+    h, w = grid_size
+    scale = min(VIDEO_GAME_AREA_WIDTH / w, VIDEO_GAME_AREA_HEIGHT / h)
+    return scale, (VIDEO_GAME_AREA_WIDTH - w * scale) / 2, VIDEO_TOP_MARGIN + (VIDEO_GAME_AREA_HEIGHT - h * scale) / 2
+
 DASHBOARD_WIDTH = 1920
 DASHBOARD_HEIGHT = 1080
 DASHBOARD_RIGHT_PANEL_WIDTH = 420
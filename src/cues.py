@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+_NO_CUES = ()
+
+class CueTimeline:
+    """
+    Frame-indexed cue store. Cues are bucketed in a dict keyed by frame, so the
+    per-frame lookup is a single dict probe and frames without cues cost nothing.
+    """
+    def __init__(self):
+        self._by_frame = {}
+        self.count = 0
+
+    def add(self, frame_num, event_name, data=None):
+        cue = {'event': event_name, 'data': data or {}}
+        self._by_frame.setdefault(int(frame_num), []).append(cue)
+        self.count += 1
+
+    def cues_for_frame(self, frame_num):
+        return self._by_frame.get(frame_num, _NO_CUES)
+
+    def frames(self):
+        """All cue frames in ascending order."""
+        return sorted(self._by_frame)
+
+    def __len__(self):
+        return self.count
+
+def load_cue_file(path, fps):
+    """
+    Reads cues from JSON: either a list or {"cues": [...]} of entries with an
+    "event", optional "data", and either a "frame" or a "time" in seconds.
+    Returns a list of (frame, event_name, data).
+    """
+    with open(path, 'r') as f: raw = json.load(f)
+    entries = raw.get('cues', []) if isinstance(raw, dict) else raw
+    cues = []
+    for entry in entries:
+        frame_num = entry['frame'] if 'frame' in entry else int(round(entry['time'] * fps))
+        cues.append((int(frame_num), entry['event'], entry.get('data', {})))
+    return cues
+
+def _onset_envelope(samples, sample_rate, frame_size=1024, hop=512):
+    """Half-wave rectified spectral flux of the log-magnitude spectrum, one value per hop."""
+    if len(samples) < frame_size: return np.zeros(0, dtype=np.float32), hop / sample_rate
+    num_frames = 1 + (len(samples) - frame_size) // hop
+    frames = np.lib.stride_tricks.as_strided(samples, shape=(num_frames, frame_size), strides=(samples.strides[0] * hop, samples.strides[0]))
+    spectrum = np.log1p(np.abs(np.fft.rfft(frames * np.hanning(frame_size).astype(np.float32), axis=1)))
+    flux = np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1)
+    flux = np.concatenate(([0.0], flux))
+    peak = flux.max()
+    return (flux / peak if peak > 0 else flux).astype(np.float32), hop / sample_rate
+
+def detect_beats(samples, sample_rate, min_interval_s=0.25, sensitivity=1.5):
+    """
+    Simple onset-based beat detection: picks local maxima of the spectral-flux
+    envelope that exceed a moving-average threshold, at least `min_interval_s` apart.
+    Returns {'tempo_bpm': float, 'beats': [(time_s, strength), ...]}.
+    """
+    envelope, seconds_per_step = _onset_envelope(np.ascontiguousarray(samples, dtype=np.float32), sample_rate)
+    if len(envelope) < 3: return {'tempo_bpm': 0.0, 'beats': []}
+    window = max(1, int(0.5 / seconds_per_step))
+    threshold = np.convolve(envelope, np.ones(window) / window, mode='same') * sensitivity + 0.02
+    is_peak = (envelope[1:-1] > envelope[:-2]) & (envelope[1:-1] >= envelope[2:]) & (envelope[1:-1] > threshold[1:-1])
+    candidates = np.nonzero(is_peak)[0] + 1
+    min_gap = int(min_interval_s / seconds_per_step)
+    beats, last = [], -min_gap
+    for step in candidates:
+        if step - last >= min_gap:
+            beats.append((float(step * seconds_per_step), float(envelope[step])))
+            last = step
+
+    # Tempo from the strongest autocorrelation lag between 60 and 200 BPM
+    centered = envelope - envelope.mean()
+    autocorr = np.correlate(centered, centered, mode='full')[len(centered) - 1:]
+    min_lag, max_lag = int(60 / 200 / seconds_per_step), int(60 / 60 / seconds_per_step)
+    tempo_bpm = 0.0
+    if max_lag < len(autocorr) and min_lag < max_lag:
+        best_lag = min_lag + int(np.argmax(autocorr[min_lag:max_lag]))
+        tempo_bpm = 60.0 / (best_lag * seconds_per_step)
+    return {'tempo_bpm': tempo_bpm, 'beats': beats}
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''): digest.update(chunk)
+    return digest.hexdigest()
+
+def analyse_soundtrack(path, samples, sample_rate, cache_dir=os.path.join('.cache', 'beats')):
+    """
+    Runs detect_beats once per soundtrack and caches the result on disk, keyed by
+    the file's content hash, so later runs with the same file skip the analysis.
+    """
+    cache_path = os.path.join(cache_dir, f"{file_hash(path)}_{sample_rate}.json")
+    try:
+        with open(cache_path, 'r') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): pass
+    analysis = detect_beats(samples, sample_rate)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, 'w') as f: json.dump(analysis, f)
+    except OSError as e: print(f"Could not cache beat analysis: {e}")
+    return analysis
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import random
+import numpy as np
+from types import SimpleNamespace
+from src.constants import *
+
+def init_headless_display():
+    """
+    Initialises pygame against SDL's dummy drivers so surfaces, fonts and transforms
+    work on machines without a display. Must run before anything calls pygame.init().
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    import pygame
+    pygame.init()
+    return pygame
+
+def parse_override(text):
+    """Parses a KEY=VALUE override; the value is read as JSON when possible (numbers, booleans)."""
+    key, _, value = text.partition('=')
+    try: return key, json.loads(value)
+    except json.JSONDecodeError: return key, value
+
+def load_config(config_path='config.json', overrides=None):
+    """
+    Loads config.json into the (config, presentation_params) namespaces the
+    dashboard builds. Overrides are applied by key to whichever namespace owns it.
+    """
+    with open(config_path, 'r') as f: config_data = json.load(f)
+    config = SimpleNamespace(**config_data['run_settings'], **config_data['engine_settings'], **config_data['spawning_settings'], **config_data['camera_settings'])
+    for key, value in config_data.get('narrative_cues', {}).items(): setattr(config, key, value)
+    presentation_params = SimpleNamespace(**config_data['presentation_settings'])
+    for key, value in (overrides or {}).items():
+        target = presentation_params if hasattr(presentation_params, key) else config
+        setattr(target, key, value)
+    return config, presentation_params
+
+def summarize_run(sim, frames_rendered, elapsed_seconds, fps):
+    """Builds the JSON-serialisable outcome of a finished run."""
+    winner_id = sim.winner_info['id'] if sim.winner_info else None
+    return {
+        'winner': TEAM_ID_TO_NAME.get(winner_id) if winner_id is not None and winner_id >= 0 else None,
+        'win_reason': sim.winner_info['reason'] if sim.winner_info else None,
+        'kill_counts': {TEAM_ID_TO_NAME[base.team_id]: int(sim.kill_counts[base.team_id]) for base in sim.bases},
+        'frames': int(frames_rendered),
+        'duration_seconds': frames_rendered / fps,
+        'render_seconds': elapsed_seconds,
+        'render_fps': frames_rendered / elapsed_seconds if elapsed_seconds > 0 else 0.0,
+    }
+
+def _render_world(world, vfx_manager, audio_manager, renderer, config, output_dir, total_frames, title_text,
+                  encoder, log_prefix, encode_threads, **render_kwargs):
+    """
+    Renders `world` (a Simulation or ReplayWorld), exports its audio and muxes the final video.
+    Returns (video_path, render_seconds, error); video_path is None when no final video was made.
+    """
+    from src.video_utils import render_simulation, FFmpegPipeSink, JpegSequenceSink, assemble_video, cleanup_frames, mux_audio
+
+    frames_dir = os.path.join(output_dir, "frames")
+    audio_path = os.path.join(output_dir, "audio.wav")
+    silent_video_path = os.path.join(output_dir, "video_noaudio.mp4")
+    video_path = os.path.join(output_dir, "video.mp4")
+
+    use_pipe = encoder == 'ffmpeg' or (encoder == 'auto' and FFmpegPipeSink.is_available())
+    sink = FFmpegPipeSink(silent_video_path, (VIDEO_WIDTH, VIDEO_HEIGHT), config.fps, threads=encode_threads) if use_pipe else JpegSequenceSink(frames_dir)
+
+    def report(frame_num, pipeline):
+        print(f"{log_prefix}{pipeline.progress_text(frame_num, total_frames)}", flush=True)
+
+    start = time.perf_counter()
+    completed = render_simulation(world, vfx_manager, renderer, sink, total_frames, config.fps, title_text, on_progress=report, progress_interval=2.0,
+                                  encode_workers=encode_threads, **render_kwargs)
+    elapsed = time.perf_counter() - start
+    if not completed: raise RuntimeError(f"Rendering into '{output_dir}' failed.")
+
+    audio_manager.export_final_track(total_frames, config.fps, audio_path)
+    error = None
+    if use_pipe:
+        if mux_audio(silent_video_path, audio_path, video_path): os.remove(silent_video_path)
+        else: # Keep the encoded video; only the audio is missing
+            video_path, error = None, f"Muxing audio failed; the video without audio is kept at {silent_video_path}"
+    elif FFmpegPipeSink.is_available():
+        assemble_video(frames_dir, audio_path, video_path, config.fps)
+        cleanup_frames(frames_dir)
+    else:
+        video_path = None
+        print(f"{log_prefix}FFmpeg not found; frames left in {frames_dir}")
+    return video_path, elapsed, error
+
+def render_headless(config, presentation_params, output_dir, layout_path='base_layouts.json', title_text=None,
+                    total_frames=None, encoder='auto', log_prefix='', seed=None, encode_threads=None):
+    """
+    Runs Simulation + LiveRenderer against off-screen surfaces and writes the finished
+    video (or a JPEG sequence when FFmpeg is unavailable) into `output_dir`.
+    Never opens a window and never throttles to a display clock. Returns the run summary.
+    `encode_threads` caps the frame-encoding workers (and FFmpeg's own threads).
+    With run_settings.record_replay, a replay is written to `output_dir`/replay.
+    With run_settings.profile, per-stage timings go to profile.csv and the summary.
+    Per-frame team metrics go to metrics.parquet (metrics.npz without pyarrow).
+    """
+    init_headless_display()
+    from src.simulation import Simulation, warm_up_kernels
+    from src.vfx import VFXManager
+    from src.audio_manager import AudioManager
+    from src.live_renderer import LiveRenderer
+    from src.replay import ReplayRecorder
+    from src.profiler import PROFILER
+    from src.columnar import default_extension
+    from src.pheromone import pheromone_precision
+
+    os.makedirs(output_dir, exist_ok=True)
+    total_frames = total_frames or getattr(config, 'record_frames', config.total_frames)
+    title_text = presentation_params.question_text if title_text is None else title_text
+
+    if seed is not None:
+        # Only VFX particles still draw from the global generator; SFX variants use AudioManager.sfx_rng
+        random.seed(seed); np.random.seed(seed)
+
+    kernel_warmup = warm_up_kernels(pheromone_precision(config))
+    audio_manager = AudioManager(config, seed=seed)
+    vfx_manager = VFXManager(audio_manager)
+    sim = Simulation(config, vfx_manager, audio_manager, layout_path=layout_path, seed=seed)
+    renderer = LiveRenderer(presentation_params)
+    recorder = ReplayRecorder(os.path.join(output_dir, "replay"), sim) if getattr(config, 'record_replay', False) else None
+    profile = getattr(config, 'profile', False)
+    PROFILER.set_enabled(profile); PROFILER.reset()
+
+    try:
+        video_path, elapsed, error = _render_world(sim, vfx_manager, audio_manager, renderer, config, output_dir, total_frames, title_text, encoder, log_prefix, encode_threads,
+                                                   checkpoint_dir=os.path.join(output_dir, "checkpoints"), checkpoint_interval=getattr(config, 'checkpoint_interval', 0),
+                                                   replay_recorder=recorder)
+    finally:
+        if recorder is not None: recorder.close()
+
+    summary = summarize_run(sim, total_frames, elapsed, config.fps)
+    summary['seed'] = sim.seed
+    summary['video'] = video_path
+    if error: summary['error'] = error
+    summary['kernel_warmup'] = kernel_warmup
+    if profile:
+        summary['profile'] = PROFILER.stats()
+        PROFILER.export(os.path.join(output_dir, "profile.csv"))
+    if sim.metrics is not None:
+        teams = list(dict.fromkeys(base.team_id for base in sim.bases))
+        summary['metrics'] = sim.metrics.export(os.path.join(output_dir, f"metrics{default_extension()}"), teams)
+    with open(os.path.join(output_dir, "summary.json"), 'w') as f: json.dump(summary, f, indent=4)
+    return summary
+
+def render_replay(replay_path, presentation_params, output_dir, title_text=None, encoder='auto', log_prefix='', encode_threads=None):
+    """
+    Re-renders a recorded match with new presentation settings. The simulation is not
+    run; agents, kills and base damage come from the replay at `replay_path`.
+    """
+    init_headless_display()
+    from src.vfx import VFXManager
+    from src.audio_manager import AudioManager
+    from src.live_renderer import LiveRenderer
+    from src.replay import ReplayReader, ReplayWorld
+
+    os.makedirs(output_dir, exist_ok=True)
+    reader = ReplayReader(replay_path)
+    config = reader.config
+    title_text = presentation_params.question_text if title_text is None else title_text
+    random.seed(reader.meta['seed']); np.random.seed(reader.meta['seed'])
+
+    audio_manager = AudioManager(config, seed=reader.meta['seed'])
+    vfx_manager = VFXManager(audio_manager)
+    world = ReplayWorld(reader, vfx_manager, audio_manager)
+    renderer = LiveRenderer(presentation_params)
+
+    video_path, elapsed, error = _render_world(world, vfx_manager, audio_manager, renderer, config, output_dir, world.num_frames, title_text, encoder, log_prefix, encode_threads)
+
+    summary = summarize_run(world, world.num_frames, elapsed, config.fps)
+    summary['seed'] = world.seed
+    summary['replay'] = replay_path
+    summary['video'] = video_path
+    if error: summary['error'] = error
+    with open(os.path.join(output_dir, "summary.json"), 'w') as f: json.dump(summary, f, indent=4)
+    return summary
@@ -4,21 +4,39 @@ import os
 import random
 import math
 from src.constants import *
+from src.profiler import PROFILER
 
 class LiveRenderer:
     def __init__(self, config):
         self.config = config
         max_key = max(COLOR_MAP.keys()) if COLOR_MAP else 0
         self.color_array = np.array([COLOR_MAP.get(i, (0,0,0,0))[:3] for i in range(max_key + 1)], dtype=np.uint8)
-        self.background_surface = self._create_background_surface()
         self.gradient_surface = self._create_fade_gradient((16, 16, 26), 60, VIDEO_WIDTH)
-        self.trail_surface = pygame.Surface((SIM_WIDTH, SIM_HEIGHT), pygame.SRCALPHA)
+        self.world_size = None
+        self._set_world_size((SIM_HEIGHT, SIM_WIDTH))
         try:
             self.font_path = self.config.font_path
             self.base_font_size = self.config.font_size
         except AttributeError:
             self.font_path = None
             self.base_font_size = 50
+        self._font_cache = {}
+
+    def _get_font(self, size):
+        """Fonts are loaded once per size; opening the TTF every frame dominated UI drawing."""
+        font = self._font_cache.get(size)
+        if font is None:
+            font = pygame.font.Font(self.font_path, size)
+            self._font_cache[size] = font
+        return font
+
+    def _set_world_size(self, grid_size):
+        """(Re)creates the grid-resolution surfaces when the simulation's arena size changes."""
+        if grid_size == self.world_size: return
+        self.world_size = grid_size
+        self.world_transform = arena_transform(grid_size)
+        self.background_surface = self._create_background_surface(grid_size[1], grid_size[0])
+        self.trail_surface = pygame.Surface((grid_size[1], grid_size[0]), pygame.SRCALPHA)
 
     def clear_trails(self):
         """Fills the trail surface with transparency, instantly clearing it."""
@@ -33,6 +51,49 @@ class LiveRenderer:
         if viewport.rect.width <= 0 or viewport.rect.height <= 0: return
         
         viewport_surface = pygame.Surface(viewport.rect.size); viewport_surface.fill((10, 10, 15))
+        self.compose_frame(sim, vfx_manager, show_pheromones, title_text)
+        timer = PROFILER.start()
+
+        zoom = viewport.zoom
+        scale, x0, y0 = self.world_transform; cell = scale * zoom
+        scaled_final_surf = pygame.transform.scale(self.final_render_surface, (int(VIDEO_WIDTH * zoom), int(VIDEO_HEIGHT * zoom)))
+        blit_x = (viewport.rect.width / 2) - viewport.offset_x * PIXEL_SCALE * zoom; blit_y = (viewport.rect.height / 2) - viewport.offset_y * PIXEL_SCALE * zoom
+        viewport_surface.blit(scaled_final_surf, (blit_x, blit_y)); pygame.draw.rect(viewport_surface, (200, 200, 220), pygame.Rect(blit_x, blit_y, scaled_final_surf.get_width(), scaled_final_surf.get_height()), 2)
+
+        if dragged_object:
+            core_color = COLOR_MAP[BASE_CORE_OFFSET + dragged_object.team_id]
+            for y,x in dragged_object.current_core_pixels:
+                screen_x = blit_x + (x0 + x * scale) * zoom; screen_y = blit_y + (y0 + y * scale) * zoom
+                pygame.draw.rect(viewport_surface, core_color, (screen_x, screen_y, cell, cell))
+        if selected_object and not is_editing_spawns:
+            highlight_color = (255, 255, 0)
+            for y,x in selected_object.rim_pixels:
+                screen_x = blit_x + (x0 + x * scale) * zoom; screen_y = blit_y + (y0 + y * scale) * zoom
+                pygame.draw.rect(viewport_surface, highlight_color, (screen_x, screen_y, cell, cell), 1)
+        if is_editing_spawns and selected_object:
+             port_color = (255, 255, 0)
+             for y, x in selected_object.exit_ports:
+                screen_x = blit_x + (x0 + x * scale) * zoom; screen_y = blit_y + (y0 + y * scale) * zoom
+                pygame.draw.circle(viewport_surface, port_color, (screen_x, screen_y), int(max(2, 6 * zoom)), 2)
+
+        if sim.winner_info is not None: self._draw_winner_overlay(sim, scaled_final_surf.get_height() / 1920.0)
+
+        screen.blit(viewport_surface, viewport.rect.topleft)
+        PROFILER.lap('render.viewport', timer)
+
+    def render_video_frame(self, sim, vfx_manager, show_pheromones=True, title_text="", overlay_scale=0.5):
+        """
+        Composes a complete video frame without touching a window, viewport or editor overlays.
+        overlay_scale sizes the winner text; 0.5 matches the dashboard's default zoom.
+        """
+        self.compose_frame(sim, vfx_manager, show_pheromones, title_text)
+        if sim.winner_info is not None: self._draw_winner_overlay(sim, overlay_scale)
+        return self.final_render_surface
+
+    def compose_frame(self, sim, vfx_manager, show_pheromones, title_text=""):
+        """Draws the world, particles and video UI bars into self.final_render_surface."""
+        timer = PROFILER.start()
+        self._set_world_size(tuple(sim.grid_size))
         world_surface = self.background_surface.copy()
         
         fade_alpha = getattr(self.config, 'trail_fade_rate', 25)
@@ -48,6 +109,7 @@ class LiveRenderer:
             for p_surf in sim.pheromone_surfaces.values():
                 self.trail_surface.blit(p_surf, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
 
+        timer = PROFILER.lap('render.trails', timer)
         agent_radius = getattr(self.config, 'agent_size', 1.5)
         glow_intensity = getattr(self.config, 'glow_intensity', 255)
 
@@ -57,8 +119,9 @@ class LiveRenderer:
             pygame.draw.circle(self.trail_surface, color, (float(pos_x), float(pos_y)), agent_radius, 0)
         
         world_surface.blit(self.trail_surface, (0,0), special_flags=pygame.BLEND_RGBA_ADD)
+        timer = PROFILER.lap('render.agents', timer)
 
-        base_surface = pygame.Surface((SIM_WIDTH, SIM_HEIGHT), pygame.SRCALPHA)
+        base_surface = pygame.Surface(world_surface.get_size(), pygame.SRCALPHA)
         # ... (The correct base rendering logic is here) ...
         for base in sim.bases:
             is_damaged = (sim.frame_count - base.last_damage_frame) < 5
@@ -85,19 +148,25 @@ class LiveRenderer:
                     pygame.draw.line(base_surface, core_color, (x1, y1), (x2, y2), core_thickness_pixels)
         
         world_surface.blit(base_surface, (0,0))
+        timer = PROFILER.lap('render.bases', timer)
         
         self.final_render_surface = pygame.Surface((VIDEO_WIDTH, VIDEO_HEIGHT), pygame.SRCALPHA)
-        scaled_world = pygame.transform.scale(world_surface, (VIDEO_GAME_AREA_WIDTH, VIDEO_GAME_AREA_HEIGHT))
-        self.final_render_surface.blit(scaled_world, (0, VIDEO_TOP_MARGIN))
+        # Arenas larger than the game area are filtered down rather than sampled, so agents do not flicker in and out
+        scale, x0, y0 = self.world_transform
+        target_size = (int(round(self.world_size[1] * scale)), int(round(self.world_size[0] * scale)))
+        scaled_world = (pygame.transform.scale if scale >= 1 else pygame.transform.smoothscale)(world_surface, target_size)
+        self.final_render_surface.blit(scaled_world, (x0, y0))
+        timer = PROFILER.lap('render.upscale', timer)
         
         for p in vfx_manager.particles:
             if hasattr(p, 'y') and p.y is not None:
-                screen_x = p.x * PIXEL_SCALE
-                screen_y = p.y * PIXEL_SCALE + VIDEO_TOP_MARGIN
-                alpha = int(255 * (p.lifespan / p.max_lifespan)); size = max(1.0, p.radius * PIXEL_SCALE * 0.5)
+                screen_x = x0 + p.x * scale
+                screen_y = y0 + p.y * scale
+                alpha = int(255 * (p.lifespan / p.max_lifespan)); size = max(1.0, p.radius * scale * 0.5)
                 particle_surf = pygame.Surface((size, size), pygame.SRCALPHA); particle_surf.fill((*p.color[:3], alpha))
                 self.final_render_surface.blit(particle_surf, (screen_x - size/2, screen_y - size/2))
         
+        timer = PROFILER.lap('render.particles', timer)
         top_margin_rect = pygame.Rect(0, 0, VIDEO_WIDTH, VIDEO_TOP_MARGIN)
         bottom_margin_rect = pygame.Rect(0, VIDEO_HEIGHT - VIDEO_BOTTOM_MARGIN, VIDEO_WIDTH, VIDEO_BOTTOM_MARGIN)
         margin_color = (16, 16, 26, 220)
@@ -112,7 +181,7 @@ class LiveRenderer:
         try:
             font_scale = VIDEO_HEIGHT / 1920.0
             title_font_size = int(self.base_font_size * font_scale * 0.6)
-            title_font = pygame.font.Font(self.font_path, title_font_size)
+            title_font = self._get_font(title_font_size)
             title_surf = title_font.render(title_text, True, (220, 220, 230))
             text_rect = title_surf.get_rect(centerx=top_margin_rect.centerx, y=top_margin_rect.y + top_margin_rect.height * 0.15)
             self.final_render_surface.blit(title_surf, text_rect)
@@ -177,7 +246,7 @@ class LiveRenderer:
                         kill_count = sim.kill_counts[team_id]
                         # Font size is also scaled down if the UI is squished
                         tally_font_size = int(symbol_size * 0.65 * (scale_factor**0.5)) # scale_factor**0.5 softens the text shrinking
-                        tally_font = pygame.font.Font(self.font_path, tally_font_size)
+                        tally_font = self._get_font(tally_font_size)
                         # Text is always white for readability
                         tally_surf = tally_font.render(str(kill_count), True, (220, 220, 230))
                         tally_rect = tally_surf.get_rect(midtop=symbol_rect.midbottom)
@@ -198,102 +267,80 @@ class LiveRenderer:
             fg_bar_rect = pygame.Rect(bar_x, bar_y, fg_bar_width, bar_height); pygame.draw.rect(self.final_render_surface, (200, 200, 220), fg_bar_rect)
             pygame.draw.rect(self.final_render_surface, (80, 80, 100), bg_bar_rect, 1)
             font_scale = VIDEO_HEIGHT / 1920.0; timer_font_size = int(self.base_font_size * font_scale * 0.7)
-            timer_font = pygame.font.Font(self.font_path, timer_font_size); timer_surf = timer_font.render(timer_text, True, (220, 220, 230))
+            timer_font = self._get_font(timer_font_size); timer_surf = timer_font.render(timer_text, True, (220, 220, 230))
             timer_rect = timer_surf.get_rect(centerx=bottom_margin_rect.centerx, bottom=bar_y - 5); self.final_render_surface.blit(timer_surf, timer_rect)
         except (AttributeError, FileNotFoundError, TypeError): pass
+        PROFILER.lap('render.video_ui', timer)
 
-        zoom = viewport.zoom
-        scaled_final_surf = pygame.transform.scale(self.final_render_surface, (int(VIDEO_WIDTH * zoom), int(VIDEO_HEIGHT * zoom)))
-        blit_x = (viewport.rect.width / 2) - viewport.offset_x * PIXEL_SCALE * zoom; blit_y = (viewport.rect.height / 2) - viewport.offset_y * PIXEL_SCALE * zoom
-        viewport_surface.blit(scaled_final_surf, (blit_x, blit_y)); pygame.draw.rect(viewport_surface, (200, 200, 220), pygame.Rect(blit_x, blit_y, scaled_final_surf.get_width(), scaled_final_surf.get_height()), 2)
-
-        if dragged_object:
-            core_color = COLOR_MAP[BASE_CORE_OFFSET + dragged_object.team_id]
-            for y,x in dragged_object.current_core_pixels:
-                screen_x = blit_x + ((x * PIXEL_SCALE) * zoom); screen_y = blit_y + ((y * PIXEL_SCALE + VIDEO_TOP_MARGIN) * zoom)
-                pygame.draw.rect(viewport_surface, core_color, (screen_x, screen_y, PIXEL_SCALE*zoom, PIXEL_SCALE*zoom))
-        if selected_object and not is_editing_spawns:
-            highlight_color = (255, 255, 0)
-            for y,x in selected_object.rim_pixels:
-                screen_x = blit_x + ((x * PIXEL_SCALE) * zoom); screen_y = blit_y + ((y * PIXEL_SCALE + VIDEO_TOP_MARGIN) * zoom)
-                pygame.draw.rect(viewport_surface, highlight_color, (screen_x, screen_y, PIXEL_SCALE*zoom, PIXEL_SCALE*zoom), 1)
-        if is_editing_spawns and selected_object:
-             port_color = (255, 255, 0)
-             for y, x in selected_object.exit_ports:
-                screen_x = blit_x + ((x * PIXEL_SCALE) * zoom); screen_y = blit_y + ((y * PIXEL_SCALE + VIDEO_TOP_MARGIN) * zoom)
-                pygame.draw.circle(viewport_surface, port_color, (screen_x, screen_y), int(max(2, 6 * zoom)), 2)
-        
-        if sim.winner_info is not None:
-            overlay_surf = pygame.Surface((VIDEO_WIDTH, VIDEO_HEIGHT), pygame.SRCALPHA)
-            overlay_surf.fill((10, 10, 15, 180))
-            try:
-                winner_id, win_reason = sim.winner_info['id'], sim.winner_info['reason']
-                line1_text, line2_text, winner_color = "", "", (200, 200, 200)
-
-                if winner_id == -1:
-                    line1_text = "STALEMATE"
-                    line2_text = "Time expired with no victor"
-                else:
-                    winner_name = TEAMS[winner_id]['name'].upper()
-                    winner_color = TEAMS[winner_id]['color']
-                    line1_text = winner_name
-                    if win_reason == 'elimination': line2_text = "is the last one standing!"
-                    else: line2_text = "was the most hungry!"
-                
-                font_scale = scaled_final_surf.get_height() / 1920.0
-                line1_font_size = int(240 * font_scale)
-                line2_font_size = int(140 * font_scale)
-                
-                font1 = pygame.font.Font(self.font_path, line1_font_size)
-                font2 = pygame.font.Font(self.font_path, line2_font_size)
-
-                line1_surf = font1.render(line1_text, True, winner_color)
-                line2_surf = font2.render(line2_text, True, (220, 220, 230))
-                
-                center_x = VIDEO_WIDTH / 2
-                center_y = VIDEO_HEIGHT / 2
-                
-                line1_rect = line1_surf.get_rect(centerx=center_x, centery=center_y - (line1_surf.get_height() / 2))
-                line2_rect = line2_surf.get_rect(centerx=center_x, top=line1_rect.bottom)
+    def _draw_winner_overlay(self, sim, overlay_scale):
+        overlay_surf = pygame.Surface((VIDEO_WIDTH, VIDEO_HEIGHT), pygame.SRCALPHA)
+        overlay_surf.fill((10, 10, 15, 180))
+        try:
+            winner_id, win_reason = sim.winner_info['id'], sim.winner_info['reason']
+            line1_text, line2_text, winner_color = "", "", (200, 200, 200)
 
-                overlay_surf.blit(line1_surf, line1_rect)
-                overlay_surf.blit(line2_surf, line2_rect)
+            if winner_id == -1:
+                line1_text = "STALEMATE"
+                line2_text = "Time expired with no victor"
+            else:
+                winner_name = TEAMS[winner_id]['name'].upper()
+                winner_color = TEAMS[winner_id]['color']
+                line1_text = winner_name
+                if win_reason == 'elimination': line2_text = "is the last one standing!"
+                else: line2_text = "was the most hungry!"
+            
+            font_scale = overlay_scale
+            line1_font_size = int(240 * font_scale)
+            line2_font_size = int(140 * font_scale)
+            
+            font1 = self._get_font(line1_font_size)
+            font2 = self._get_font(line2_font_size)
 
-            except (AttributeError, FileNotFoundError, TypeError) as e: print(f"Error rendering winner screen: {e}")
+            line1_surf = font1.render(line1_text, True, winner_color)
+            line2_surf = font2.render(line2_text, True, (220, 220, 230))
+            
+            center_x = VIDEO_WIDTH / 2
+            center_y = VIDEO_HEIGHT / 2
             
-            self.final_render_surface.blit(overlay_surf, (0, 0))
+            line1_rect = line1_surf.get_rect(centerx=center_x, centery=center_y - (line1_surf.get_height() / 2))
+            line2_rect = line2_surf.get_rect(centerx=center_x, top=line1_rect.bottom)
 
-        screen.blit(viewport_surface, viewport.rect.topleft)
+            overlay_surf.blit(line1_surf, line1_rect)
+            overlay_surf.blit(line2_surf, line2_rect)
+
+        except (AttributeError, FileNotFoundError, TypeError) as e: print(f"Error rendering winner screen: {e}")
+        
+        self.final_render_surface.blit(overlay_surf, (0, 0))
 
     def _create_fade_gradient(self, color, height, width):
         gradient = pygame.Surface((width, height), pygame.SRCALPHA);
         for y in range(height): alpha = 255 - int((y / height) * 255); pygame.draw.line(gradient, (*color, alpha), (0, y), (width, y))
         return gradient
 
-    def _create_background_surface(self):
-        background = pygame.Surface((SIM_WIDTH, SIM_HEIGHT)); background.fill((16, 16, 26)); center_x, center_y = SIM_WIDTH // 2, SIM_HEIGHT // 2
+    def _create_background_surface(self, width, height):
+        background = pygame.Surface((width, height)); background.fill((16, 16, 26)); center_x, center_y = width // 2, height // 2
                 
         # Layer 1: Fine grid
         grid_color_1 = (35, 35, 50); grid_spacing_1 = 10
-        num_x_lines_1 = (SIM_WIDTH // grid_spacing_1) + 1
-        num_y_lines_1 = (SIM_HEIGHT // grid_spacing_1) + 1
+        num_x_lines_1 = (width // grid_spacing_1) + 1
+        num_y_lines_1 = (height // grid_spacing_1) + 1
         grid_width_1 = (num_x_lines_1 - 1) * grid_spacing_1
         grid_height_1 = (num_y_lines_1 - 1) * grid_spacing_1
-        offset_x_1 = (SIM_WIDTH - grid_width_1) // 2
-        offset_y_1 = (SIM_HEIGHT - grid_height_1) // 2
-        for i in range(num_x_lines_1): pygame.draw.line(background, grid_color_1, (offset_x_1 + i * grid_spacing_1, 0), (offset_x_1 + i * grid_spacing_1, SIM_HEIGHT))
-        for i in range(num_y_lines_1): pygame.draw.line(background, grid_color_1, (0, offset_y_1 + i * grid_spacing_1), (SIM_WIDTH, offset_y_1 + i * grid_spacing_1))
+        offset_x_1 = (width - grid_width_1) // 2
+        offset_y_1 = (height - grid_height_1) // 2
+        for i in range(num_x_lines_1): pygame.draw.line(background, grid_color_1, (offset_x_1 + i * grid_spacing_1, 0), (offset_x_1 + i * grid_spacing_1, height))
+        for i in range(num_y_lines_1): pygame.draw.line(background, grid_color_1, (0, offset_y_1 + i * grid_spacing_1), (width, offset_y_1 + i * grid_spacing_1))
 
         # Layer 2: Thicker accent grid
         grid_color_2 = (45, 55, 80); line_thickness_2 = 2; grid_spacing_2 = 100
-        num_x_lines_2 = (SIM_WIDTH // grid_spacing_2) + 1
-        num_y_lines_2 = (SIM_HEIGHT // grid_spacing_2) + 1
+        num_x_lines_2 = (width // grid_spacing_2) + 1
+        num_y_lines_2 = (height // grid_spacing_2) + 1
         grid_width_2 = (num_x_lines_2 - 1) * grid_spacing_2
         grid_height_2 = (num_y_lines_2 - 1) * grid_spacing_2
-        offset_x_2 = (SIM_WIDTH - grid_width_2) // 2
-        offset_y_2 = (SIM_HEIGHT - grid_height_2) // 2
-        for i in range(num_x_lines_2): pygame.draw.line(background, grid_color_2, (offset_x_2 + i * grid_spacing_2, 0), (offset_x_2 + i * grid_spacing_2, SIM_HEIGHT), line_thickness_2)
-        for i in range(num_y_lines_2): y_pos = offset_y_2 + i * grid_spacing_2; pygame.draw.line(background, grid_color_2, (0, y_pos), (SIM_WIDTH, y_pos), line_thickness_2)
+        offset_x_2 = (width - grid_width_2) // 2
+        offset_y_2 = (height - grid_height_2) // 2
+        for i in range(num_x_lines_2): pygame.draw.line(background, grid_color_2, (offset_x_2 + i * grid_spacing_2, 0), (offset_x_2 + i * grid_spacing_2, height), line_thickness_2)
+        for i in range(num_y_lines_2): y_pos = offset_y_2 + i * grid_spacing_2; pygame.draw.line(background, grid_color_2, (0, y_pos), (width, y_pos), line_thickness_2)
         
         # Center decorations
         pygame.draw.circle(background, grid_color_2, (center_x, center_y), grid_spacing_2 // 2, 1)
@@ -301,7 +348,7 @@ class LiveRenderer:
         pygame.draw.line(background, grid_color_2, (center_x, center_y - grid_spacing_2), (center_x, center_y + grid_spacing_2), 1)
 
         # Vignette
-        vignette_mask = pygame.Surface((SIM_WIDTH, SIM_HEIGHT), flags=pygame.SRCALPHA)
+        vignette_mask = pygame.Surface((width, height), flags=pygame.SRCALPHA)
         max_dist = np.sqrt(center_x**2 + center_y**2); vignette_strength = 220
         for r in range(0, int(max_dist), 3):
             alpha = int(vignette_strength * (r / max_dist)**2); color = (0, 0, 0, alpha)
@@ -0,0 +1,74 @@
+import time
+import numpy as np
+from src.constants import *
+
+# Per-team values recorded every frame. The first four mirror Simulation.team_stats; combat_initiated
+# counts the combat events (explosions) the team's agents raised that frame, i.e. fights they moved
+# into plus hits on enemy armor, whoever died; pheromone_mass is the sum of the team's grid.
+TEAM_METRICS = ('agents', 'armor', 'kills', 'spawns', 'combat_initiated', 'pheromone_mass')
+COMBAT_INITIATED, PHEROMONE_MASS = TEAM_METRICS.index('combat_initiated'), TEAM_METRICS.index('pheromone_mass')
+
+class MetricsRecorder:
+    """
+    Time series of a match in preallocated ring buffers: for each of the last `capacity`
+    records, the frame number, the wall time since the previous record (to line frame-time
+    spikes up with what happened in the battle) and TEAM_METRICS for every team. record()
+    only copies into the buffers, so it runs every step; readers take chronological views
+    with window() and export them with export().
+    """
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.frame_ms = np.zeros(capacity, dtype=np.float32)
+        self.values = np.zeros((capacity, len(TEAMS), len(TEAM_METRICS)), dtype=np.float64)
+        self.count = 0 # Records ever made; the buffers hold the last min(count, capacity)
+        self._last_time = None
+
+    def reset(self):
+        self.count = 0; self._last_time = None
+
+    def record(self, frame, stats, combat_initiated, pheromone_mass):
+        """
+        Appends one frame: `stats` is team_stats' (teams, 4) agents/armor/kills/spawns block,
+        `combat_initiated` and `pheromone_mass` are per-team arrays. Overwrites the oldest record when full.
+        """
+        now = time.perf_counter()
+        slot = self.count % self.capacity
+        self.frames[slot] = frame
+        self.frame_ms[slot] = (now - self._last_time) * 1000.0 if self._last_time is not None else 0.0
+        row = self.values[slot]
+        row[:, :COMBAT_INITIATED] = stats; row[:, COMBAT_INITIATED] = combat_initiated; row[:, PHEROMONE_MASS] = pheromone_mass
+        self.count += 1; self._last_time = now
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def window(self, n=None):
+        """(frames, frame_ms, values) of the last `n` records (default all held), oldest first."""
+        n = len(self) if n is None else min(n, len(self))
+        slots = np.arange(self.count - n, self.count) % self.capacity
+        return self.frames[slots], self.frame_ms[slots], self.values[slots]
+
+    def series(self, metric, n=None):
+        """(frames, (records, teams) values) of one of TEAM_METRICS over the last `n` records."""
+        frames, _, values = self.window(n)
+        return frames, values[:, :, TEAM_METRICS.index(metric)]
+
+    def to_columns(self, team_ids=None):
+        """
+        The held records as columns: frame, frame_ms and '<team>.<metric>' for `team_ids`
+        (default: every team with any non-zero value).
+        """
+        frames, frame_ms, values = self.window()
+        if team_ids is None: team_ids = np.flatnonzero(np.any(values != 0, axis=(0, 2))).tolist()
+        columns = {'frame': frames, 'frame_ms': frame_ms}
+        for team_id in team_ids:
+            for m, metric in enumerate(TEAM_METRICS):
+                column = values[:, team_id, m]
+                columns[f"{TEAM_ID_TO_NAME[team_id].lower()}.{metric}"] = column if m == PHEROMONE_MASS else column.astype(np.int64)
+        return columns
+
+    def export(self, path, team_ids=None):
+        """Writes to_columns() to `path` as .parquet, .npz or .csv (see src.columnar). Returns the path."""
+        from src.columnar import write_columns
+        return write_columns(self.to_columns(team_ids), path)
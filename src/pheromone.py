@@ -1,46 +1,243 @@
 import numpy as np
-from scipy.ndimage import gaussian_filter
-import pygame
+from numba import jit, prange, types
+from numba.extending import overload
 from collections import deque
 
+BLUR_TRUNCATE = 2.5
+BLUR_SIGNATURE = (types.float32[:, ::1], types.float64[::1], types.float32[:, ::1])
+CLEAR_SIGNATURE = (types.float32[:, ::1], types.float32)
+HALF_UPDATE_SIGNATURE = (types.uint16[:, ::1], types.float32, types.float64[::1], types.float32)
+
+# engine_settings.pheromone_precision. float16 grids take half the memory and bandwidth; Numba has no
+# float16, so kernels take their uint16 bit view (kernel_view) and compute in float32.
+PHEROMONE_DTYPES = {'float32': np.float32, 'float16': np.float16}
+HALF_MAX_BITS = 0x7BFF # 65504, the largest finite float16; larger values saturate there
+
+def pheromone_precision(config):
+    precision = getattr(config, 'pheromone_precision', 'float32')
+    if precision not in PHEROMONE_DTYPES: raise ValueError(f"pheromone_precision must be one of {', '.join(PHEROMONE_DTYPES)}, not '{precision}'.")
+    return precision
+
+def pheromone_dtype(config):
+    return PHEROMONE_DTYPES[pheromone_precision(config)]
+
+def kernel_view(grids):
+    """Pheromone grids as the kernels take them: float32 as they are, float16 as their uint16 bits."""
+    return grids.view(np.uint16) if grids.dtype == np.float16 else grids
+
+@jit(nopython=True, cache=True)
+def half_to_float(bits):
+    """The float32 value of non-negative float16 `bits`."""
+    exponent, mantissa = (np.int64(bits) >> 10) & 0x1F, np.int64(bits) & 0x3FF
+    if exponent == 0: return np.float32(mantissa) * np.float32(5.9604645e-08) # Subnormal: mantissa * 2**-24
+    return np.uint32(((exponent + 112) << 23) | (mantissa << 13)).view(np.float32)
+
+@jit(nopython=True, cache=True)
+def float_to_half(value):
+    """
+    float16 bits of `value`, rounded to nearest even exactly as NumPy's float32 -> float16 cast.
+    Pheromones are never negative: negatives and NaN give 0, and overflow saturates at 65504.
+    """
+    if not value > 0: return np.uint16(0)
+    f = np.int64(np.float32(value).view(np.uint32))
+    f_exp = f & 0x7F800000
+    if f_exp >= 0x47800000: return np.uint16(HALF_MAX_BITS)
+    if f_exp <= 0x38000000:
+        if f_exp < 0x33000000: return np.uint16(0)
+        f_sig = (0x00800000 + (f & 0x007FFFFF)) >> (113 - (f_exp >> 23))
+        if (f_sig & 0x3FFF) != 0x1000 or (f & 0x7FF) != 0: f_sig += 0x1000
+        return np.uint16(f_sig >> 13)
+    f_sig = f & 0x007FFFFF
+    if (f_sig & 0x3FFF) != 0x1000: f_sig += 0x1000
+    return np.uint16(min(((f_exp - 0x38000000) >> 13) + (f_sig >> 13), HALF_MAX_BITS))
+
+def pheromone_at(grid, y, x):
+    """grid[y, x] as float32, for float32 grids and the uint16 views of float16 ones alike."""
+    return np.float32(grid[y, x])
+
+@overload(pheromone_at)
+def _pheromone_at(grid, y, x):
+    if grid.dtype == types.uint16: return lambda grid, y, x: half_to_float(grid[y, x])
+    return lambda grid, y, x: grid[y, x]
+
+def set_pheromone(grid, y, x, value):
+    """Stores `value` at grid[y, x], for float32 grids and the uint16 views of float16 ones alike."""
+    grid[y, x] = value
+
+@overload(set_pheromone)
+def _set_pheromone(grid, y, x, value):
+    if grid.dtype == types.uint16:
+        def store_half(grid, y, x, value): grid[y, x] = float_to_half(np.float32(value))
+        return store_half
+    def store(grid, y, x, value): grid[y, x] = value
+    return store
+
+def gaussian_weights(sigma, truncate=BLUR_TRUNCATE):
+    """The normalised 1-D kernel scipy.ndimage.gaussian_filter uses for the same sigma and truncate."""
+    radius = int(truncate * sigma + 0.5)
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    weights = np.exp(-0.5 / (sigma * sigma) * x * x)
+    return weights / weights.sum()
+
+def pheromone_shape(grid_size, config):
+    """
+    Shape of a pheromone grid for a world of `grid_size`: each pheromone cell covers
+    engine_settings.pheromone_resolution world cells along each axis (1 = full resolution).
+    """
+    resolution = max(1, int(getattr(config, 'pheromone_resolution', 1)))
+    return tuple(-(-int(n) // resolution) for n in grid_size)
+
+@jit(nopython=True, parallel=True, fastmath=True, cache=True)
+def gaussian_blur(grid, weights, out):
+    """
+    Separable Gaussian blur (rows of the kernel along axis 0, then axis 1) with
+    scipy.ndimage's default 'reflect' boundary, written to `out` (which may be `grid`
+    itself). Replaces scipy.ndimage.gaussian_filter so the core simulation does not need SciPy.
+    """
+    h, w = grid.shape
+    radius = len(weights) // 2
+    vertical = np.empty((h, w), dtype=np.float32)
+    for y in prange(h):
+        row = np.zeros(w, dtype=np.float64)
+        for k in range(-radius, radius + 1):
+            yy = y + k
+            if yy < 0: yy = -yy - 1
+            elif yy >= h: yy = 2 * h - yy - 1
+            weight = weights[k + radius]
+            for x in range(w): row[x] += weight * grid[yy, x]
+        for x in range(w): vertical[y, x] = row[x]
+    for y in prange(h):
+        padded = np.empty(w + 2 * radius, dtype=np.float64)
+        for x in range(w): padded[x + radius] = vertical[y, x]
+        for k in range(radius):
+            padded[radius - 1 - k] = vertical[y, k]
+            padded[w + radius + k] = vertical[y, w - 1 - k]
+        for x in range(w):
+            acc = 0.0
+            for k in range(2 * radius + 1): acc += weights[k] * padded[x + k]
+            out[y, x] = acc
+    return out
+
+@jit(nopython=True, parallel=True, fastmath=True, cache=True)
+def clear_below(grid, floor):
+    """Zeroes cells below `floor` in place and returns the grid's (maximum, sum), in one pass over the grid."""
+    h, w = grid.shape
+    row_max = np.zeros(h, dtype=np.float32)
+    row_sum = np.zeros(h, dtype=np.float64)
+    for y in prange(h):
+        peak, total = np.float32(0.0), 0.0
+        for x in range(w):
+            value = grid[y, x]
+            if value < floor: grid[y, x] = 0.0
+            else:
+                total += value
+                if value > peak: peak = value
+        row_max[y], row_sum[y] = peak, total
+    return row_max.max(), row_sum.sum()
+
+@jit(nopython=True, parallel=True, fastmath=True, cache=True)
+def update_half(bits, decay, weights, floor):
+    """
+    Decay, Gaussian blur (`weights`; empty for none) and clear_below of a float16 grid, given
+    as its uint16 `bits`, in place. The stages are fused so the grid is read and written once
+    per update, with float32 arithmetic; decay is applied in the vertical pass, since the blur
+    is linear. Returns the grid's (maximum, sum) like clear_below.
+    """
+    h, w = bits.shape
+    radius = len(weights) // 2
+    row_max = np.zeros(h, dtype=np.float32)
+    row_sum = np.zeros(h, dtype=np.float64)
+    vertical = np.empty((h, w) if radius > 0 else (0, 0), dtype=np.float32)
+    if radius > 0:
+        for y in prange(h):
+            row = np.zeros(w, dtype=np.float32)
+            for k in range(-radius, radius + 1):
+                yy = y + k
+                if yy < 0: yy = -yy - 1
+                elif yy >= h: yy = 2 * h - yy - 1
+                weight = np.float32(weights[k + radius]) * decay
+                for x in range(w): row[x] += weight * half_to_float(bits[yy, x])
+            for x in range(w): vertical[y, x] = row[x]
+    for y in prange(h):
+        row = np.zeros(w, dtype=np.float32)
+        if radius > 0:
+            padded = np.empty(w + 2 * radius, dtype=np.float32)
+            for x in range(w): padded[x + radius] = vertical[y, x]
+            for k in range(radius):
+                padded[radius - 1 - k] = vertical[y, k]
+                padded[w + radius + k] = vertical[y, w - 1 - k]
+            for k in range(2 * radius + 1):
+                weight = np.float32(weights[k])
+                for x in range(w): row[x] += weight * padded[x + k]
+        else:
+            for x in range(w): row[x] = half_to_float(bits[y, x]) * decay
+        peak, total = np.float32(0.0), 0.0
+        for x in range(w):
+            stored = float_to_half(row[x])
+            value = half_to_float(stored)
+            if value < floor: stored, value = np.uint16(0), np.float32(0.0)
+            bits[y, x] = stored
+            total += value
+            if value > peak: peak = value
+        row_max[y], row_sum[y] = peak, total
+    return row_max.max(), row_sum.sum()
+
 class PheromoneManager:
     """
     A self-contained class to manage a single pheromone grid,
     including its data, updates (decay and blur), and rendering.
     """
-    def __init__(self, grid_size, config):
-        self.grid = np.zeros(grid_size, dtype=np.float32)
+    def __init__(self, grid_size, config, grid=None):
+        # `grid` lets the simulation hand out views of one (teams, h, w) array the kernel reads directly
+        self.grid = np.zeros(pheromone_shape(grid_size, config), dtype=pheromone_dtype(config)) if grid is None else grid
+        self.world_size = tuple(grid_size)
         self.config = config
         self.color = (255, 255, 255)
         
         # --- FLICKER FIX: Smoothed normalization ---
         self.max_pheromone_history = deque(maxlen=30) # Store max values for the last 30 frames
         self.smoothed_max = 1.0
+        self._blur_sigma, self._blur_weights = None, None
+        # Set once an update leaves the grid all zero; until the next deposit, updates are no-ops
+        self.empty = False
+        self.mass = 0.0 # Sum of the grid after the last update
 
     def deposit(self, positions, amount=1.0):
         """Adds pheromones at a list of agent positions."""
         if len(positions) > 0:
+            self.empty = False
             y_coords, x_coords = positions[:, 0].astype(int), positions[:, 1].astype(int)
+            if self.grid.shape != self.world_size:
+                # Coarse grid: the same proportional mapping get_next_move senses through
+                y_coords, x_coords = y_coords * self.grid.shape[0] // self.world_size[0], x_coords * self.grid.shape[1] // self.world_size[1]
             y_coords = np.clip(y_coords, 0, self.grid.shape[0] - 1)
             x_coords = np.clip(x_coords, 0, self.grid.shape[1] - 1)
-            self.grid[y_coords, x_coords] += amount
+            if self.grid.dtype == np.float16:
+                # Add in float32 and saturate, as the kernels do, rather than overflowing to inf
+                self.grid[y_coords, x_coords] = np.minimum(self.grid[y_coords, x_coords].astype(np.float32) + amount, 65504.0)
+            else: self.grid[y_coords, x_coords] += amount
 
-    def update(self, frame_count):
-        """Applies decay and the Gaussian blur to the grid."""
-        self.grid *= self.config.pheromone_decay_rate
-        
-        # Only apply the expensive blur operation on even-numbered frames
-        if self.config.pheromone_blur_sigma > 0 and frame_count % 2 == 0:
-            self.grid = gaussian_filter(
-                self.grid, 
-                sigma=self.config.pheromone_blur_sigma, 
-                truncate=2.5
-            )
-        
-        self.grid[self.grid < 0.001] = 0
+    def update(self, blur=True):
+        """
+        Applies decay and, when `blur` is set (the caller's schedule decides), the Gaussian
+        blur to the grid, in place. An all-zero grid stays zero, so it is skipped entirely.
+        """
+        if self.empty: return
+        blur = self.config.pheromone_blur_sigma > 0 and blur
+        if blur and self._blur_sigma != self.config.pheromone_blur_sigma:
+            self._blur_sigma = self.config.pheromone_blur_sigma
+            self._blur_weights = gaussian_weights(self._blur_sigma * self.grid.shape[0] / self.world_size[0])
+        if self.grid.dtype == np.float16:
+            current_max, mass = update_half(kernel_view(self.grid), np.float32(self.config.pheromone_decay_rate),
+                                            self._blur_weights if blur else np.zeros(0), np.float32(0.001))
+        else:
+            self.grid *= self.config.pheromone_decay_rate
+            if blur: gaussian_blur(self.grid, self._blur_weights, self.grid)
+            current_max, mass = clear_below(self.grid, np.float32(0.001))
+        current_max, self.mass = np.float32(current_max), float(mass)
+        self.empty = current_max == 0
         
         # --- FLICKER FIX: Update the smoothed maximum ---
-        current_max = np.max(self.grid)
         if current_max > 0:
             self.max_pheromone_history.append(current_max)
         
@@ -51,7 +248,9 @@ class PheromoneManager:
     def get_render_surface(self):
         """
         Creates the final, colored, and blurred pheromone surface.
+        pygame is imported here so the simulation core does not depend on it.
         """
+        import pygame
         surface_dims = (self.grid.shape[1], self.grid.shape[0])
         glow_surface = pygame.Surface(surface_dims, flags=pygame.SRCALPHA)
         
@@ -62,7 +261,7 @@ class PheromoneManager:
         if self.smoothed_max < 1.0:
             return glow_surface
 
-        norm_grid = self.grid / self.smoothed_max
+        norm_grid = np.divide(self.grid, self.smoothed_max, dtype=np.float32) # Widens float16 storage here, for drawing only
         
         # Transpose is essential to map numpy (h, w) to pygame (w, h)
         norm_grid_t = norm_grid.T
@@ -78,6 +277,7 @@ class PheromoneManager:
         del pixels_rgb
         del pixels_alpha
 
+        if self.grid.shape != self.world_size: glow_surface = pygame.transform.smoothscale(glow_surface, (self.world_size[1], self.world_size[0]))
         return glow_surface
 
     def clear_zone(self, zone_pixels):
@@ -0,0 +1,80 @@
+import time
+import numpy as np
+from numba import jit, prange
+from src.constants import *
+from src.behaviors import get_next_move
+from src.pheromone import gaussian_weights, gaussian_blur, clear_below, update_half, kernel_view
+
+FLOOR = np.float32(0.001) # PheromoneManager.update's clearing threshold
+
+@jit(nopython=True, parallel=True, fastmath=True, cache=True)
+def steering_headings(agent_count, agent_positions, agent_headings, agent_teams, grids, team_motion, grid_h, grid_w, draws):
+    """The heading get_next_move steers every agent to on `grids` (float32, or the uint16 view of float16)."""
+    headings = np.empty(agent_count, dtype=np.float64)
+    for i in prange(agent_count):
+        team_id = agent_teams[i]
+        _, headings[i] = get_next_move(agent_positions[i, 0], agent_positions[i, 1], agent_headings[i], grids[team_id], grid_h, grid_w,
+                                       team_motion[team_id, 0], team_motion[team_id, 1], team_motion[team_id, 2], draws[i])
+    return headings
+
+def compare_steering(sim, draws):
+    """
+    Steers every alive agent of a float32 `sim` on its pheromone grids and on the same grids
+    rounded to float16, with the same tie-break draws. Returns (agent teams, per-agent agreement).
+    """
+    n = int(sim.agent_count)
+    args = (sim.agent_positions[:n], sim.agent_headings[:n], sim.agent_teams[:n])
+    motion, (grid_h, grid_w) = sim.team_motion, sim.grid_size
+    baseline = steering_headings(n, *args, sim.pheromone_grids, motion, grid_h, grid_w, draws[:n])
+    compact = steering_headings(n, *args, kernel_view(sim.pheromone_grids.astype(np.float16)), motion, grid_h, grid_w, draws[:n])
+    return sim.agent_teams[:n], baseline == compact
+
+def compare_update(grid, config, blur):
+    """
+    One decay/blur/clear update of a float32 grid on the float32 path and on the fused float16
+    path from the same starting values. Returns (max error relative to the float32 peak,
+    float32 ms, float16 ms).
+    """
+    decay, sigma = np.float32(config.pheromone_decay_rate), config.pheromone_blur_sigma
+    weights = gaussian_weights(sigma) if blur and sigma > 0 else np.zeros(0)
+    baseline, compact = grid.copy(), grid.astype(np.float16)
+    start = time.perf_counter()
+    baseline *= decay
+    if len(weights): gaussian_blur(baseline, weights, baseline)
+    peak, _ = clear_below(baseline, FLOOR)
+    middle = time.perf_counter()
+    update_half(kernel_view(compact), decay, weights, FLOOR)
+    end = time.perf_counter()
+    error = float(np.abs(compact.astype(np.float32) - baseline).max() / peak) if peak > 0 else 0.0
+    return error, (middle - start) * 1000.0, (end - middle) * 1000.0
+
+def validate(sim, frames, every=60, seed=0):
+    """
+    Steps a float32 `sim` for `frames` and, every `every` frames, compares the steering
+    decisions and one pheromone update against float16 storage. Returns a report dict.
+    """
+    rng = np.random.default_rng(seed)
+    samples, agree_by_team, total_by_team = [], np.zeros(len(TEAMS), dtype=np.int64), np.zeros(len(TEAMS), dtype=np.int64)
+    for frame in range(frames):
+        sim.step(frame, render=False)
+        if frame % every or not sim.agent_count: continue
+        teams, agree = compare_steering(sim, rng.random(sim.max_agents))
+        agree_by_team += np.bincount(teams[agree], minlength=len(TEAMS)); total_by_team += np.bincount(teams, minlength=len(TEAMS))
+        live = [t for t in range(len(TEAMS)) if sim.pheromone_grids[t].any()]
+        stored = max((float(np.abs(sim.pheromone_grids[t].astype(np.float16).astype(np.float32) - sim.pheromone_grids[t]).max() / sim.pheromone_grids[t].max()) for t in live), default=0.0)
+        updates = [compare_update(sim.pheromone_grids[t], sim.config, blur=True) for t in live]
+        samples.append({'frame': frame, 'agents': int(sim.agent_count), 'agreement': float(agree.mean()), 'storage_error': stored,
+                        'update_error': max((u[0] for u in updates), default=0.0),
+                        'float32_update_ms': sum(u[1] for u in updates), 'float16_update_ms': sum(u[2] for u in updates)})
+    decisions = int(total_by_team.sum())
+    return {
+        'frames': frames, 'samples': samples, 'decisions': decisions,
+        'agreement': float(agree_by_team.sum() / decisions) if decisions else 1.0,
+        'agreement_by_team': {TEAM_ID_TO_NAME[t]: float(agree_by_team[t] / total_by_team[t]) for t in np.flatnonzero(total_by_team).tolist()},
+        'max_storage_error': max((s['storage_error'] for s in samples), default=0.0),
+        'max_update_error': max((s['update_error'] for s in samples), default=0.0),
+        # The first sample compiles or loads the kernels, so it is left out of the timings
+        'float32_update_ms': float(np.mean([s['float32_update_ms'] for s in samples[1:]])) if len(samples) > 1 else None,
+        'float16_update_ms': float(np.mean([s['float16_update_ms'] for s in samples[1:]])) if len(samples) > 1 else None,
+        'float32_mb': sim.pheromone_grids.nbytes / 2**20, 'float16_mb': sim.pheromone_grids.nbytes / 2**21,
+    }
@@ -0,0 +1,112 @@
+import time
+import traceback
+import numpy as np
+from src.constants import *
+
+# Fidelity levels run from 0 (the full simulation) to MAX_FIDELITY_LEVEL. Each level halves the
+# pheromone grid's resolution and, through the scheduler's shed level, how often AI retargeting
+# and the pheromone blur run. VFX, audio and rendering are always off in a preview.
+MAX_FIDELITY_LEVEL = 3
+
+def fidelity_overrides(level):
+    """Config overrides of a fidelity level; the stage rates are lowered on the scheduler instead."""
+    if not 0 <= level <= MAX_FIDELITY_LEVEL: raise ValueError(f"Fidelity level must be between 0 and {MAX_FIDELITY_LEVEL}.")
+    return {'pheromone_resolution': 2 ** level}
+
+def lead_changes(series):
+    """
+    How often the sole leader of a (frames, teams) series changes hands. Frames where the
+    lead is tied keep the previous leader, so a tie followed by the same leader is no change.
+    """
+    changes, leader = 0, -1
+    for values in series:
+        top = np.flatnonzero(values == values.max())
+        if len(top) != 1: continue
+        if leader >= 0 and top[0] != leader: changes += 1
+        leader = top[0]
+    return changes
+
+def match_drama(kills, armor, winner_index):
+    """
+    Drama metrics of one match from its per-frame kill counts and armor fractions
+    (frames, teams): lead changes of both, the winner's largest kill deficit to the
+    leader (its comeback) and the final kill margin as a share of all kills.
+    """
+    final = np.sort(kills[-1])[::-1] if len(kills) else np.zeros(2)
+    return {
+        'kill_lead_changes': lead_changes(kills), 'armor_lead_changes': lead_changes(armor),
+        'comeback_kills': int((kills.max(axis=1) - kills[:, winner_index]).max()) if winner_index is not None and len(kills) else 0,
+        'final_kill_margin': float((final[0] - final[1]) / max(1, final.sum())) if len(final) > 1 else 1.0,
+    }
+
+def preview_match(job):
+    """
+    Pool entry point: plays one seed of a layout at the job's fidelity level without
+    rendering, VFX or audio, recording kill counts and armor every frame, and returns
+    its outcome and drama metrics.
+    """
+    from src.headless import load_config
+    from src.simulation import Simulation, NullEffects, STAT_ARMOR
+    start = time.perf_counter()
+    result = {'layout': job['layout'], 'seed': job['seed']}
+    try:
+        config, _ = load_config(job['config'], {**job['overrides'], **fidelity_overrides(job['fidelity'])})
+        effects = NullEffects()
+        sim = Simulation(config, effects, effects, layout_path=job['layout'], seed=job['seed'], render_pheromones=False)
+        sim.scheduler.set_shed_level(job['fidelity'])
+        teams = list(dict.fromkeys(base.team_id for base in sim.bases))
+        initial_armor = np.maximum(sim.team_stats[teams, STAT_ARMOR], 1).astype(np.float64)
+        kills, armor = [], []
+        frame = 0
+        while sim.winner_info is None and frame <= config.total_frames:
+            sim.step(frame, render=False); frame += 1
+            kills.append([sim.kill_counts[t] for t in teams]); armor.append(sim.team_stats[teams, STAT_ARMOR] / initial_armor)
+    except Exception as e:
+        print(traceback.format_exc(), flush=True)
+        result.update({'error': f"{type(e).__name__}: {e}", 'wall_seconds': time.perf_counter() - start})
+        return result
+
+    winner_id = sim.winner_info['id'] if sim.winner_info else -1
+    result.update({
+        'teams': [TEAM_ID_TO_NAME[t] for t in teams],
+        'winner': TEAM_ID_TO_NAME[winner_id] if winner_id >= 0 else None,
+        'win_reason': sim.winner_info['reason'] if sim.winner_info else None,
+        'finish_frame': sim.frame_count, 'total_frames': int(config.total_frames), 'fps': config.fps,
+        'kills': {TEAM_ID_TO_NAME[t]: int(sim.kill_counts[t]) for t in teams},
+        **match_drama(np.array(kills, dtype=np.int64).reshape(-1, len(teams)), np.array(armor).reshape(-1, len(teams)),
+                      teams.index(winner_id) if winner_id in teams else None),
+        'wall_seconds': time.perf_counter() - start,
+    })
+    return result
+
+def summarize_layout(layout, matches, early_fraction=0.5):
+    """
+    Aggregates the previewed seeds of one layout: win probability per team (and of a draw),
+    expected finish frame, the shares of matches ending by elimination and ending before
+    `early_fraction` of the match, mean lead changes and comeback, and the balance score
+    sweeps use (1 when every team won equally often).
+    """
+    matches = [m for m in matches if 'error' not in m]
+    if not matches: return {'layout': layout, 'matches': 0}
+    teams, n = matches[0]['teams'], len(matches)
+    win_probability = {team: sum(m['winner'] == team for m in matches) / n for team in teams}
+    finish = np.array([m['finish_frame'] for m in matches], dtype=np.float64)
+    total_frames, fps = matches[0]['total_frames'], matches[0]['fps']
+    return {
+        'layout': layout, 'matches': n, 'win_probability': win_probability,
+        'draw_probability': sum(m['winner'] is None for m in matches) / n,
+        'balance': 1.0 - (max(win_probability.values()) - min(win_probability.values())),
+        'expected_finish_frame': float(finish.mean()), 'finish_frame_p10': float(np.percentile(finish, 10)), 'finish_frame_p90': float(np.percentile(finish, 90)),
+        'expected_finish_seconds': float(finish.mean() / fps),
+        'elimination_share': sum(m['win_reason'] == 'elimination' for m in matches) / n,
+        'early_finish_share': float(np.mean(finish < early_fraction * total_frames)),
+        'mean_kill_lead_changes': float(np.mean([m['kill_lead_changes'] for m in matches])),
+        'mean_armor_lead_changes': float(np.mean([m['armor_lead_changes'] for m in matches])),
+        'mean_comeback_kills': float(np.mean([m['comeback_kills'] for m in matches])),
+        'mean_final_kill_margin': float(np.mean([m['final_kill_margin'] for m in matches])),
+    }
+
+def rank_layouts(summaries):
+    """Layouts most worth rendering first: balanced outcomes, then the fewest draws and the most lead changes."""
+    return sorted(summaries, key=lambda s: (-s.get('balance', -1.0), s.get('draw_probability', 1.0),
+                                            -(s.get('mean_kill_lead_changes', 0.0) + s.get('mean_armor_lead_changes', 0.0))))
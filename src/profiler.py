@@ -0,0 +1,76 @@
+import csv
+import json
+import time
+import numpy as np
+
+class StageProfiler:
+    """
+    Rolling per-stage frame timings. Instrumented code threads a timestamp through
+    lap() calls:
+
+        t = PROFILER.start()
+        ...work...
+        t = PROFILER.lap('sim.numba_step', t)
+
+    While disabled, start() and lap() return immediately without reading the clock,
+    so instrumentation can stay in the hot loops. Each stage keeps the last `window`
+    samples (milliseconds) in a ring buffer for p50/p95/max.
+    """
+    def __init__(self, window=600):
+        self.window = window
+        self.enabled = False
+        self._samples = {}
+        self._counts = {}
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def reset(self):
+        self._samples.clear(); self._counts.clear()
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, stage, t0):
+        """Records the time since `t0` under `stage` and returns the new timestamp."""
+        if not self.enabled: return 0.0
+        now = time.perf_counter()
+        self.add_sample(stage, (now - t0) * 1000.0)
+        return now
+
+    def add_sample(self, stage, milliseconds):
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = np.zeros(self.window, dtype=np.float64)
+            self._counts[stage] = 0
+        samples[self._counts[stage] % self.window] = milliseconds
+        self._counts[stage] += 1
+
+    def stats(self):
+        """{stage: {'p50', 'p95', 'max', 'mean', 'count'}} over each stage's rolling window, in milliseconds."""
+        result = {}
+        for stage, samples in self._samples.items():
+            count = self._counts[stage]
+            window = samples[:min(count, self.window)]
+            p50, p95 = np.percentile(window, (50, 95))
+            result[stage] = {'p50': float(p50), 'p95': float(p95), 'max': float(window.max()), 'mean': float(window.mean()), 'count': count}
+        return result
+
+    def report_lines(self):
+        """One formatted line per stage, slowest p95 first, for overlays and logs."""
+        stats = sorted(self.stats().items(), key=lambda item: -item[1]['p95'])
+        return [f"{stage:<24} p50 {s['p50']:6.2f}  p95 {s['p95']:6.2f}  max {s['max']:6.2f} ms" for stage, s in stats]
+
+    def export(self, path):
+        """Writes stats() to `path` as CSV (one row per stage) or, for any other extension, JSON."""
+        stats = self.stats()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['stage', 'p50_ms', 'p95_ms', 'max_ms', 'mean_ms', 'count'])
+                for stage, s in sorted(stats.items()): writer.writerow([stage, s['p50'], s['p95'], s['max'], s['mean'], s['count']])
+        else:
+            with open(path, 'w') as f: json.dump(stats, f, indent=4)
+
+# Process-wide profiler shared by the simulation, renderer and dashboard
+PROFILER = StageProfiler()
@@ -0,0 +1,234 @@
+import os
+import json
+import numpy as np
+from types import SimpleNamespace
+from src.constants import *
+from src.base import Base
+from src.pheromone import PheromoneManager
+from src.scheduler import StageScheduler
+
+REPLAY_VERSION = 1
+POSITION_SCALE = 8 # Positions are stored as int16 in 1/8 pixel units
+
+def position_scale_for(grid_size):
+    """POSITION_SCALE, halved until the arena's far edge still fits in int16 (arenas beyond 4095 cells)."""
+    scale = POSITION_SCALE
+    while scale > 1 and max(grid_size) * scale > np.iinfo(np.int16).max: scale //= 2
+    return scale
+
+STREAMS = ('frames', 'absolute', 'teams', 'deltas', 'survivors', 'events')
+
+FRAME_DTYPE = np.dtype([
+    ('agent_count', np.int32), ('survivor_count', np.int32), ('keyframe', np.uint8),
+    ('absolute_offset', np.int64), ('delta_offset', np.int64), ('survivor_offset', np.int64),
+    ('event_offset', np.int64), ('event_count', np.int32),
+    ('kill_counts', np.int32, (len(TEAMS),)), ('dead_mask', np.uint16), ('winner_id', np.int8), ('winner_reason', np.uint8),
+])
+EVENT_DTYPE = np.dtype([('kind', np.uint8), ('a', np.int16), ('b', np.int16), ('c', np.int16)])
+EVENT_EXPLOSION, EVENT_BASE_DAMAGE, EVENT_ARMOR_LOST = 0, 1, 2 # (y, x, team), (base,), (base, y, x)
+WIN_REASONS = (None, 'elimination', 'kills', 'draw')
+NO_WINNER = -2
+
+class ReplayRecorder:
+    """
+    Streams a match to a replay directory while it is simulated: a frame-0 checkpoint
+    (start.npz) plus append-only binary streams that np.memmap can open directly.
+
+    Agents are stored as quantised int16 positions. Every `keyframe_interval` frames
+    all positions are written; in between only the survivors' int8 deltas against
+    the previous frame, a survivor bitmask and the newly spawned agents. Kills, base
+    hits and lost armor pixels are written as events.
+    """
+    def __init__(self, path, sim, keyframe_interval=120):
+        self.path, self.keyframe_interval = path, keyframe_interval
+        os.makedirs(path, exist_ok=True)
+        sim.save_checkpoint(os.path.join(path, 'start.npz'), sim.frame_count, compressed=True)
+        self.meta = {
+            'version': REPLAY_VERSION, 'position_scale': position_scale_for(sim.grid_size), 'keyframe_interval': keyframe_interval,
+            'start_frame': None, 'seed': sim.seed, 'config': vars(sim.config),
+            'deposit_amounts': [float(sim.get_param(t['id'], 'pheromone_deposit_amount')) for t in TEAMS],
+        }
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), 'wb') for name in STREAMS}
+        self.offsets = dict.fromkeys(STREAMS, 0)
+        self.num_frames = 0
+        self.previous = None
+        self.armor = [set(base.current_armor_pixels) for base in sim.bases]
+
+    def _write(self, name, array):
+        array.tofile(self.files[name])
+        offset = self.offsets[name]; self.offsets[name] += len(array)
+        return offset
+
+    def record(self, sim):
+        """Appends the state `sim` reached in its last step()."""
+        if self.meta['start_frame'] is None: self.meta['start_frame'] = int(sim.frame_count)
+        n = sim.agent_count
+        quantised = np.floor(sim.agent_positions[:n] * self.meta['position_scale']).astype(np.int16)
+        teams = sim.agent_teams[:n].astype(np.int8)
+        survivors = sim.last_survivors
+        kept = int(np.count_nonzero(survivors))
+
+        row = np.zeros(1, dtype=FRAME_DTYPE)[0]
+        row['agent_count'], row['survivor_count'] = n, kept
+        keyframe = self.previous is None or self.num_frames % self.keyframe_interval == 0 or len(survivors) != len(self.previous)
+        if not keyframe:
+            delta = quantised[:kept].astype(np.int32) - self.previous[survivors]
+            keyframe = len(delta) > 0 and np.abs(delta).max() > 127
+        row['keyframe'] = keyframe
+        if keyframe:
+            row['absolute_offset'] = self._write('absolute', quantised)
+            self._write('teams', teams)
+        else:
+            row['survivor_offset'] = self._write('survivors', np.packbits(survivors))
+            row['delta_offset'] = self._write('deltas', delta.astype(np.int8))
+            row['absolute_offset'] = self._write('absolute', quantised[kept:])
+            self._write('teams', teams[kept:])
+        self.previous = quantised
+
+        events = [(EVENT_EXPLOSION, y, x, team) for y, x, team in sim.last_explosions]
+        for index, base in enumerate(sim.bases):
+            if base.last_damage_frame == sim.frame_count: events.append((EVENT_BASE_DAMAGE, index, 0, 0))
+            if len(base.current_armor_pixels) != len(self.armor[index]):
+                remaining = set(base.current_armor_pixels)
+                events.extend((EVENT_ARMOR_LOST, index, y, x) for y, x in self.armor[index] - remaining)
+                self.armor[index] = remaining
+        packed = np.zeros(len(events), dtype=EVENT_DTYPE)
+        if events:
+            columns = np.array(events, dtype=np.int64)
+            for i, field in enumerate(EVENT_DTYPE.names): packed[field] = columns[:, i]
+        row['event_offset'] = self._write('events', packed)
+        row['event_count'] = len(events)
+
+        row['kill_counts'] = [sim.kill_counts[t['id']] for t in TEAMS]
+        row['dead_mask'] = sum(1 << int(team_id) for team_id in sim.dead_teams)
+        row['winner_id'] = sim.winner_info['id'] if sim.winner_info else NO_WINNER
+        row['winner_reason'] = WIN_REASONS.index(sim.winner_info['reason']) if sim.winner_info else 0
+        self._write('frames', np.array([row], dtype=FRAME_DTYPE))
+        self.num_frames += 1
+
+    def close(self):
+        for f in self.files.values(): f.close()
+        self.meta['num_frames'] = self.num_frames
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f: json.dump(self.meta, f, indent=4)
+
+class ReplayReader:
+    """Memory-maps a replay directory and decodes agent frames, caching the last one for sequential playback."""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r') as f: self.meta = json.load(f)
+        if self.meta['version'] != REPLAY_VERSION: raise ValueError(f"Unsupported replay version {self.meta['version']}")
+        dtypes = {'frames': FRAME_DTYPE, 'absolute': np.dtype((np.int16, 2)), 'teams': np.int8, 'deltas': np.dtype((np.int8, 2)), 'survivors': np.uint8, 'events': EVENT_DTYPE}
+        self.streams = {}
+        for name, dtype in dtypes.items():
+            stream_path = os.path.join(path, f"{name}.bin")
+            self.streams[name] = np.memmap(stream_path, dtype=dtype, mode='r') if os.path.getsize(stream_path) else np.zeros(0, dtype=dtype)
+        self.frames = self.streams['frames']
+        self.config = SimpleNamespace(**self.meta['config'])
+        self.scale = self.meta['position_scale']
+        self._cached_index, self._cached = None, None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _decode(self, index, previous):
+        row = self.frames[index]
+        n, offset = int(row['agent_count']), int(row['absolute_offset'])
+        absolute, teams = self.streams['absolute'], self.streams['teams']
+        if row['keyframe']: return np.array(absolute[offset:offset + n], dtype=np.int16), np.array(teams[offset:offset + n])
+        prev_positions, prev_teams = previous
+        kept = int(row['survivor_count'])
+        survivor_offset = int(row['survivor_offset'])
+        mask = np.unpackbits(self.streams['survivors'][survivor_offset:survivor_offset + (len(prev_positions) + 7) // 8], count=len(prev_positions)).astype(np.bool_)
+        positions = np.empty((n, 2), dtype=np.int16); frame_teams = np.empty(n, dtype=np.int8)
+        delta_offset = int(row['delta_offset'])
+        positions[:kept] = prev_positions[mask] + self.streams['deltas'][delta_offset:delta_offset + kept]
+        frame_teams[:kept] = prev_teams[mask]
+        positions[kept:] = absolute[offset:offset + n - kept]; frame_teams[kept:] = teams[offset:offset + n - kept]
+        return positions, frame_teams
+
+    def agents(self, index):
+        """Returns (quantised positions, teams) of frame `index`, decoding forward from the nearest keyframe."""
+        if self._cached_index is not None and self._cached_index <= index:
+            start, state = self._cached_index + 1, self._cached
+        else:
+            start = index
+            while not self.frames[start]['keyframe']: start -= 1
+            state = None
+        for i in range(start, index + 1): state = self._decode(i, state)
+        self._cached_index, self._cached = index, state
+        return state
+
+    def events(self, index):
+        row = self.frames[index]
+        offset = int(row['event_offset'])
+        return self.streams['events'][offset:offset + int(row['event_count'])]
+
+class ReplayWorld:
+    """
+    Stand-in for Simulation that plays a replay back: step(frame) exposes the same
+    attributes LiveRenderer reads, fires the recorded explosions and base hits into
+    the VFX and audio managers, and rebuilds pheromones from the recorded positions.
+    """
+    def __init__(self, reader, vfx_manager, audio_manager):
+        self.reader, self.vfx_manager, self.audio_manager = reader, vfx_manager, audio_manager
+        self.config = reader.config; self.seed = reader.meta['seed']
+        self.start_frame = reader.meta['start_frame']; self.frame_count = self.start_frame
+        self.deposit_amounts = reader.meta['deposit_amounts']
+        with np.load(os.path.join(reader.path, 'start.npz')) as data:
+            start = json.loads(data['meta'].tobytes().decode())
+            self.grid_size = tuple(start['grid_size'])
+            self.alliance_map = data['alliance_map'].copy()
+            self.bases = [Base.from_state(state, self.config, self.grid_size[0], self.grid_size[1], data[f'base{i}_core'], data[f'base{i}_armor'], data[f'base{i}_all'])
+                          for i, state in enumerate(start['bases'])]
+            self.pheromone_managers = {}
+            for t in TEAMS:
+                manager = PheromoneManager(self.grid_size, self.config); manager.color = t['pheromone_color']
+                manager.grid[:] = data['pheromone_grids'][t['id']]; manager.smoothed_max = float(data['pheromone_smoothed_max'][t['id']])
+                manager.max_pheromone_history.extend(v for v in data['pheromone_max_history'][t['id']] if not np.isnan(v))
+                self.pheromone_managers[t['id']] = manager
+        self.pheromone_surfaces = {team_id: manager.get_render_surface() for team_id, manager in self.pheromone_managers.items()}
+        self.scheduler = StageScheduler.from_config(self.config)
+        self.armor = [set(base.current_armor_pixels) for base in self.bases]
+        self.agent_positions = np.zeros((0, 2), dtype=np.float32); self.agent_teams = np.zeros(0, dtype=np.int8)
+        self.agent_health = np.zeros(0, dtype=np.int32); self.agent_count = 0
+        self.kill_counts = {t['id']: 0 for t in TEAMS}; self.dead_teams = set(); self.winner_info = None
+
+    @property
+    def num_frames(self):
+        return len(self.reader)
+
+    def step(self, frame_count):
+        self.frame_count = frame_count
+        index = frame_count - self.start_frame
+        quantised, teams = self.reader.agents(index)
+        row = self.reader.frames[index]
+
+        changed_bases = set()
+        for kind, a, b, c in self.reader.events(index).tolist():
+            if kind == EVENT_EXPLOSION:
+                self.vfx_manager.create_explosion(a, b, TEAMS[c]["color"], frame_count)
+            elif kind == EVENT_BASE_DAMAGE:
+                self.bases[a].last_damage_frame = frame_count
+                self.audio_manager.add_sfx(frame_count, 'crack')
+            elif kind == EVENT_ARMOR_LOST:
+                self.armor[a].discard((b, c)); changed_bases.add(a)
+        for index_changed in changed_bases: self.bases[index_changed].current_armor_pixels = list(self.armor[index_changed])
+
+        # Pheromones are deposited by the survivors before spawning, exactly as Simulation.step does
+        self.agent_positions = (quantised.astype(np.float32) + 0.5) / self.reader.scale
+        self.agent_teams = teams; self.agent_count = len(teams); self.agent_health = np.ones(self.agent_count, dtype=np.int32)
+        kept = int(row['survivor_count'])
+        active_team_ids = np.unique(teams[:kept])
+        for team_id in active_team_ids:
+            team_mask = teams[:kept] == team_id
+            self.pheromone_managers[team_id].deposit(self.agent_positions[:kept][team_mask], self.deposit_amounts[team_id])
+        blur = self.scheduler.due('pheromone_blur', frame_count)
+        for manager in self.pheromone_managers.values(): manager.update(blur)
+        self.scheduler.run('pheromone_colourise', frame_count, lambda: self.pheromone_surfaces.update(
+            (team_id, self.pheromone_managers[team_id].get_render_surface()) for team_id in active_team_ids))
+
+        self.kill_counts = {t['id']: int(row['kill_counts'][t['id']]) for t in TEAMS}
+        self.dead_teams = {t['id'] for t in TEAMS if int(row['dead_mask']) >> t['id'] & 1}
+        if self.winner_info is None and row['winner_id'] != NO_WINNER:
+            self.winner_info = {'id': int(row['winner_id']), 'reason': WIN_REASONS[int(row['winner_reason'])]}
+            self.vfx_manager.create_winner_celebration(self.winner_info['id'], self.grid_size[1] // 2, self.grid_size[0] // 2)
@@ -0,0 +1,162 @@
+import time
+
+class Stage:
+    """
+    One periodically run simulation stage.
+
+    An aligned stage runs on every frame that is a multiple of `every`, so its cadence
+    only depends on the frame number; stages that feed back into the simulation are
+    aligned, which keeps runs reproducible across checkpoint restores. An unaligned
+    stage runs once `every` frames have passed since it last ran, so a run skipped
+    (e.g. on an intermediate substep) happens at the next chance instead of being lost.
+
+    With a `budget_ms`, the stage is unaligned and its interval adapts between 1 and
+    `max_every` so that its smoothed cost spread over the interval fits the budget.
+    """
+    def __init__(self, name, every=1, aligned=True, budget_ms=None, max_every=8):
+        self.name = name
+        self.every = max(1, int(every))
+        self.budget_ms = budget_ms
+        self.aligned = aligned and budget_ms is None
+        self.max_every = max_every
+        self.slowdown = 1 # Multiplier applied by load shedding
+        self.last_run = None
+        self.cost_ms = 0.0
+
+    @property
+    def interval(self):
+        return self.every * self.slowdown
+
+    def due(self, frame_count):
+        if self.aligned: return frame_count % self.interval == 0
+        return self.last_run is None or frame_count - self.last_run >= self.interval or frame_count < self.last_run
+
+    def record(self, frame_count, milliseconds):
+        self.last_run = frame_count
+        if self.budget_ms is None: return
+        self.cost_ms = milliseconds if self.cost_ms == 0.0 else 0.8 * self.cost_ms + 0.2 * milliseconds
+        self.every = min(self.max_every, max(1, int(-(-self.cost_ms // self.budget_ms))))
+
+class StageScheduler:
+    """
+    Owns the rates of the simulation's periodic stages so they are declared in one
+    place rather than as frame-parity checks scattered through the step code:
+
+        if scheduler.due('pheromone_blur', frame_count): ...
+        scheduler.run('pheromone_colourise', frame_count, colourise)
+
+    Stages flagged cosmetic only affect what is drawn; callers stepping several
+    frames per displayed frame pass render=False on intermediate substeps to skip them.
+    """
+    def __init__(self, stages=(), cosmetic=(), sheddable=()):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cosmetic = set(cosmetic)
+        self.sheddable = set(sheddable)
+        self.shed_level = 0
+
+    @classmethod
+    def from_config(cls, config):
+        scheduler = cls(cosmetic=('pheromone_colourise',), sheddable=('ai_retarget', 'pheromone_blur'))
+        scheduler.configure(config)
+        return scheduler
+
+    def configure(self, config):
+        """(Re)reads the stage rates from config; keeps adaptive state for stages whose settings did not change."""
+        colourise_budget = getattr(config, 'pheromone_colourise_budget_ms', None)
+        specs = {
+            # Staggered per agent inside the kernel: agent i retargets when frame % every == i % every
+            'ai_retarget': dict(every=int(getattr(config, 'ai_update_interval', 10))),
+            'pheromone_blur': dict(every=int(getattr(config, 'pheromone_blur_interval', 2))),
+            'pheromone_colourise': dict(every=int(getattr(config, 'pheromone_colourise_interval', 2)), aligned=False,
+                                        budget_ms=float(colourise_budget) if colourise_budget else None),
+        }
+        for name, spec in specs.items():
+            stage = self.stages.get(name)
+            if stage is None or stage.budget_ms != spec.get('budget_ms') or (stage.budget_ms is None and stage.every != spec['every']):
+                self.stages[name] = Stage(name, **spec)
+        self.set_shed_level(self.shed_level)
+
+    def set_shed_level(self, level):
+        """Runs the sheddable stages (AI retargeting, pheromone blur) 2**level times less often; 0 restores the configured rates."""
+        self.shed_level = level
+        for name in self.sheddable:
+            if name in self.stages: self.stages[name].slowdown = 2 ** level
+
+    def interval(self, name):
+        return self.stages[name].interval
+
+    def due(self, name, frame_count, render=True):
+        if not render and name in self.cosmetic: return False
+        return self.stages[name].due(frame_count)
+
+    def run(self, name, frame_count, fn, render=True):
+        """Calls fn() if the stage is due, recording its cost for adaptive stages. Returns whether it ran."""
+        if not self.due(name, frame_count, render): return False
+        start = time.perf_counter()
+        fn()
+        self.stages[name].record(frame_count, (time.perf_counter() - start) * 1000.0)
+        return True
+
+    def reset(self):
+        for stage in self.stages.values(): stage.last_run = None
+
+class FrameGovernor:
+    """
+    Keeps the live dashboard near a target frame time by choosing how many simulation
+    substeps to run per displayed frame, up to the requested speed. It tracks smoothed
+    costs of one step and of everything else in a frame (UI, rendering, flip) and runs
+    as many steps as fit in what is left of the budget, always at least one.
+
+    With shed_load, a frame that still falls short of the requested speed for a while
+    raises the scheduler's shed level (AI retargeting and blur run less often) one step
+    at a time up to max_shed_level, and lowers it again once there is headroom.
+    """
+    def __init__(self, target_fps=60, shed_load=False, max_shed_level=2, patience=30):
+        self.target_ms = 1000.0 / target_fps
+        self.shed_load, self.max_shed_level, self.patience = shed_load, max_shed_level, patience
+        self.step_ms = None
+        self.overhead_ms = 0.0
+        self.substeps = 1
+        self.sim_rate = 0.0 # Simulation frames per wall-clock second
+        self._short_frames = 0
+        self._spare_frames = 0
+        self._last_frame_end = None
+
+    def plan(self, requested):
+        """Substeps to run this frame for a requested speed."""
+        if self.step_ms is None: self.substeps = 1
+        else: self.substeps = int(max(1, min(requested, (self.target_ms - self.overhead_ms) // max(self.step_ms, 1e-3))))
+        return self.substeps
+
+    def record_step(self, seconds):
+        milliseconds = seconds * 1000.0
+        self.step_ms = milliseconds if self.step_ms is None else 0.9 * self.step_ms + 0.1 * milliseconds
+
+    def end_frame(self, requested, work_seconds, sim_seconds, steps, scheduler=None):
+        """
+        Called once per displayed frame with the time spent working (excluding the frame
+        cap wait) and the part of it spent stepping. Updates the cost estimates, the
+        effective simulation rate and, if enabled, the scheduler's shed level.
+        """
+        self.overhead_ms = 0.9 * self.overhead_ms + 0.1 * max(0.0, (work_seconds - sim_seconds) * 1000.0)
+        now = time.perf_counter()
+        if self._last_frame_end is not None:
+            elapsed = now - self._last_frame_end
+            if elapsed > 0: self.sim_rate = 0.9 * self.sim_rate + 0.1 * steps / elapsed
+        self._last_frame_end = now
+        if not (self.shed_load and scheduler is not None and steps): return
+        if self.substeps < requested:
+            self._short_frames += 1; self._spare_frames = 0
+            if self._short_frames >= self.patience and scheduler.shed_level < self.max_shed_level:
+                scheduler.set_shed_level(scheduler.shed_level + 1); self._short_frames = 0
+        elif work_seconds * 1000.0 < 0.7 * self.target_ms:
+            self._spare_frames += 1; self._short_frames = 0
+            if self._spare_frames >= 4 * self.patience and scheduler.shed_level > 0:
+                scheduler.set_shed_level(scheduler.shed_level - 1); self._spare_frames = 0
+        else:
+            self._short_frames = self._spare_frames = 0
+
+    def reset(self, scheduler=None):
+        """Forgets the shed level, e.g. before a recording that must use the configured rates."""
+        self._short_frames = self._spare_frames = 0
+        if scheduler is not None: scheduler.set_shed_level(0)
@@ -0,0 +1,320 @@
+import os
+import time
+import queue
+import shutil
+import tempfile
+import multiprocessing
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+import numpy as np
+from src.constants import *
+from src.pheromone import PheromoneManager, pheromone_shape, pheromone_dtype, pheromone_precision
+from src.replay import NO_WINNER, WIN_REASONS
+from src.scheduler import StageScheduler
+from src.simulation import TEAM_STATS, STAT_AGENTS, STAT_ARMOR, STAT_SPAWNS, NullEffects
+
+# Slots of the control block: the slot of the latest complete frame, the slot the dashboard holds, child's steps/s
+PUBLISHED, READING, SIM_RATE = range(3)
+# A step raises at most one explosion per agent slot (Simulation.vfx_events); a frame slot holds this many steps' worth
+EXPLOSION_STEPS = 4
+
+def frame_layout(grid_size, pheromone_size, pheromone_dtype, max_agents):
+    """(name, shape, dtype) of the arrays in one frame slot. Pheromones keep the simulation's storage dtype."""
+    teams = len(TEAMS)
+    return (
+        ('generation', (1,), np.int64), ('frame_count', (1,), np.int64), ('agent_count', (1,), np.int64), ('explosion_count', (1,), np.int64),
+        ('explosions_dropped', (1,), np.int64), ('winner', (2,), np.int64), ('dead_teams', (teams,), np.bool_), ('kill_counts', (teams,), np.int64),
+        ('team_stats', (teams, len(TEAM_STATS)), np.int64), ('last_damage', (teams,), np.int64),
+        ('smoothed_max', (teams,), np.float64), ('pheromone_mass', (teams,), np.float64),
+        ('agent_positions', (max_agents, 2), np.float32), ('agent_teams', (max_agents,), np.int8),
+        ('explosions', (EXPLOSION_STEPS * max_agents, 3), np.int32),
+        ('terrain', tuple(grid_size), np.uint8), ('pheromones', (teams,) + tuple(pheromone_size), pheromone_dtype),
+    )
+
+class SharedFrames:
+    """
+    Two frame slots and a small control block in one multiprocessing.shared_memory block.
+
+    The child writes a frame into the slot the dashboard is not holding and publishes it;
+    the dashboard takes the latest published slot and reads it in place until it takes
+    the next one. Only the slot indices are exchanged under the lock, never the frame data.
+    """
+    def __init__(self, grid_size, pheromone_size, pheromone_dtype, max_agents, lock, name=None):
+        self.lock = lock
+        specs = [('control', (3,), np.float64)] + [(f'{slot}.{name_}', shape, dtype) for slot in range(2) for name_, shape, dtype in frame_layout(grid_size, pheromone_size, pheromone_dtype, max_agents)]
+        offsets, size = [], 0
+        for _, shape, dtype in specs:
+            offsets.append(size)
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 64) * 64 # 64-byte aligned
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        arrays = {name_: np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset) for (name_, shape, dtype), offset in zip(specs, offsets)}
+        self.control = arrays['control']
+        self.slots = [{name_.split('.', 1)[1]: array for name_, array in arrays.items() if name_.startswith(f'{slot}.')} for slot in range(2)]
+        if name is None: self.control[:] = (-1, -1, 0.0)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def begin_write(self):
+        """Child side: returns the slot to write the next frame into, or None while the last published frame is still unread."""
+        with self.lock:
+            published, reading = int(self.control[PUBLISHED]), int(self.control[READING])
+            if published >= 0 and published != reading: return None
+            slot = 1 - reading if reading >= 0 else 0
+            if published == slot: self.control[PUBLISHED] = -1
+            return slot
+
+    def publish(self, slot):
+        with self.lock: self.control[PUBLISHED] = slot
+
+    def acquire(self, held):
+        """Dashboard side: takes the latest published slot if it is newer than `held`; returns the slot now held."""
+        with self.lock:
+            published = int(self.control[PUBLISHED])
+            if published < 0 or published == held: return held
+            self.control[READING] = published
+            return published
+
+    def close(self, unlink=False):
+        self.control = self.slots = None
+        try: self.shm.close()
+        except BufferError: pass # Views are still referenced; the mapping goes when the process exits
+        if unlink: self.shm.unlink()
+
+def _publish(frames, sim, generation, explosions, dropped):
+    """Copies the state the dashboard draws into a free slot. Returns False (keep `explosions`) if none is free."""
+    slot = frames.begin_write()
+    if slot is None: return False
+    arrays, n = frames.slots[slot], sim.agent_count
+    arrays['generation'][0] = generation; arrays['frame_count'][0] = sim.frame_count; arrays['agent_count'][0] = n
+    arrays['agent_positions'][:n] = sim.agent_positions[:n]; arrays['agent_teams'][:n] = sim.agent_teams[:n]
+    events = np.concatenate(explosions) if explosions else np.zeros((0, 3), dtype=np.int32)
+    arrays['explosions'][:len(events)] = events; arrays['explosion_count'][0] = len(events); arrays['explosions_dropped'][0] = dropped
+    arrays['kill_counts'][:] = [sim.kill_counts[t['id']] for t in TEAMS]
+    arrays['team_stats'][:] = sim.team_stats
+    arrays['dead_teams'][:] = [t['id'] in sim.dead_teams for t in TEAMS]
+    arrays['winner'][:] = (sim.winner_info['id'], WIN_REASONS.index(sim.winner_info['reason'])) if sim.winner_info else (NO_WINNER, 0)
+    arrays['last_damage'][:] = -100
+    for base in sim.bases: arrays['last_damage'][base.team_id] = max(arrays['last_damage'][base.team_id], base.last_damage_frame)
+    arrays['smoothed_max'][:] = [sim.pheromone_managers[t['id']].smoothed_max for t in TEAMS]
+    arrays['pheromone_mass'][:] = sim.pheromone_mass()
+    arrays['terrain'][:] = sim.render_grid
+    arrays['pheromones'][:] = sim.pheromone_grids # Same dtype: a plain copy, float16 stays half the bytes
+    frames.publish(slot)
+    return True
+
+def _child_main(shm_name, grid_size, max_agents, lock, commands, replies, config_values, layout_path):
+    """
+    Child process loop: applies dashboard commands in order and, while running, steps the
+    simulation at up to the requested steps per second, publishing a frame whenever the
+    dashboard has taken the previous one. Explosions of unpublished steps are carried over,
+    up to the slot's capacity; beyond it the oldest are dropped and counted.
+    """
+    from src.simulation import Simulation, warm_up_kernels
+    config = SimpleNamespace(**config_values); effects = NullEffects() # Explosions reach the dashboard through the frame slots
+    sim = Simulation(config, effects, effects, layout_path=layout_path, render_pheromones=False)
+    frames = SharedFrames(grid_size, sim.pheromone_grids.shape[1:], sim.pheromone_grids.dtype, max_agents, lock, name=shm_name)
+    warm_up_kernels(pheromone_precision(config))
+    frame_count, generation, running, steps_per_second = 0, 0, False, 60.0
+    explosions, carried, dropped, next_step = [], 0, 0, time.perf_counter()
+    capacity = len(frames.slots[0]['explosions'])
+    rate_start, rate_steps = time.perf_counter(), 0
+    while True:
+        try: command = commands.get(block=not running)
+        except queue.Empty: command = None
+        if command is not None:
+            kind, args = command[0], command[1:]
+            if kind == 'stop': break
+            elif kind == 'config':
+                for key, value in args[0].items(): setattr(config, key, value)
+                sim._compile_team_params()
+            elif kind == 'team_param':
+                team_id, key, value = args
+                sim.team_params_overrides.setdefault(team_id, {})[key] = value; sim._compile_team_params()
+            elif kind == 'alliances': sim.set_alliance_map(args[0])
+            elif kind == 'load': frame_count = sim.load_checkpoint(args[0]); generation = args[1]; explosions, carried, dropped = [], 0, 0
+            elif kind == 'save':
+                sim.save_checkpoint(args[0], frame_count); replies.put(('saved', args[0], frame_count))
+            elif kind == 'run':
+                running, steps_per_second = True, float(args[0])
+                next_step = rate_start = time.perf_counter(); rate_steps = 0
+            elif kind == 'pause': running = False; frames.control[SIM_RATE] = 0.0
+            continue # Apply every queued command before the next step
+
+        now = time.perf_counter()
+        if now < next_step:
+            time.sleep(min(next_step - now, 0.002)); continue
+        next_step = max(next_step, now - 0.25) + 1.0 / steps_per_second # Do not burst to catch up after a stall
+        sim.step(frame_count, render=False); frame_count += 1
+        if len(sim.last_explosions):
+            explosions.append(sim.last_explosions); carried += len(sim.last_explosions)
+            while carried > capacity: # The dashboard is behind; keep the newest events that fit
+                excess = min(carried - capacity, len(explosions[0]))
+                dropped += excess; carried -= excess
+                explosions[0] = explosions[0][excess:]
+                if not len(explosions[0]): explosions.pop(0)
+        if _publish(frames, sim, generation, explosions, dropped): explosions, carried = [], 0
+        rate_steps += 1
+        if now - rate_start >= 0.5:
+            frames.control[SIM_RATE] = rate_steps / (now - rate_start); rate_start, rate_steps = now, 0
+    frames.close()
+
+class SimulationProcess:
+    """
+    Runs the dashboard's simulation in a spawned child process, so a slow step never
+    blocks the UI and UI work never throttles the simulation. State moves between the
+    dashboard's own Simulation and the child as checkpoints (push_state/pull_state);
+    while the child runs, frames come back through SharedFrames and parameter changes
+    go to it over a command queue.
+    """
+    def __init__(self, config, grid_size, max_agents, layout_path):
+        context = multiprocessing.get_context('spawn') # fork is unsafe once Numba's or SDL's threads exist
+        self.frames = SharedFrames(grid_size, pheromone_shape(grid_size, config), pheromone_dtype(config), max_agents, context.Lock())
+        self.commands, self.replies = context.Queue(), context.Queue()
+        self.handoff_dir = tempfile.mkdtemp(prefix='chromaplasm_')
+        self.process = context.Process(target=_child_main, daemon=True,
+                                       args=(self.frames.name, tuple(grid_size), max_agents, self.frames.lock, self.commands, self.replies, dict(vars(config)), layout_path))
+        self.process.start()
+        self.running = False
+        self.held = -1
+        self.generation = 0 # Bumped per push_state, so frames of an earlier run are never shown
+        self.pushed = None # Checkpoint of the last push_state, until its state is pulled back or discarded
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    @property
+    def sim_rate(self):
+        return float(self.frames.control[SIM_RATE])
+
+    def send(self, *command):
+        self.commands.put(command)
+
+    def push_state(self, sim, next_frame):
+        """Hands the dashboard simulation's state (config included) to the child, continuing at `next_frame`."""
+        path = os.path.join(self.handoff_dir, f'push_{self.generation + 1}.npz')
+        sim.save_checkpoint(path, next_frame)
+        self.generation += 1; self.pushed = path
+        self.send('config', dict(vars(sim.config))); self.send('load', path, self.generation)
+
+    def save_checkpoint(self, path, timeout=30.0):
+        """Has the child write a checkpoint of its current state to `path`; returns its next frame, or None on timeout."""
+        self.send('save', path)
+        deadline = time.perf_counter() + timeout
+        while True:
+            if not self.alive:
+                print(f"ERROR: simulation process exited (code {self.process.exitcode})."); return None
+            try: next_frame = self.replies.get(timeout=min(0.1, max(0.0, deadline - time.perf_counter())))[2]; break
+            except queue.Empty:
+                if time.perf_counter() >= deadline:
+                    print(f"ERROR: simulation process did not answer within {timeout:.0f}s."); return None
+        # Commands run in order, so every state pushed before this request has been loaded
+        for name in os.listdir(self.handoff_dir):
+            if name.startswith('push_'): os.remove(os.path.join(self.handoff_dir, name))
+        return next_frame
+
+    def pull_state(self, sim):
+        """Loads the child's current state into the dashboard simulation; returns the frame to continue from."""
+        path = os.path.join(self.handoff_dir, 'pull.npz')
+        next_frame = self.save_checkpoint(path)
+        if next_frame is None: return None
+        self.pushed = None
+        return sim.load_checkpoint(path)
+
+    def restore_pushed(self, sim):
+        """
+        Reloads the last state pushed to the child into the dashboard simulation if it was not
+        pulled back or discarded since (e.g. the child died while running); returns its next frame, or None.
+        """
+        path, self.pushed = self.pushed, None
+        return sim.load_checkpoint(path) if path is not None and os.path.exists(path) else None
+
+    def run(self, steps_per_second):
+        self.send('run', steps_per_second); self.running = True
+
+    def pause(self):
+        self.send('pause'); self.running = False
+
+    def acquire(self):
+        """The latest published frame slot if it is new since the last call, else None."""
+        held = self.frames.acquire(self.held)
+        if held == self.held: return None
+        self.held = held
+        arrays = self.frames.slots[held]
+        return arrays if arrays['generation'][0] == self.generation else None
+
+    def close(self):
+        self.send('stop')
+        self.process.join(timeout=5)
+        if self.process.is_alive(): self.process.terminate()
+        self.frames.close(unlink=True)
+        shutil.rmtree(self.handoff_dir, ignore_errors=True)
+
+class SimulationView:
+    """
+    Stand-in for Simulation that the dashboard draws while the child process steps: it
+    exposes what LiveRenderer and the stats panel read, backed by the frame slot the
+    dashboard holds (no copies), and fires each frame's explosions and the winner
+    celebration into the local VFX manager, as ReplayWorld does for replays. Anything
+    else (bases, config, alliance map, parameters) is the dashboard's own Simulation's.
+    """
+    def __init__(self, sim, vfx_manager):
+        self.sim, self.vfx_manager = sim, vfx_manager
+        self.frame_count, self.winner_info = sim.frame_count, sim.winner_info
+        self.kill_counts, self.dead_teams = dict(sim.kill_counts), set(sim.dead_teams)
+        self.team_stats = sim.team_stats.copy()
+        self.metrics = sim.metrics # Published frames continue the dashboard Simulation's time series
+        self.agent_positions, self.agent_teams = sim.agent_positions, sim.agent_teams
+        self.agent_health, self.agent_count = sim.agent_health, sim.agent_count
+        self.pheromone_surfaces = dict(sim.pheromone_surfaces)
+        self.pheromone_managers = {}
+        self.explosions_dropped = 0
+        self.scheduler = StageScheduler.from_config(sim.config)
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+    def update(self, arrays, colourise=True):
+        """Points the view at a newly acquired frame slot."""
+        n = int(arrays['agent_count'][0])
+        self.frame_count = int(arrays['frame_count'][0])
+        self.agent_positions, self.agent_teams = arrays['agent_positions'][:n], arrays['agent_teams'][:n]
+        self.agent_count = n; self.agent_health = np.ones(n, dtype=np.int32)
+        explosions = arrays['explosions'][:int(arrays['explosion_count'][0])]
+        if arrays['explosions_dropped'][0] and not self.explosions_dropped: # Warn once per run
+            print("WARNING: the dashboard fell behind the simulation process; some explosion effects were dropped.")
+        self.explosions_dropped = int(arrays['explosions_dropped'][0])
+        for y, x, team_id in explosions.tolist():
+            self.vfx_manager.create_explosion(y, x, TEAMS[team_id]["color"], self.frame_count)
+        if self.metrics is not None:
+            # One record per published frame; the explosions carried over from skipped steps count towards it
+            self.metrics.record(self.frame_count, arrays['team_stats'][:, STAT_AGENTS:STAT_SPAWNS + 1],
+                                np.bincount(explosions[:, 2], minlength=len(TEAMS)), arrays['pheromone_mass'])
+
+        # Armor only ever disappears, so a base is re-checked against the terrain only when its team lost some
+        lost = np.flatnonzero(arrays['team_stats'][:, STAT_ARMOR] != self.team_stats[:, STAT_ARMOR])
+        for base in self.sim.bases:
+            if base.team_id in lost:
+                armor_id = BASE_ARMOR_OFFSET + base.team_id
+                base.current_armor_pixels = [(y, x) for y, x in base.current_armor_pixels if arrays['terrain'][y, x] == armor_id]
+            base.last_damage_frame = int(arrays['last_damage'][base.team_id])
+        self.team_stats = arrays['team_stats'].copy() # The slot is rewritten once the next one is acquired
+        self.kill_counts = {t['id']: int(arrays['kill_counts'][t['id']]) for t in TEAMS}
+        self.dead_teams = {t['id'] for t in TEAMS if arrays['dead_teams'][t['id']]}
+        if self.winner_info is None and arrays['winner'][0] != NO_WINNER:
+            self.winner_info = {'id': int(arrays['winner'][0]), 'reason': WIN_REASONS[int(arrays['winner'][1])]}
+            self.vfx_manager.create_winner_celebration(self.winner_info['id'], self.grid_size[1] // 2, self.grid_size[0] // 2)
+
+        if colourise: self.scheduler.run('pheromone_colourise', self.frame_count, lambda: self._colourise(arrays))
+
+    def _colourise(self, arrays):
+        for t in TEAMS:
+            key = (id(arrays), t['id'])
+            manager = self.pheromone_managers.get(key)
+            if manager is None:
+                manager = self.pheromone_managers[key] = PheromoneManager(self.grid_size, self.config, grid=arrays['pheromones'][t['id']])
+                manager.color = t['pheromone_color']
+            manager.smoothed_max = float(arrays['smoothed_max'][t['id']])
+            self.pheromone_surfaces[t['id']] = manager.get_render_surface()
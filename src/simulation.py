@@ -1,98 +1,260 @@
 import numpy as np
-from numba import jit, prange
+from numba import jit, prange, types, get_num_threads
 import random
-import pygame
 import json
+import os
+import time
+import threading
 from src.constants import *
 from src.base import Base
 from src.behaviors import get_next_move
-from src.pheromone import PheromoneManager
+from src.pheromone import (PheromoneManager, pheromone_shape, pheromone_dtype, kernel_view, gaussian_blur, clear_below, update_half,
+                           BLUR_SIGNATURE, CLEAR_SIGNATURE, HALF_UPDATE_SIGNATURE)
+from src.profiler import PROFILER
+from src.scheduler import StageScheduler
+from src.metrics import MetricsRecorder
+
+# Columns of Simulation.team_stats, one row per team in TEAMS
+TEAM_STATS = ('agents', 'armor', 'kills', 'spawns', 'bases')
+STAT_AGENTS, STAT_ARMOR, STAT_KILLS, STAT_SPAWNS, STAT_BASES = range(len(TEAM_STATS))
+
+@jit(nopython=True, fastmath=True, cache=True)
+def _agent_random(seed, frame_count, agent_index, draw):
+    """
+    Stateless counter-based uniform [0, 1) draw (a SplitMix64 hash of its inputs).
+    Unlike random.random() inside prange, the result does not depend on which
+    thread runs an agent, so a run is reproducible from its seed.
+    """
+    z = np.uint64(seed) + np.uint64(frame_count) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(agent_index) * np.uint64(0xBF58476D1CE4E5B9) + np.uint64(draw) * np.uint64(0x94D049BB133111EB)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+@jit(nopython=True, parallel=True, cache=True)
+def _build_cell_lists(agent_count, agent_positions, agent_health, cell_size, cells_h, cells_w, num_tiles):
+    """
+    Bins the alive agents into cell_size x cell_size cells with a parallel counting sort.
+    The agent array is split into one contiguous tile per thread; each thread histograms
+    its tile, a prefix sum over (cell, tile) gives every tile its slots, and each thread
+    scatters its own agents. Agents of cell c are cell_agents[cell_start[c]:cell_start[c + 1]]
+    in ascending index order, whatever the thread count. `num_tiles` comes from the caller:
+    calling get_num_threads() in compiled code would stop Numba caching the kernel.
+    """
+    num_cells = cells_h * cells_w
+    num_tiles = max(1, min(num_tiles, agent_count))
+    tile_size = (agent_count + num_tiles - 1) // num_tiles
+    agent_cell = np.empty(agent_count, dtype=np.int64)
+    tile_counts = np.zeros((num_tiles, num_cells), dtype=np.int64)
+    for tile in prange(num_tiles):
+        for i in range(tile * tile_size, min(agent_count, (tile + 1) * tile_size)):
+            if agent_health[i] > 0:
+                cell = int(agent_positions[i, 0] / cell_size) * cells_w + int(agent_positions[i, 1] / cell_size)
+                agent_cell[i] = cell; tile_counts[tile, cell] += 1
+            else: agent_cell[i] = -1
+    cell_start = np.empty(num_cells + 1, dtype=np.int64)
+    total = 0
+    for cell in range(num_cells):
+        cell_start[cell] = total
+        for tile in range(num_tiles):
+            count = tile_counts[tile, cell]; tile_counts[tile, cell] = total; total += count
+    cell_start[num_cells] = total
+    cell_agents = np.empty(total, dtype=np.int32)
+    for tile in prange(num_tiles):
+        for i in range(tile * tile_size, min(agent_count, (tile + 1) * tile_size)):
+            cell = agent_cell[i]
+            if cell >= 0: cell_agents[tile_counts[tile, cell]] = i; tile_counts[tile, cell] += 1
+    return cell_start, cell_agents
+
+SPATIAL_GRID_CELL_SIZE = 30
+
+@jit(nopython=True, fastmath=True, cache=True)
+def _update_agent(i, agent_positions, agent_headings, agent_teams, agent_health, vfx_events, base_damage_events,
+                  logic_grid, object_grid, pheromone_layers, team_layer, alliance_map, grid_h, grid_w, team_motion,
+                  combat_chance, frame_count, enemy_sense_radius_sq, base_attack_radius_sq, ai_update_interval, rng_seed,
+                  cell_start, cell_agents, spatial_grid_h, spatial_grid_w):
+    """
+    Agent i's part of a step: retargeting (on its staggered frame), the move, combat and
+    armor hits. Shared by the Simulation kernel and the world-batch kernel; team t reads
+    its pheromones from pheromone_layers[team_layer[t]].
+    """
+    if agent_health[i] <= 0: return
+    y, x, heading, team_id = agent_positions[i, 0], agent_positions[i, 1], agent_headings[i], agent_teams[i]
+    agent_alliance_id = alliance_map[team_id]
+    if frame_count % ai_update_interval == i % ai_update_interval:
+        target_found, target_y, target_x = False, -1.0, -1.0
+        min_dist_sq, best_target_y, best_target_x = enemy_sense_radius_sq, -1.0, -1.0
+        agent_grid_x, agent_grid_y = int(x / SPATIAL_GRID_CELL_SIZE), int(y / SPATIAL_GRID_CELL_SIZE)
+        for j in range(-1, 2):
+            for k in range(-1, 2):
+                check_grid_y, check_grid_x = agent_grid_y + j, agent_grid_x + k
+                if 0 <= check_grid_y < spatial_grid_h and 0 <= check_grid_x < spatial_grid_w:
+                    check_cell = check_grid_y * spatial_grid_w + check_grid_x
+                    # Highest index first, so ties between equidistant targets resolve the same on any thread count
+                    for slot in range(cell_start[check_cell + 1] - 1, cell_start[check_cell] - 1, -1):
+                        current_agent_idx = cell_agents[slot]
+                        other_team_id = agent_teams[current_agent_idx]
+                        if alliance_map[other_team_id] != agent_alliance_id:
+                            other_y, other_x = agent_positions[current_agent_idx]
+                            dist_sq = (y - other_y)**2 + (x - other_x)**2
+                            if dist_sq < min_dist_sq: min_dist_sq, best_target_y, best_target_x = dist_sq, other_y, other_x
+        min_armor_dist_sq, best_armor_target_y, best_armor_target_x = base_attack_radius_sq, -1.0, -1.0
+        for sy in range(int(y) - 50, int(y) + 50):
+            for sx in range(int(x) - 50, int(x) + 50):
+                if 0 <= sy < grid_h and 0 <= sx < grid_w:
+                    terrain_id = logic_grid[sy, sx]
+                    if BASE_ARMOR_OFFSET <= terrain_id < BASE_CORE_OFFSET:
+                        base_team_id = terrain_id - BASE_ARMOR_OFFSET
+                        if alliance_map[base_team_id] != agent_alliance_id:
+                            dist_sq = (y - sy)**2 + (x - sx)**2
+                            if dist_sq < min_armor_dist_sq: min_armor_dist_sq, best_armor_target_y, best_armor_target_x = dist_sq, float(sy), float(sx)
+        if best_target_y != -1.0 and min_dist_sq < min_armor_dist_sq: target_y, target_x, target_found = best_target_y, best_target_x, True
+        elif best_armor_target_y != -1.0: target_y, target_x, target_found = best_armor_target_y, best_armor_target_x, True
+        if target_found: heading = np.arctan2(target_y - y, target_x - x)
+        else:
+            pheromone_grid = pheromone_layers[team_layer[team_id]]
+            (ny_p, nx_p), heading = get_next_move(y, x, heading, pheromone_grid, grid_h, grid_w, team_motion[team_id, 0], team_motion[team_id, 1], team_motion[team_id, 2], _agent_random(rng_seed, frame_count, i, 0))
+    ny, nx = y + np.sin(heading), x + np.cos(heading)
+    if ny <= 1 or ny >= grid_h - 2 or nx <= 1 or nx >= grid_w - 2: agent_health[i] = 0; return
+    agent_headings[i] = heading; ny_int, nx_int = int(ny), int(nx)
+    target_terrain_id, target_object_idx = logic_grid[ny_int, nx_int], object_grid[ny_int, nx_int]
+    if target_object_idx != -1 and alliance_map[agent_teams[target_object_idx]] != agent_alliance_id:
+        if _agent_random(rng_seed, frame_count, i, 1) < combat_chance: agent_health[target_object_idx] = 0
+        if _agent_random(rng_seed, frame_count, i, 2) < combat_chance: agent_health[i] = 0
+        vfx_events[i, 0], vfx_events[i, 1], vfx_events[i, 2] = 1, ny_int, nx_int
+    elif BASE_ARMOR_OFFSET <= target_terrain_id < BASE_CORE_OFFSET and alliance_map[target_terrain_id - BASE_ARMOR_OFFSET] != agent_alliance_id:
+        agent_health[i] = 0; logic_grid[ny_int, nx_int] = EMPTY
+        vfx_events[i, 0], vfx_events[i, 1], vfx_events[i, 2] = 1, ny_int, nx_int
+        base_team_id = target_terrain_id - BASE_ARMOR_OFFSET
+        base_damage_events[i, 0] = 1; base_damage_events[i, 1] = base_team_id; base_damage_events[i, 2] = team_id
+    elif target_terrain_id == EMPTY: agent_positions[i] = [ny, nx]
+    else:
+        found_escape = False
+        for attempt in range(5):
+            rand_heading = _agent_random(rng_seed, frame_count, i, 3 + attempt) * 2 * np.pi; check_y, check_x = int(y + np.sin(rand_heading)), int(x + np.cos(rand_heading))
+            if 0 <= check_y < grid_h and 0 <= check_x < grid_w and logic_grid[check_y, check_x] == EMPTY:
+                agent_headings[i] = rand_heading; found_escape = True; break
+        if not found_escape: agent_headings[i] += np.pi
 
 @jit(nopython=True, parallel=True, fastmath=True, cache=True)
 def _numba_simulation_step(agent_count, agent_positions, agent_headings, agent_teams, agent_health,
                              vfx_events, base_damage_events, logic_grid, object_grid,
                              all_pheromone_grids, alliance_map, grid_h, grid_w,
-                             r_sens_angle, r_rot_angle, r_sens_dist, b_sens_angle, b_rot_angle, b_sens_dist,
+                             team_motion,
                              combat_chance, frame_count,
-                             enemy_sense_radius_sq, base_attack_radius_sq, ai_update_interval):
-    SPATIAL_GRID_CELL_SIZE = 30
+                             enemy_sense_radius_sq, base_attack_radius_sq, ai_update_interval, rng_seed, num_tiles):
     spatial_grid_w = (grid_w // SPATIAL_GRID_CELL_SIZE) + 1
     spatial_grid_h = (grid_h // SPATIAL_GRID_CELL_SIZE) + 1
-    spatial_hash_grid = np.full((spatial_grid_h, spatial_grid_w), -1, dtype=np.int32)
-    next_agent_in_cell = np.full(agent_count, -1, dtype=np.int32) 
-    for i in range(agent_count):
-        if agent_health[i] > 0:
-            grid_x = int(agent_positions[i, 1] / SPATIAL_GRID_CELL_SIZE); grid_y = int(agent_positions[i, 0] / SPATIAL_GRID_CELL_SIZE)
-            next_agent_in_cell[i] = spatial_hash_grid[grid_y, grid_x]; spatial_hash_grid[grid_y, grid_x] = i
+    cell_start, cell_agents = _build_cell_lists(agent_count, agent_positions, agent_health, SPATIAL_GRID_CELL_SIZE, spatial_grid_h, spatial_grid_w, num_tiles)
+    team_layer = np.arange(all_pheromone_grids.shape[0])
     for i in prange(agent_count):
-        if agent_health[i] <= 0: continue
-        y, x, heading, team_id = agent_positions[i, 0], agent_positions[i, 1], agent_headings[i], agent_teams[i]
-        agent_alliance_id = alliance_map[team_id]
-        if frame_count % ai_update_interval == i % ai_update_interval:
-            target_found, target_y, target_x = False, -1.0, -1.0
-            min_dist_sq, best_target_y, best_target_x = enemy_sense_radius_sq, -1.0, -1.0
-            agent_grid_x, agent_grid_y = int(x / SPATIAL_GRID_CELL_SIZE), int(y / SPATIAL_GRID_CELL_SIZE)
-            for j in range(-1, 2):
-                for k in range(-1, 2):
-                    check_grid_y, check_grid_x = agent_grid_y + j, agent_grid_x + k
-                    if 0 <= check_grid_y < spatial_grid_h and 0 <= check_grid_x < spatial_grid_w:
-                        current_agent_idx = spatial_hash_grid[check_grid_y, check_grid_x]
-                        while current_agent_idx != -1:
-                            other_team_id = agent_teams[current_agent_idx]
-                            if alliance_map[other_team_id] != agent_alliance_id:
-                                other_y, other_x = agent_positions[current_agent_idx]
-                                dist_sq = (y - other_y)**2 + (x - other_x)**2
-                                if dist_sq < min_dist_sq: min_dist_sq, best_target_y, best_target_x = dist_sq, other_y, other_x
-                            current_agent_idx = next_agent_in_cell[current_agent_idx]
-            min_armor_dist_sq, best_armor_target_y, best_armor_target_x = base_attack_radius_sq, -1.0, -1.0
-            for sy in range(int(y) - 50, int(y) + 50):
-                for sx in range(int(x) - 50, int(x) + 50):
-                    if 0 <= sy < grid_h and 0 <= sx < grid_w:
-                        terrain_id = logic_grid[sy, sx]
-                        if BASE_ARMOR_OFFSET <= terrain_id < BASE_CORE_OFFSET:
-                            base_team_id = terrain_id - BASE_ARMOR_OFFSET
-                            if alliance_map[base_team_id] != agent_alliance_id:
-                                dist_sq = (y - sy)**2 + (x - sx)**2
-                                if dist_sq < min_armor_dist_sq: min_armor_dist_sq, best_armor_target_y, best_armor_target_x = dist_sq, float(sy), float(sx)
-            if best_target_y != -1.0 and min_dist_sq < min_armor_dist_sq: target_y, target_x, target_found = best_target_y, best_target_x, True
-            elif best_armor_target_y != -1.0: target_y, target_x, target_found = best_armor_target_y, best_armor_target_x, True
-            if target_found: heading = np.arctan2(target_y - y, target_x - x)
-            else:
-                pheromone_grid = all_pheromone_grids[team_id]
-                (ny_p, nx_p), heading = get_next_move(y, x, heading, pheromone_grid, grid_h, grid_w, r_sens_angle, r_rot_angle, r_sens_dist)
-        ny, nx = y + np.sin(heading), x + np.cos(heading)
-        if ny <= 1 or ny >= grid_h - 2 or nx <= 1 or nx >= grid_w - 2: agent_health[i] = 0; continue
-        agent_headings[i] = heading; ny_int, nx_int = int(ny), int(nx)
-        target_terrain_id, target_object_idx = logic_grid[ny_int, nx_int], object_grid[ny_int, nx_int]
-        if target_object_idx != -1 and alliance_map[agent_teams[target_object_idx]] != agent_alliance_id:
-            if random.random() < combat_chance: agent_health[target_object_idx] = 0
-            if random.random() < combat_chance: agent_health[i] = 0
-            vfx_events[i, 0], vfx_events[i, 1], vfx_events[i, 2] = 1, ny_int, nx_int
-        elif BASE_ARMOR_OFFSET <= target_terrain_id < BASE_CORE_OFFSET and alliance_map[target_terrain_id - BASE_ARMOR_OFFSET] != agent_alliance_id:
-            agent_health[i] = 0; logic_grid[ny_int, nx_int] = EMPTY
-            vfx_events[i, 0], vfx_events[i, 1], vfx_events[i, 2] = 1, ny_int, nx_int
-            base_team_id = target_terrain_id - BASE_ARMOR_OFFSET
-            base_damage_events[i, 0] = 1; base_damage_events[i, 1] = base_team_id; base_damage_events[i, 2] = team_id
-        elif target_terrain_id == EMPTY: agent_positions[i] = [ny, nx]
-        else:
-            found_escape = False
-            for _ in range(5):
-                rand_heading = random.uniform(0, 2 * np.pi); check_y, check_x = int(y + np.sin(rand_heading)), int(x + np.cos(rand_heading))
-                if 0 <= check_y < grid_h and 0 <= check_x < grid_w and logic_grid[check_y, check_x] == EMPTY:
-                    agent_headings[i] = rand_heading; found_escape = True; break
-            if not found_escape: agent_headings[i] += np.pi
+        _update_agent(i, agent_positions, agent_headings, agent_teams, agent_health, vfx_events, base_damage_events,
+                      logic_grid, object_grid, all_pheromone_grids, team_layer, alliance_map, grid_h, grid_w, team_motion,
+                      combat_chance, frame_count, enemy_sense_radius_sq, base_attack_radius_sq, ai_update_interval, rng_seed,
+                      cell_start, cell_agents, spatial_grid_h, spatial_grid_w)
     return agent_positions, agent_headings, agent_health, vfx_events, base_damage_events, logic_grid
 
+@jit(nopython=True, cache=True)
+def _index_agents(object_grid, occupied, occupied_count, agent_positions, agent_health, agent_count):
+    """
+    Points each object_grid cell holding an alive agent at that agent (the highest index
+    wins) and every other cell at -1. Only the cells `occupied` by the previous call are
+    cleared, so the cost follows the agent count instead of the grid area. Returns the
+    number of cells now listed in `occupied`.
+    """
+    grid_h, grid_w = object_grid.shape
+    for k in range(occupied_count): object_grid[occupied[k] // grid_w, occupied[k] % grid_w] = -1
+    count = 0
+    for i in range(agent_count):
+        if agent_health[i] <= 0: continue
+        y, x = int(agent_positions[i, 0]), int(agent_positions[i, 1])
+        if 0 <= y < grid_h and 0 <= x < grid_w:
+            if object_grid[y, x] == -1: occupied[count] = y * grid_w + x; count += 1
+            object_grid[y, x] = i
+    return count
+
+INDEX_SIGNATURE = (types.int32[:, ::1], types.int64[::1], types.int64, types.float32[:, ::1], types.int32[::1], types.int64)
+
+# The one specialisation of _numba_simulation_step. step() coerces its arguments to exactly
+# these types, so dtype drift (e.g. an int64 alliance map) can never trigger a recompile mid-run.
+KERNEL_SIGNATURE = (
+    types.int64, types.float32[:, ::1], types.float32[::1], types.int8[::1], types.int32[::1],
+    types.int32[:, ::1], types.int32[:, ::1], types.uint8[:, ::1], types.int32[:, ::1],
+    types.float32[:, :, ::1], types.int32[::1], types.int64, types.int64, types.float64[:, ::1],
+    types.float64, types.int64, types.float64, types.float64, types.int64, types.int64, types.int64,
+)
+# With float16 pheromones (engine_settings.pheromone_precision) the kernel reads their uint16 bits instead
+HALF_KERNEL_SIGNATURE = KERNEL_SIGNATURE[:9] + (types.uint16[:, :, ::1],) + KERNEL_SIGNATURE[10:]
+
+def compile_kernels(precision='float32'):
+    """
+    Compiles the kernel and its helpers (agent indexing, pheromone blur and clearing, or the
+    fused float16 update) for the signatures of the given pheromone precision, or loads them
+    from Numba's on-disk cache. Safe to call from a background thread. Returns the time taken
+    and cache hit/miss counts.
+    """
+    start = time.perf_counter()
+    if precision == 'float16': kernels = ((_numba_simulation_step, HALF_KERNEL_SIGNATURE), (_index_agents, INDEX_SIGNATURE), (update_half, HALF_UPDATE_SIGNATURE))
+    else: kernels = ((_numba_simulation_step, KERNEL_SIGNATURE), (_index_agents, INDEX_SIGNATURE),
+                     (gaussian_blur, BLUR_SIGNATURE), (clear_below, CLEAR_SIGNATURE))
+    for kernel, signature in kernels: kernel.compile(signature)
+    stats = [kernel.stats for kernel, _ in kernels]
+    return {'compile_seconds': time.perf_counter() - start,
+            'cache_hits': sum(sum(s.cache_hits.values()) for s in stats), 'cache_misses': sum(sum(s.cache_misses.values()) for s in stats)}
+
+def start_kernel_compile(precision='float32'):
+    """
+    Runs compile_kernels() on a daemon thread and returns (thread, report dict filled on completion).
+    Numba's thread pool is launched on the calling thread first; launching it from the
+    background thread leaves the workqueue layer hanging at interpreter exit.
+    """
+    get_num_threads()
+    report = {}
+    thread = threading.Thread(target=lambda: report.update(compile_kernels(precision)), daemon=True)
+    thread.start()
+    return thread, report
+
+def warm_up_kernels(precision='float32'):
+    """
+    compile_kernels(precision), then one call on a tiny world so the kernel's first
+    real frame does not pay for any remaining lazy initialisation.
+    """
+    report = compile_kernels(precision)
+    start = time.perf_counter()
+    size = 8
+    _numba_simulation_step(
+        1, np.full((1, 2), size / 2, dtype=np.float32), np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.int8), np.full(1, 100, dtype=np.int32),
+        np.zeros((1, 3), dtype=np.int32), np.zeros((1, 3), dtype=np.int32), np.zeros((size, size), dtype=np.uint8), np.full((size, size), -1, dtype=np.int32),
+        np.zeros((len(TEAMS), size, size), dtype=np.uint16 if precision == 'float16' else np.float32), np.arange(len(TEAMS), dtype=np.int32), size, size,
+        np.tile([0.5, 0.5, 5.0], (len(TEAMS), 1)), 0.5, 0, 100.0, 100.0, 1, 0, 1)
+    report['first_call_seconds'] = time.perf_counter() - start
+    return report
+
+class NullEffects:
+    """VFX and audio stand-in for runs nobody watches or hears (sweeps, the dashboard's simulation process)."""
+    def create_explosion(self, *args, **kwargs): pass
+    def create_winner_celebration(self, *args, **kwargs): pass
+    def add_sfx(self, *args, **kwargs): pass
+
 class Simulation:
-    def __init__(self, config, vfx_manager, audio_manager):
+    def __init__(self, config, vfx_manager, audio_manager, layout_path='base_layouts.json', seed=None, render_pheromones=True):
         self.config, self.vfx_manager, self.audio_manager = config, vfx_manager, audio_manager
-        self.frame_count = 0; self.grid_size = (SIM_HEIGHT, SIM_WIDTH)
-        self.pheromone_managers = { team['id']: PheromoneManager(self.grid_size, config) for team in TEAMS }
+        self.layout_path = layout_path
+        if seed is None: seed = getattr(config, 'seed', None)
+        self.seed = random.randrange(2**32) if seed is None else int(seed)
+        self.rng = np.random.default_rng(self.seed)
+        self.frame_count = 0; self.grid_size = arena_size(config)
+        # One (teams, h, w) array the kernel reads as is; each manager owns a view of its team's layer
+        self.pheromone_grids = np.zeros((len(TEAMS),) + pheromone_shape(self.grid_size, config), dtype=pheromone_dtype(config))
+        self.pheromone_managers = { team['id']: PheromoneManager(self.grid_size, config, grid=self.pheromone_grids[team['id']]) for team in TEAMS }
         for team in TEAMS: self.pheromone_managers[team['id']].color = team['pheromone_color']
-        self.pheromone_surfaces = { team['id']: pygame.Surface((self.grid_size[1], self.grid_size[0]), flags=pygame.SRCALPHA) for team in TEAMS }
-        self.alliance_map = np.arange(len(TEAMS)); self.team_params_overrides = {}
+        # Headless tools that never draw pheromones pass render_pheromones=False and skip pygame entirely
+        self.render_pheromones = render_pheromones
+        self.pheromone_surfaces = { team_id: manager.get_render_surface() for team_id, manager in self.pheromone_managers.items() } if render_pheromones else {}
+        self.alliance_map = np.arange(len(TEAMS), dtype=np.int32); self.team_params_overrides = {}
+        self.scheduler = StageScheduler.from_config(config)
         
-        self.max_agents = 10000 
+        self.max_agents = int(getattr(config, 'max_agents', 10000))
         self.agent_positions = np.zeros((self.max_agents, 2), dtype=np.float32)
         
         self.agent_headings = np.zeros(self.max_agents, dtype=np.float32)
@@ -101,17 +263,32 @@ class Simulation:
         self.agent_health = np.zeros(self.max_agents, dtype=np.int32)
         self.vfx_events = np.zeros((self.max_agents, 3), dtype=np.int32)
         self.base_damage_events = np.zeros((self.max_agents, 3), dtype=np.int32)
-        self.agent_count = 0; self.render_grid = np.full(self.grid_size, EMPTY, dtype=np.uint8)
+        # Terrain (bases) the kernel reads and damages in place; rebuilt from the bases only when they change
+        self.agent_count = 0; self.render_grid = np.full(self.grid_size, EMPTY, dtype=np.uint8); self._terrain_dirty = True
         self.object_grid = np.full(self.grid_size, -1, dtype=np.int32)
+        # Flat indices of the object_grid cells written last step, so clearing it does not touch the whole grid
+        self._occupied_cells = np.zeros(self.max_agents, dtype=np.int64); self._occupied_count = 0
         self.bases = []; self.kill_counts = {team['id']: 0 for team in TEAMS}; self.dead_teams = set()
+        # Alive agents, armor pixels, kills and spawns per team, kept current by the step stages instead of recounted by readers
+        self.team_stats = np.zeros((len(TEAMS), len(TEAM_STATS)), dtype=np.int64)
+        # Armor per alliance (indexed by alliance id) and how many alliances still have some, for winner detection
+        self.alliance_armor = np.zeros(len(TEAMS), dtype=np.int64); self.alive_alliances = 0
         self.winner_info = None
+        # Per-step outputs read by the replay recorder: which agents survived compaction and (y, x, team) of each kill
+        self.last_survivors = np.zeros(0, dtype=np.bool_); self.last_explosions = np.zeros((0, 3), dtype=np.int32)
+        # Per-frame team time series (run_settings.metrics_capacity frames; 0 turns recording off)
+        metrics_capacity = int(getattr(config, 'metrics_capacity', 8192))
+        self.metrics = MetricsRecorder(metrics_capacity) if metrics_capacity > 0 else None
         
         self._initialize_bases()
         self._compile_team_params()
+        self.recount_team_stats()
 
     def _compile_team_params(self):
-        self.params_red = self.get_params_for_team(1)
-        self.params_blue = self.get_params_for_team(0)
+        self.scheduler.configure(self.config)
+        # Per-team (sensor angle, rotation angle, sensor distance) the kernel steers each agent with
+        self.team_motion = np.array([[params['sensor_angle_rad'], params['rotation_angle_rad'], params['sensor_distance']]
+                                     for params in map(self.get_params_for_team, range(len(TEAMS)))], dtype=np.float64)
 
     def get_params_for_team(self, team_id):
         return {'sensor_angle_degrees': self.get_param(team_id, 'sensor_angle_degrees'),'rotation_angle_degrees': self.get_param(team_id, 'rotation_angle_degrees'),'sensor_distance': self.get_param(team_id, 'sensor_distance'),'pheromone_deposit_amount': self.get_param(team_id, 'pheromone_deposit_amount'),'sensor_angle_rad': np.deg2rad(self.get_param(team_id, 'sensor_angle_degrees')),'rotation_angle_rad': np.deg2rad(self.get_param(team_id, 'rotation_angle_degrees')),}
@@ -122,161 +299,288 @@ class Simulation:
     def _initialize_bases(self):
         self.bases = []
         try:
-            with open('base_layouts.json', 'r') as f: layout_data = json.load(f)
+            with open(self.layout_path, 'r') as f: layout_data = json.load(f)
+            # Layouts authored for another arena size keep their relative placement; shapes and ports keep their size
+            authored_h, authored_w = layout_data.get('grid_size', (SIM_HEIGHT, SIM_WIDTH))
+            ratio_y, ratio_x = self.grid_size[0] / authored_h, self.grid_size[1] / authored_w
             for base_config in layout_data.get('initial_layout', []):
-                new_base = Base(base_config['team'], base_config['pivot'][0], base_config['pivot'][1], base_config['shape_name'], self.config, self.grid_size[0], self.grid_size[1])
+                pivot_y, pivot_x = int(round(base_config['pivot'][0] * ratio_y)), int(round(base_config['pivot'][1] * ratio_x))
+                new_base = Base(base_config['team'], pivot_y, pivot_x, base_config['shape_name'], self.config, self.grid_size[0], self.grid_size[1])
                 new_base.scale = base_config.get('scale', new_base.scale)
                 new_base.core_thickness = base_config.get('core_thickness', new_base.core_thickness)
                 new_base.armor_thickness = base_config.get('armor_thickness', new_base.armor_thickness)
                 absolute_ports = base_config.get('exit_ports', []);
-                if absolute_ports: new_base._relative_exit_ports = [(p[0] - new_base.pivot[0], p[1] - new_base.pivot[1]) for p in absolute_ports]
+                if absolute_ports: new_base._relative_exit_ports = [(p[0] - base_config['pivot'][0], p[1] - base_config['pivot'][1]) for p in absolute_ports]
                 new_base.recalculate_geometry(final_calculation=True, regenerate_ports=False)
                 self.bases.append(new_base)
-        except (FileNotFoundError, json.JSONDecodeError) as e: print(f"ERROR loading 'base_layouts.json': {e}")
+        except (FileNotFoundError, json.JSONDecodeError) as e: print(f"ERROR loading '{self.layout_path}': {e}")
 
     def draw_bases_to_grid(self):
+        grid_h, grid_w = self.grid_size
         all_core_pixels = set()
         for base in self.bases: all_core_pixels.update(base.current_core_pixels)
         for base in self.bases:
             core_id = BASE_CORE_OFFSET + base.team_id; armor_id = BASE_ARMOR_OFFSET + base.team_id
             for y, x in base.current_core_pixels:
-                if 0 <= y < SIM_HEIGHT and 0 <= x < SIM_WIDTH: self.render_grid[y, x] = core_id
+                if 0 <= y < grid_h and 0 <= x < grid_w: self.render_grid[y, x] = core_id
             for y, x in base.current_armor_pixels:
-                 if 0 <= y < SIM_HEIGHT and 0 <= x < SIM_WIDTH and (y, x) not in all_core_pixels: self.render_grid[y, x] = armor_id
+                 if 0 <= y < grid_h and 0 <= x < grid_w and (y, x) not in all_core_pixels: self.render_grid[y, x] = armor_id
+
+    def rebuild_terrain(self):
+        """Redraws render_grid from the bases' current pixels, e.g. after the editor changed them."""
+        self.render_grid.fill(EMPTY)
+        self.draw_bases_to_grid()
+        self._terrain_dirty = False
 
     def add_soldier(self, y, x, team_id, heading):
         if self.agent_count < self.max_agents:
             self.agent_positions[self.agent_count] = [y, x]; self.agent_headings[self.agent_count] = heading
             self.agent_teams[self.agent_count] = team_id; self.agent_health[self.agent_count] = 100
             self.agent_count += 1
+            self.team_stats[team_id, STAT_AGENTS] += 1; self.team_stats[team_id, STAT_SPAWNS] += 1
+
+    def recount_team_stats(self):
+        """
+        Rebuilds team_stats and the alliance armor counters from scratch (after resets,
+        checkpoint loads, alliance and editor changes); spawns are kept.
+        """
+        alive = self.agent_health[:self.agent_count] > 0
+        self.team_stats[:, STAT_AGENTS] = np.bincount(self.agent_teams[:self.agent_count][alive], minlength=len(TEAMS))[:len(TEAMS)]
+        self.team_stats[:, STAT_ARMOR] = 0; self.team_stats[:, STAT_BASES] = 0
+        for base in self.bases:
+            self.team_stats[base.team_id, STAT_ARMOR] += len(base.current_armor_pixels); self.team_stats[base.team_id, STAT_BASES] += 1
+        self.team_stats[:, STAT_KILLS] = [self.kill_counts[t['id']] for t in TEAMS]
+        self.alliance_armor[:] = np.bincount(self.alliance_map, weights=self.team_stats[:, STAT_ARMOR], minlength=len(TEAMS))[:len(TEAMS)]
+        self.alive_alliances = int(np.count_nonzero(self.alliance_armor))
+        self._terrain_dirty = True # Called after every geometry change, so the terrain is redrawn before the next step
+
+    def set_alliance_map(self, alliance_map):
+        self.alliance_map = np.asarray(alliance_map, dtype=np.int32)
+        self.recount_team_stats()
 
     def get_team_agent_count(self, team_name):
         team_id = TEAM_NAME_TO_ID.get(team_name.lower())
-        if team_id is None or self.agent_count == 0: return 0
-        alive_mask = self.agent_health[:self.agent_count] > 0
-        return np.sum(self.agent_teams[:self.agent_count][alive_mask] == team_id)
+        if team_id is None: return 0
+        return int(self.team_stats[team_id, STAT_AGENTS])
 
     def get_team_base_health(self, team_name):
         team_id = TEAM_NAME_TO_ID.get(team_name.lower())
         if team_id is None: return 0
-        total_health = 0
-        for base in self.bases:
-            if base.team_id == team_id: total_health += len(base.current_armor_pixels)
-        return total_health
+        return int(self.team_stats[team_id, STAT_ARMOR])
 
-    def step(self, frame_count):
+    def step(self, frame_count, render=True):
+        """
+        Advances one frame. Pass render=False on substeps that will not be displayed
+        (e.g. all but the last of several steps per dashboard frame) to skip cosmetic stages.
+        """
         self.frame_count = frame_count
-        logic_grid = np.full(self.grid_size, EMPTY, dtype=np.uint8)
-        all_core_pixels = set(); [all_core_pixels.update(b.current_core_pixels) for b in self.bases]
-        for base in self.bases:
-            core_id, armor_id = BASE_CORE_OFFSET + base.team_id, BASE_ARMOR_OFFSET + base.team_id
-            for y,x in base.current_core_pixels:
-                if 0 <= y < SIM_HEIGHT and 0 <= x < SIM_WIDTH: logic_grid[y,x] = core_id
-            for y,x in base.current_armor_pixels:
-                if 0 <= y < SIM_HEIGHT and 0 <= x < SIM_WIDTH and (y,x) not in all_core_pixels: logic_grid[y,x] = armor_id
-        
-        self.object_grid.fill(-1)
-        alive_indices = np.where(self.agent_health[:self.agent_count] > 0)[0]
-        for i in alive_indices:
-            y, x = int(self.agent_positions[i, 0]), int(self.agent_positions[i, 1])
-            if 0 <= y < self.grid_size[0] and 0 <= x < self.grid_size[1]: self.object_grid[y, x] = i
-        
-        all_phero_grids = np.stack([self.pheromone_managers[i].grid for i in range(len(TEAMS))])
-        r_params, b_params = self.params_red, self.params_blue
+        t = PROFILER.start()
+        # The kernel only ever clears armor cells, which the armor stage mirrors into the bases' pixel lists,
+        # so the terrain carries over between steps and is redrawn only after geometry changes
+        # After a redraw every base's armor list is checked against the grid once (overlaps, cells off the grid)
+        armor_check_all = self._terrain_dirty
+        if self._terrain_dirty: self.rebuild_terrain()
+        self._occupied_count = _index_agents(self.object_grid, self._occupied_cells, self._occupied_count,
+                                             self.agent_positions, self.agent_health, int(self.agent_count))
+        t = PROFILER.lap('sim.terrain', t)
         self.agent_positions, self.agent_headings, self.agent_health, self.vfx_events, self.base_damage_events, post_combat_grid = _numba_simulation_step(
-            self.agent_count, self.agent_positions, self.agent_headings, self.agent_teams, self.agent_health, 
-            self.vfx_events, self.base_damage_events, logic_grid, self.object_grid, all_phero_grids, self.alliance_map,
-            self.grid_size[0], self.grid_size[1], 
-            r_params['sensor_angle_rad'], r_params['rotation_angle_rad'], r_params['sensor_distance'], 
-            b_params['sensor_angle_rad'], b_params['rotation_angle_rad'], b_params['sensor_distance'], 
-            self.config.combat_chance, self.frame_count, self.config.enemy_sense_radius**2, self.config.base_attack_radius**2, self.config.ai_update_interval)
+            int(self.agent_count), self.agent_positions, self.agent_headings, self.agent_teams, self.agent_health, 
+            self.vfx_events, self.base_damage_events, self.render_grid, self.object_grid, kernel_view(self.pheromone_grids), np.ascontiguousarray(self.alliance_map, dtype=np.int32),
+            int(self.grid_size[0]), int(self.grid_size[1]), self.team_motion,
+            float(self.config.combat_chance), int(self.frame_count), float(self.config.enemy_sense_radius)**2, float(self.config.base_attack_radius)**2, int(self.scheduler.interval('ai_retarget')), int(self.seed), int(get_num_threads()))
         
-        for i in range(self.agent_count):
+        t = PROFILER.lap('sim.numba_step', t)
+        exploded = np.nonzero(self.vfx_events[:self.agent_count, 0] == 1)[0]
+        self.last_explosions = np.column_stack((self.vfx_events[exploded, 1], self.vfx_events[exploded, 2], self.agent_teams[exploded])).astype(np.int32)
+        # Only agents that fought or hit armor raised events; every base hit also raised an explosion
+        damaged_teams = set()
+        for i in np.flatnonzero(self.vfx_events[:self.agent_count, 0] | self.base_damage_events[:self.agent_count, 0]).tolist():
             if self.vfx_events[i, 0] == 1:
                 event_y, event_x = self.vfx_events[i, 1], self.vfx_events[i, 2]
                 self.vfx_manager.create_explosion(event_y, event_x, TEAMS[self.agent_teams[i]]["color"], self.frame_count)
                 self.vfx_events[i, 0] = 0
             if self.base_damage_events[i, 0] == 1:
                 damaged_team_id, killer_team_id = self.base_damage_events[i, 1], self.base_damage_events[i, 2]
+                damaged_teams.add(int(damaged_team_id))
                 for base in self.bases:
                     if base.team_id == damaged_team_id: base.last_damage_frame = frame_count
                 self.audio_manager.add_sfx(self.frame_count, 'crack')
                 if self.frame_count < self.config.total_frames:
-                    self.kill_counts[killer_team_id] += 1
+                    self.kill_counts[killer_team_id] += 1; self.team_stats[killer_team_id, STAT_KILLS] += 1
                 self.base_damage_events[i, 0] = 0
 
+        t = PROFILER.lap('sim.events', t)
         alive_mask = self.agent_health[:self.agent_count] > 0
+        self.last_survivors = alive_mask
         new_agent_count = np.sum(alive_mask)
         if new_agent_count < self.agent_count:
+            self.team_stats[:, STAT_AGENTS] -= np.bincount(self.agent_teams[:self.agent_count][~alive_mask], minlength=len(TEAMS))[:len(TEAMS)]
             self.agent_positions[:new_agent_count] = self.agent_positions[:self.agent_count][alive_mask]
             self.agent_headings[:new_agent_count] = self.agent_headings[:self.agent_count][alive_mask]
             self.agent_teams[:new_agent_count] = self.agent_teams[:self.agent_count][alive_mask]
             self.agent_health[:new_agent_count] = self.agent_health[:self.agent_count][alive_mask]
         self.agent_count = new_agent_count
+        t = PROFILER.lap('sim.compaction', t)
         
         for base in self.bases:
+            if not armor_check_all and base.team_id not in damaged_teams: continue # The kernel only clears armor it reported hitting
             armor_id = BASE_ARMOR_OFFSET + base.team_id
+            armor_before = len(base.current_armor_pixels)
             base.current_armor_pixels = [(y, x) for y, x in base.current_armor_pixels if 0 <= y < self.grid_size[0] and 0 <= x < self.grid_size[1] and post_combat_grid[y, x] == armor_id]
+            lost = armor_before - len(base.current_armor_pixels)
+            if lost:
+                alliance_id = self.alliance_map[base.team_id]
+                self.team_stats[base.team_id, STAT_ARMOR] -= lost; self.alliance_armor[alliance_id] -= lost
+                if self.alliance_armor[alliance_id] == 0: self.alive_alliances -= 1
         
+        t = PROFILER.lap('sim.armor', t)
         active_team_ids_in_pheromones = np.unique(self.agent_teams[:self.agent_count])
         for team_id in active_team_ids_in_pheromones:
             manager = self.pheromone_managers[team_id]
             team_agent_mask = (self.agent_teams[:self.agent_count] == team_id)
             if np.any(team_agent_mask): manager.deposit(self.agent_positions[:self.agent_count][team_agent_mask], self.get_param(team_id, 'pheromone_deposit_amount'))
         
-        for manager in self.pheromone_managers.values(): manager.update(self.frame_count)
-        if self.frame_count % 2 == 0:
-            for team_id in active_team_ids_in_pheromones: self.pheromone_surfaces[team_id] = self.pheromone_managers[team_id].get_render_surface()
+        t = PROFILER.lap('sim.pheromone_deposit', t)
+        blur = self.scheduler.due('pheromone_blur', self.frame_count)
+        for manager in self.pheromone_managers.values(): manager.update(blur)
+        t = PROFILER.lap('sim.pheromone_update', t)
+        if self.render_pheromones: self.scheduler.run('pheromone_colourise', self.frame_count, lambda: self.colourise_pheromones(active_team_ids_in_pheromones), render)
+        t = PROFILER.lap('sim.pheromone_colourise', t)
 
-        self.render_grid.fill(EMPTY)
-        self.draw_bases_to_grid()
         for base in self.bases: base.update_spawning(self)
+        t = PROFILER.lap('sim.spawning', t)
 
-        active_teams_in_scene = {b.team_id for b in self.bases}
-        for team_id in active_teams_in_scene:
-            team_name = TEAMS[team_id]['name']
-            if self.get_team_base_health(team_name) == 0 and team_id not in self.dead_teams:
-                self.dead_teams.add(team_id)
+        # Teams with bases but no armor left; O(teams) on the maintained counters, independent of base count
+        for team_id in np.flatnonzero((self.team_stats[:, STAT_BASES] > 0) & (self.team_stats[:, STAT_ARMOR] == 0)).tolist():
+            self.dead_teams.add(team_id)
         
         # --- NEW: Winner Detection Logic ---
         if self.winner_info is None and self.frame_count > 0:
-            # Check for active alliances, not just teams
-            active_alliances = {self.alliance_map[b.team_id] for b in self.bases if self.get_team_base_health(TEAMS[b.team_id]['name']) > 0}
-            
             # Condition 1: Only one alliance is left standing
-            if len(active_alliances) == 1:
-                winner_alliance_id = active_alliances.pop()
-                # Find a representative team from the winning alliance
+            if self.alive_alliances == 1:
+                winner_alliance_id = int(np.flatnonzero(self.alliance_armor)[0])
+                # Find a representative team from the winning alliance (runs once per match)
                 winner_team_id = next(b.team_id for b in self.bases if self.alliance_map[b.team_id] == winner_alliance_id)
                 self.winner_info = {'id': winner_team_id, 'reason': 'elimination'}
-                self.vfx_manager.create_winner_celebration(winner_team_id, SIM_WIDTH // 2, SIM_HEIGHT // 2)
+                self.vfx_manager.create_winner_celebration(winner_team_id, self.grid_size[1] // 2, self.grid_size[0] // 2)
 
-            # Condition 2: Timer runs out
+            # Condition 2: Timer runs out; the most kills wins, a tie for the most is a draw
             elif self.frame_count >= self.config.total_frames:
-                if self.kill_counts:
-                    winner_team_id = max(self.kill_counts, key=self.kill_counts.get)
+                top_kills = max(self.kill_counts.values(), default=0)
+                leaders = [team_id for team_id, kills in self.kill_counts.items() if kills == top_kills]
+                if len(leaders) == 1:
+                    winner_team_id = leaders[0]
                     self.winner_info = {'id': winner_team_id, 'reason': 'kills'}
-                    self.vfx_manager.create_winner_celebration(winner_team_id, SIM_WIDTH // 2, SIM_HEIGHT // 2)
+                    self.vfx_manager.create_winner_celebration(winner_team_id, self.grid_size[1] // 2, self.grid_size[0] // 2)
                 else:
                     self.winner_info = {'id': -1, 'reason': 'draw'}
+        t = PROFILER.lap('sim.winner_detection', t)
+
+        if self.metrics is not None:
+            self.metrics.record(frame_count, self.team_stats[:, STAT_AGENTS:STAT_SPAWNS + 1],
+                                np.bincount(self.last_explosions[:, 2], minlength=len(TEAMS)), self.pheromone_mass())
+        PROFILER.lap('sim.metrics', t)
+
+    def pheromone_mass(self):
+        """Sum of each team's pheromone grid after the last update."""
+        return np.array([self.pheromone_managers[t['id']].mass for t in TEAMS], dtype=np.float64)
+
+    def colourise_pheromones(self, team_ids=None):
+        """Regenerates the pheromone render surfaces of `team_ids` (default: every team)."""
+        if team_ids is None: team_ids = self.pheromone_managers.keys()
+        for team_id in team_ids: self.pheromone_surfaces[team_id] = self.pheromone_managers[team_id].get_render_surface()
 
     def reset_dynamic_state(self):
         self.agent_count = 0
-        for manager in self.pheromone_managers.values(): manager.grid.fill(0)
-        self.draw_bases_to_grid()
+        if self.metrics is not None: self.metrics.reset()
+        self.scheduler.reset()
+        self.rng = np.random.default_rng(self.seed)
+        self.pheromone_grids.fill(0)
         for surf in self.pheromone_surfaces.values():
             surf.fill((0, 0, 0, 0))
         self.kill_counts = {team['id']: 0 for team in TEAMS}
         self.dead_teams.clear()
         self.winner_info = None # Reset winner info
+        self.team_stats[:, STAT_SPAWNS] = 0
+        self.recount_team_stats()
+        self.rebuild_terrain()
+
+    def save_checkpoint(self, path, next_frame, compressed=False):
+        """
+        Writes the complete dynamic state (agents, pheromones, base geometry and armor,
+        kills, RNG, frame counter) to an uncompressed .npz so it restores in milliseconds.
+        `next_frame` is the frame number the run continues from; `compressed` trades
+        restore speed for size, e.g. for checkpoints that are archived.
+        """
+        n = self.agent_count
+        arrays = {
+            'agent_positions': self.agent_positions[:n], 'agent_headings': self.agent_headings[:n],
+            'agent_teams': self.agent_teams[:n], 'agent_health': self.agent_health[:n],
+            'pheromone_grids': self.pheromone_grids,
+            'pheromone_smoothed_max': np.array([self.pheromone_managers[t['id']].smoothed_max for t in TEAMS], dtype=np.float64),
+            'kill_counts': np.array([self.kill_counts[t['id']] for t in TEAMS], dtype=np.int64),
+            'team_spawns': self.team_stats[:, STAT_SPAWNS].copy(),
+            'alliance_map': np.asarray(self.alliance_map, dtype=np.int32),
+        }
+        history = np.full((len(TEAMS), 30), np.nan)
+        for t in TEAMS:
+            values = list(self.pheromone_managers[t['id']].max_pheromone_history)
+            history[t['id'], :len(values)] = values
+        arrays['pheromone_max_history'] = history
+        for i, base in enumerate(self.bases):
+            arrays[f'base{i}_core'] = np.array(base.current_core_pixels, dtype=np.int32).reshape(-1, 2)
+            arrays[f'base{i}_armor'] = np.array(base.current_armor_pixels, dtype=np.int32).reshape(-1, 2)
+            arrays[f'base{i}_all'] = np.array(list(base.all_base_pixels), dtype=np.int32).reshape(-1, 2)
+        meta = {
+            'next_frame': int(next_frame), 'frame_count': int(self.frame_count), 'seed': self.seed, 'grid_size': list(self.grid_size),
+            'rng_state': self.rng.bit_generator.state, 'dead_teams': sorted(int(t) for t in self.dead_teams),
+            'winner_info': self.winner_info, 'bases': [base.get_state() for base in self.bases],
+            'team_params_overrides': {str(k): v for k, v in self.team_params_overrides.items()},
+        }
+        arrays['meta'] = np.frombuffer(json.dumps(meta, default=lambda o: o.item()).encode(), dtype=np.uint8)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        (np.savez_compressed if compressed else np.savez)(path, **arrays)
+
+    def load_checkpoint(self, path):
+        """Restores a checkpoint written by save_checkpoint. Returns the frame number to continue from."""
+        with np.load(path) as data:
+            meta = json.loads(data['meta'].tobytes().decode())
+            if tuple(meta['grid_size']) != tuple(self.grid_size): raise ValueError(f"Checkpoint grid {meta['grid_size']} does not match {self.grid_size}")
+            n = len(data['agent_teams'])
+            if n > self.max_agents: raise ValueError(f"Checkpoint holds {n} agents; max_agents is {self.max_agents}")
+            self.agent_positions[:n] = data['agent_positions']; self.agent_headings[:n] = data['agent_headings']
+            self.agent_teams[:n] = data['agent_teams']; self.agent_health[:n] = data['agent_health']; self.agent_count = n
+            history = data['pheromone_max_history']
+            for t in TEAMS:
+                manager = self.pheromone_managers[t['id']]
+                manager.grid[:] = data['pheromone_grids'][t['id']]; manager.empty = False
+                manager.smoothed_max = float(data['pheromone_smoothed_max'][t['id']])
+                manager.max_pheromone_history.clear(); manager.max_pheromone_history.extend(v for v in history[t['id']] if not np.isnan(v))
+            self.kill_counts = {t['id']: int(data['kill_counts'][t['id']]) for t in TEAMS}
+            self.team_stats[:, STAT_SPAWNS] = data['team_spawns'] if 'team_spawns' in data else 0
+            self.alliance_map = data['alliance_map'].copy()
+            self.bases = [Base.from_state(state, self.config, self.grid_size[0], self.grid_size[1], data[f'base{i}_core'], data[f'base{i}_armor'], data[f'base{i}_all'])
+                          for i, state in enumerate(meta['bases'])]
+        self.frame_count = meta['frame_count']; self.seed = meta['seed']
+        self.rng = np.random.default_rng(self.seed); self.rng.bit_generator.state = meta['rng_state']
+        self.dead_teams = set(meta['dead_teams']); self.winner_info = meta['winner_info']
+        self.team_params_overrides = {int(k): v for k, v in meta['team_params_overrides'].items()}
+        self._compile_team_params()
+        self.recount_team_stats()
+        self.scheduler.reset()
+        if self.render_pheromones: self.colourise_pheromones()
+        self.rebuild_terrain()
+        return meta['next_frame']
 
     def add_new_base(self, team_name='Azure', shape_name='BOX'):
         new_base = Base(team_name, self.grid_size[0]//2, self.grid_size[1]//2, shape_name, self.config, self.grid_size[0], self.grid_size[1])
         self.bases.append(new_base)
+        self.recount_team_stats()
         return new_base
 
     def delete_base(self, base_to_delete):
         if base_to_delete and base_to_delete in self.bases: self.bases.remove(base_to_delete)
+        self.recount_team_stats()
 
     def get_base_at(self, world_y, world_x):
         for base in reversed(self.bases):
@@ -0,0 +1,191 @@
+import json
+import time
+import itertools
+import traceback
+import numpy as np
+from src.constants import *
+
+# Parameters the simulation reads per team (Simulation.get_param); every other key applies to the whole match
+TEAM_PARAMS = ('sensor_angle_degrees', 'rotation_angle_degrees', 'sensor_distance', 'pheromone_deposit_amount', 'spawn_rate', 'units_per_spawn')
+METHODS = ('grid', 'random', 'lhs', 'tournament')
+
+def layout_teams(layout_path):
+    """Team ids of the layout's bases, in layout order and without repeats."""
+    with open(layout_path, 'r') as f: layout = json.load(f)
+    return list(dict.fromkeys(TEAM_NAME_TO_ID[base['team'].lower()] for base in layout.get('initial_layout', [])))
+
+def _team_id(name):
+    team_id = TEAM_NAME_TO_ID.get(str(name).lower())
+    if team_id is None: raise ValueError(f"Unknown team '{name}'.")
+    return team_id
+
+def _axes(spec):
+    """
+    (column, team_id or None, key, axis) for every swept parameter. An axis is a list of
+    values or a {"min", "max", "int", "steps"} range; team parameters are named "<team>.<key>".
+    """
+    axes = [(key, None, key, axis) for key, axis in spec.get('params', {}).items()]
+    for team_name, params in spec.get('team_params', {}).items():
+        team_id = _team_id(team_name)
+        for key, axis in params.items():
+            if key not in TEAM_PARAMS: raise ValueError(f"'{key}' is not a per-team parameter; per-team parameters are {', '.join(TEAM_PARAMS)}.")
+            axes.append((f"{TEAM_ID_TO_NAME[team_id].lower()}.{key}", team_id, key, axis))
+    return axes
+
+def _axis_values(column, axis):
+    """The values a grid sweep takes along one axis."""
+    if isinstance(axis, list): return axis
+    if 'steps' not in axis: raise ValueError(f"Grid sweeps need a value list or 'steps' for '{column}'.")
+    values = np.linspace(axis['min'], axis['max'], int(axis['steps']))
+    return [int(round(v)) for v in values] if axis.get('int') else values.tolist()
+
+def _axis_sample(axis, u):
+    """Maps uniform draws `u` in [0, 1) onto an axis."""
+    if isinstance(axis, list): return [axis[int(x * len(axis))] for x in u]
+    values = axis['min'] + u * (axis['max'] - axis['min'])
+    return [int(round(v)) for v in values] if axis.get('int') else values.tolist()
+
+def sample_points(spec):
+    """
+    The parameter settings of a sweep, as dicts of column -> value. 'grid' takes every
+    combination, 'random' draws `samples` points uniformly and 'lhs' draws a Latin
+    hypercube (each axis split into `samples` strata, each stratum used once).
+    """
+    method, axes = spec.get('method', 'grid'), _axes(spec)
+    if method == 'grid':
+        combos = itertools.product(*(_axis_values(column, axis) for column, _, _, axis in axes))
+        return [dict(zip((column for column, _, _, _ in axes), combo)) for combo in combos]
+    rng = np.random.default_rng(spec.get('sample_seed', 0))
+    samples = int(spec.get('samples', 100))
+    columns = {}
+    for column, _, _, axis in axes:
+        u = rng.random(samples) if method == 'random' else (rng.permutation(samples) + rng.random(samples)) / samples
+        columns[column] = _axis_sample(axis, u)
+    return [{column: values[n] for column, values in columns.items()} for n in range(samples)]
+
+def _split(point, axes):
+    """Splits a sampled point into config overrides and per-team parameter overrides."""
+    overrides, team_params = {}, {}
+    for column, team_id, key, _ in axes:
+        if team_id is None: overrides[key] = point[column]
+        else: team_params.setdefault(team_id, {})[key] = point[column]
+    return overrides, team_params
+
+def build_jobs(spec):
+    """
+    Expands a sweep spec into one job per (setting, seed). Every setting runs on the same
+    seeds, so differences between settings are not down to luck of the draw.
+    In a tournament, the spec's named strategies (per-team parameter sets) are assigned
+    to the layout's teams in every order; settings shared by every match go in 'overrides'.
+    """
+    method = spec.get('method', 'grid')
+    if method not in METHODS: raise ValueError(f"Unknown sweep method '{method}'; use one of {', '.join(METHODS)}.")
+    layout, config_path = spec.get('layout', 'base_layouts.json'), spec.get('config', 'config.json')
+    seeds = spec.get('seeds') or list(range(int(spec.get('repeats', 1))))
+    base = {'config': config_path, 'layout': layout, 'frames': int(spec.get('frames', 1800)), 'fixed_overrides': spec.get('overrides', {})}
+
+    settings = [] # (columns recorded with the results, config overrides, team overrides)
+    if method == 'tournament':
+        strategies, teams = spec['strategies'], layout_teams(layout)
+        for key in {key for params in strategies.values() for key in params}:
+            if key not in TEAM_PARAMS: raise ValueError(f"'{key}' is not a per-team parameter; per-team parameters are {', '.join(TEAM_PARAMS)}.")
+        if len(strategies) < len(teams): raise ValueError(f"A tournament on this layout needs at least {len(teams)} strategies.")
+        for assignment in itertools.permutations(strategies, len(teams)):
+            columns = {f"{TEAM_ID_TO_NAME[team_id].lower()}.strategy": name for team_id, name in zip(teams, assignment)}
+            settings.append((columns, {}, {team_id: dict(strategies[name]) for team_id, name in zip(teams, assignment)}))
+    else:
+        axes = _axes(spec)
+        settings = [(point, *_split(point, axes)) for point in sample_points(spec)]
+
+    jobs = []
+    for setting, (columns, overrides, team_params) in enumerate(settings):
+        for seed in seeds:
+            jobs.append({**base, 'setting': setting, 'seed': int(seed), 'columns': columns, 'overrides': overrides, 'team_params': team_params})
+    return jobs
+
+def run_match(job):
+    """
+    Pool entry point: plays one match without rendering, VFX or audio until a winner is
+    found (elimination, or most kills when `frames` run out; a tie for the most is a draw)
+    and returns its outcome row.
+    """
+    from src.headless import load_config
+    from src.simulation import Simulation, NullEffects, STAT_AGENTS, STAT_ARMOR, STAT_KILLS, STAT_SPAWNS
+    start = time.perf_counter()
+    row = {'setting': job['setting'], 'seed': job['seed'], **job['columns']}
+    try:
+        config, _ = load_config(job['config'], {**job['fixed_overrides'], **job['overrides'], 'total_frames': job['frames']})
+        effects = NullEffects()
+        sim = Simulation(config, effects, effects, layout_path=job['layout'], seed=job['seed'], render_pheromones=False)
+        for team_id, params in job['team_params'].items(): sim.team_params_overrides[int(team_id)] = dict(params)
+        sim._compile_team_params()
+        teams = list(dict.fromkeys(base.team_id for base in sim.bases))
+        initial_armor = sim.team_stats[:, STAT_ARMOR].copy()
+        frame = 0
+        while sim.winner_info is None and frame <= job['frames']:
+            sim.step(frame, render=False); frame += 1
+    except Exception as e:
+        print(traceback.format_exc(), flush=True)
+        row.update({'error': f"{type(e).__name__}: {e}", 'wall_seconds': time.perf_counter() - start})
+        return row
+
+    winner_id = sim.winner_info['id'] if sim.winner_info else -1
+    row.update({
+        'winner': TEAM_ID_TO_NAME[winner_id] if winner_id >= 0 else None,
+        'win_reason': sim.winner_info['reason'] if sim.winner_info else None,
+        'time_to_win': sim.frame_count, 'time_to_win_seconds': sim.frame_count / config.fps,
+    })
+    for team_id in teams:
+        stats, prefix = sim.team_stats[team_id], TEAM_ID_TO_NAME[team_id].lower()
+        deaths = int(stats[STAT_SPAWNS] - stats[STAT_AGENTS])
+        row.update({
+            f'{prefix}.kills': int(stats[STAT_KILLS]), f'{prefix}.deaths': deaths,
+            f'{prefix}.kill_ratio': stats[STAT_KILLS] / max(1, deaths),
+            f'{prefix}.armor_remaining': stats[STAT_ARMOR] / initial_armor[team_id] if initial_armor[team_id] else 0.0,
+            f'{prefix}.agents': int(stats[STAT_AGENTS]),
+        })
+    row['wall_seconds'] = time.perf_counter() - start
+    return row
+
+def run_batch(jobs):
+    """
+    Pool entry point: plays a chunk of jobs as one WorldBatch, one world per job, and
+    returns their rows in order. The jobs share the spec's config, layout and frame budget.
+    """
+    from src.headless import load_config
+    from src.world_batch import WorldBatch
+    start = time.perf_counter()
+    first = jobs[0]
+    try:
+        config, _ = load_config(first['config'], {**first['fixed_overrides'], 'total_frames': first['frames']})
+        batch = WorldBatch(config, [job['seed'] for job in jobs], layout_path=first['layout'],
+                           overrides=[job['overrides'] for job in jobs], team_params=[job['team_params'] for job in jobs])
+        batch.run()
+    except Exception as e:
+        print(traceback.format_exc(), flush=True)
+        wall_seconds = (time.perf_counter() - start) / len(jobs)
+        return [{'setting': job['setting'], 'seed': job['seed'], **job['columns'], 'error': f"{type(e).__name__}: {e}", 'wall_seconds': wall_seconds} for job in jobs]
+    wall_seconds = (time.perf_counter() - start) / len(jobs)
+    return [{'setting': job['setting'], 'seed': job['seed'], **job['columns'], **batch.outcome(w), 'wall_seconds': wall_seconds} for w, job in enumerate(jobs)]
+
+def summarize_settings(jobs, rows):
+    """
+    Aggregates the match rows of each setting over its seeds: win share per team, draw share,
+    mean time to win and a balance score (1 when every team won equally often, 0 when one team
+    always won). Draws count for no team. Returns the settings ranked by balance, then by
+    fewer draws and longer matches.
+    """
+    parameters = {job['setting']: job['columns'] for job in jobs}
+    by_setting = {}
+    for row in rows:
+        if 'error' not in row: by_setting.setdefault(row['setting'], []).append(row)
+    summaries = []
+    for setting, matches in sorted(by_setting.items()):
+        teams = [key[:-len('.kills')] for key in matches[0] if key.endswith('.kills')]
+        win_share = {team: sum((m['winner'] or '').lower() == team for m in matches) / len(matches) for team in teams}
+        summaries.append({'setting': setting, 'parameters': parameters[setting], 'matches': len(matches), 'win_share': win_share,
+                          'draw_share': sum(m['win_reason'] == 'draw' for m in matches) / len(matches),
+                          'balance': 1.0 - (max(win_share.values()) - min(win_share.values())),
+                          'mean_time_to_win_seconds': float(np.mean([m['time_to_win_seconds'] for m in matches]))})
+    summaries.sort(key=lambda s: (-s['balance'], s['draw_share'], -s['mean_time_to_win_seconds']))
+    return summaries
@@ -1,35 +1,245 @@
 import os
+import re
 import glob
+import queue
+import threading
+import time
 import subprocess
 import shutil
+import tempfile
+import numpy as np
 import pygame
-import pygame_gui
+from src.constants import VIDEO_WIDTH, VIDEO_HEIGHT
+from src.profiler import PROFILER
 
-def render_simulation_to_frames(dashboard, frames_folder, total_frames, fps):
+class JpegSequenceSink:
+    """Writes frames as a numbered JPEG sequence; safe to call from several worker threads."""
+    ordered = False
+
+    def __init__(self, frames_folder, quality=90):
+        self.frames_folder = frames_folder
+        self.quality = quality
+        os.makedirs(frames_folder, exist_ok=True)
+
+    def write(self, frame_num, frame):
+        from PIL import Image
+        frame_filename = os.path.join(self.frames_folder, f"frame_{frame_num:05d}.jpg")
+        Image.fromarray(frame).save(frame_filename, quality=self.quality)
+
+    def close(self):
+        pass
+
+class FFmpegPipeSink:
     """
-    Runs the main offline rendering loop, saving each frame to the specified folder.
-    Returns True if completed, False if cancelled.
+    Streams raw RGB frames straight into an FFmpeg process, skipping the
+    intermediate image files entirely. Frames must arrive in order.
+    """
+    ordered = True
+
+    def __init__(self, output_filename, frame_size, fps, preset='veryfast', crf=20, threads=None):
+        width, height = frame_size
+        os.makedirs(os.path.dirname(output_filename) or '.', exist_ok=True)
+        command = [
+            'ffmpeg',
+            '-nostats', '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f'{width}x{height}',
+            '-r', str(fps),
+            '-i', '-',
+            '-c:v', 'libx264',
+            '-preset', preset,
+            '-crf', str(crf),
+            '-pix_fmt', 'yuv420p',
+            '-y',
+            output_filename
+        ]
+        if threads: command[-2:-2] = ['-threads', str(threads)]
+        self.output_filename = output_filename
+        # stderr goes to a file, not a pipe: nothing reads it while frames are written, and a full
+        # pipe would block FFmpeg and with it the writer
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+
+    def write(self, frame_num, frame):
+        self.process.stdin.write(memoryview(frame).cast('B'))
+
+    def close(self):
+        self.process.stdin.close()
+        returncode = self.process.wait()
+        self.stderr.seek(0, os.SEEK_END)
+        self.stderr.seek(max(0, self.stderr.tell() - 4096))
+        stderr = self.stderr.read(); self.stderr.close()
+        if returncode != 0:
+            print("!!! FFmpeg Error !!!")
+            print(f"FFmpeg stderr (last 4 KB):\n{stderr.decode(errors='replace')}")
+            return False
+        return True
+
+    @staticmethod
+    def is_available():
+        return shutil.which('ffmpeg') is not None
+
+class FramePipeline:
+    """
+    Bounded producer/consumer pipeline for offline rendering.
+
+    The main thread copies each rendered surface into one slot of a fixed ring of
+    frame buffers; worker threads encode and write the slots and hand them back.
+    When every slot is in flight the producer blocks, so memory stays constant and
+    throughput approaches max(sim + render, encode) instead of their sum.
+    """
+    def __init__(self, sink, frame_size, num_buffers=8, num_workers=2):
+        width, height = frame_size
+        self.sink = sink
+        self.buffers = np.empty((num_buffers, height, width, 3), dtype=np.uint8)
+        self.free_slots = queue.Queue()
+        for slot in range(num_buffers): self.free_slots.put(slot)
+        self.filled_slots = queue.Queue(maxsize=num_buffers)
+        # An ordered sink (an FFmpeg pipe) must see frames in sequence, so it gets a single writer.
+        num_workers = 1 if sink.ordered else max(1, num_workers)
+        self.error = None
+        self.frames_submitted = 0
+        self.frames_encoded = 0
+        self.produce_time = 0.0
+        self.encode_time = 0.0
+        self._stats_lock = threading.Lock()
+        self._produce_started = None
+        self.workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(num_workers)]
+        for worker in self.workers: worker.start()
+        self.start_time = time.perf_counter()
+
+    def _worker(self):
+        while True:
+            item = self.filled_slots.get()
+            if item is None: break
+            frame_num, slot = item
+            start = time.perf_counter()
+            try:
+                if self.error is None: self.sink.write(frame_num, self.buffers[slot])
+            except Exception as e:
+                self.error = e
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self.frames_encoded += 1
+                self.encode_time += elapsed
+            self.free_slots.put(slot)
+
+    def begin_frame(self):
+        """Marks the start of the producer's sim + render work for the next frame."""
+        self._produce_started = time.perf_counter()
+
+    def submit(self, frame_num, surface):
+        """Copies a rendered surface into a free ring slot and queues it for encoding."""
+        if self.error is not None: raise self.error
+        if self._produce_started is not None:
+            self.produce_time += time.perf_counter() - self._produce_started
+            self._produce_started = None
+        slot = self.free_slots.get()
+        pixels = pygame.surfarray.pixels3d(surface)
+        np.copyto(self.buffers[slot], pixels.transpose(1, 0, 2))
+        del pixels
+        self.filled_slots.put((frame_num, slot))
+        self.frames_submitted += 1
+
+    def stage_fps(self):
+        """Returns (sim+render fps, encode fps, overall fps) measured so far."""
+        with self._stats_lock:
+            encoded, encode_time = self.frames_encoded, self.encode_time
+        render_fps = self.frames_submitted / self.produce_time if self.produce_time > 0 else 0.0
+        encode_fps = len(self.workers) * encoded / encode_time if encode_time > 0 else 0.0
+        elapsed = time.perf_counter() - self.start_time
+        overall_fps = encoded / elapsed if elapsed > 0 else 0.0
+        return render_fps, encode_fps, overall_fps
+
+    def progress_text(self, frame_num, total_frames):
+        render_fps, encode_fps, overall_fps = self.stage_fps()
+        return f"REC {frame_num}/{total_frames} | sim+render {render_fps:.1f} fps | encode {encode_fps:.1f} fps | out {overall_fps:.1f} fps"
+
+    def close(self):
+        """Drains the queue, stops the workers and closes the sink. Returns True on success."""
+        for _ in self.workers: self.filled_slots.put(None)
+        for worker in self.workers: worker.join()
+        sink_ok = self.sink.close()
+        if self.error is not None:
+            print(f"!!! Frame encoding failed: {self.error} !!!")
+            return False
+        return sink_ok is not False
+
+CHECKPOINT_NAME = re.compile(r"frame_(\d{6,})\.npz")
+
+def checkpoint_path(checkpoint_dir, frame_num):
+    return os.path.join(checkpoint_dir, f"frame_{frame_num:06d}.npz")
+
+def checkpoint_frames(checkpoint_dir):
+    """Sorted frame numbers of the checkpoints in `checkpoint_dir`; other files are ignored."""
+    if not os.path.isdir(checkpoint_dir): return []
+    matches = (CHECKPOINT_NAME.fullmatch(name) for name in os.listdir(checkpoint_dir))
+    return sorted(int(m.group(1)) for m in matches if m)
+
+def render_simulation(simulation, vfx_manager, renderer, sink, total_frames, fps, title_text="",
+                      show_pheromones=True, overlay_scale=0.5, on_progress=None, progress_interval=0.1, encode_workers=None,
+                      checkpoint_dir=None, checkpoint_interval=0, replay_recorder=None):
+    """
+    Headless offline rendering loop: steps the simulation, composes each video frame
+    off-screen and hands it to a background FramePipeline writing to `sink`.
+    `on_progress(frame_num, pipeline)` is called at most every `progress_interval`
+    seconds and may return False to cancel. Returns True if completed, False if cancelled.
+    With a `checkpoint_dir` and a positive `checkpoint_interval`, the simulation state
+    is saved every `checkpoint_interval` frames. A `replay_recorder` records every step.
     """
     print(f"Rendering {total_frames} frames...")
+    if encode_workers is None: encode_workers = max(1, (os.cpu_count() or 2) - 1)
+    pipeline = FramePipeline(sink, (VIDEO_WIDTH, VIDEO_HEIGHT), num_workers=encode_workers)
+    last_progress = 0.0
     frame_num = 0
-    while frame_num < total_frames and dashboard.is_recording:
-        progress_text = f"REC: {frame_num}/{total_frames}"
-        dashboard.record_button.set_text(progress_text)
-        
-        # Step simulation and update VFX
-        dashboard.simulation.step(frame_num)
-        dashboard.vfx_manager.update_effects()
-
-        # Draw the frame in memory using the renderer
-        dashboard.renderer.draw(dashboard.screen, dashboard.simulation, dashboard.vfx_manager, dashboard.viewport, dashboard.show_pheromones, None, False, dashboard.shorts_title_text)
-        final_frame = dashboard.renderer.final_render_surface 
-        
-        # Save the frame to disk
-        frame_filename = os.path.join(frames_folder, f"frame_{frame_num:05d}.jpg")
-        pygame.image.save(final_frame, frame_filename)
-        frame_num += 1
-
-        # Handle events to check for cancellation or quitting
+    cancelled = False
+    try:
+        while frame_num < total_frames:
+            frame_start = t = PROFILER.start()
+            pipeline.begin_frame()
+            t = PROFILER.lap('video.wait_for_slot', t)
+            simulation.step(frame_num)
+            t = PROFILER.lap('sim.total', t)
+            if replay_recorder is not None: replay_recorder.record(simulation)
+            vfx_manager.update_effects()
+            t = PROFILER.lap('video.replay_and_vfx', t)
+            frame = renderer.render_video_frame(simulation, vfx_manager, show_pheromones, title_text, overlay_scale)
+            t = PROFILER.lap('render.total', t)
+            pipeline.submit(frame_num, frame)
+            PROFILER.lap('video.submit', t)
+            PROFILER.lap('frame.total', frame_start)
+            frame_num += 1
+            if checkpoint_dir and checkpoint_interval > 0 and frame_num % checkpoint_interval == 0:
+                simulation.save_checkpoint(checkpoint_path(checkpoint_dir, frame_num), frame_num)
+
+            now = time.perf_counter()
+            if on_progress is not None and now - last_progress >= progress_interval:
+                last_progress = now
+                if on_progress(frame_num, pipeline) is False:
+                    cancelled = True
+                    break
+    finally:
+        encoded_ok = pipeline.close()
+        print(pipeline.progress_text(frame_num, total_frames))
+
+    return not cancelled and encoded_ok
+
+def render_simulation_to_frames(dashboard, frames_folder, total_frames, fps, sink=None, checkpoint_dir=None, checkpoint_interval=0):
+    """
+    Records the dashboard's simulation through render_simulation, keeping the
+    dashboard window minimally responsive so the recording can be cancelled.
+    Frames go to `sink`, or a JPEG sequence in `frames_folder` by default.
+    Periodic checkpoints are written to `checkpoint_dir` every `checkpoint_interval` frames.
+    Returns True if completed, False if cancelled.
+    """
+    if sink is None: sink = JpegSequenceSink(frames_folder)
+
+    import pygame_gui
+
+    def pump_dashboard(frame_num, pipeline):
+        dashboard.record_button.set_text(f"REC: {frame_num}/{total_frames}")
+        pygame.display.set_caption(f"ChromaPlasm Dashboard - {pipeline.progress_text(frame_num, total_frames)}")
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 dashboard.is_running = False
@@ -37,13 +247,19 @@ def render_simulation_to_frames(dashboard, frames_folder, total_frames, fps):
             dashboard.ui_manager.process_events(event)
             if event.type == pygame_gui.UI_BUTTON_PRESSED and event.ui_element == dashboard.record_button:
                 dashboard.is_recording = False
-        
-        # Keep the UI minimally responsive
-        dashboard.ui_manager.update(1/fps)
+        preview_h = max(1, dashboard.viewport.rect.height); preview_w = int(VIDEO_WIDTH * preview_h / VIDEO_HEIGHT)
+        preview = pygame.transform.scale(dashboard.renderer.final_render_surface, (preview_w, preview_h))
+        dashboard.screen.blit(preview, (dashboard.viewport.rect.centerx - preview_w // 2, dashboard.viewport.rect.y))
+        dashboard.ui_manager.update(1 / fps)
         dashboard.ui_manager.draw_ui(dashboard.screen)
         pygame.display.flip()
+        return dashboard.is_recording
 
-    return dashboard.is_recording
+    completed = render_simulation(dashboard.simulation, dashboard.vfx_manager, dashboard.renderer, sink, total_frames, fps,
+                                  dashboard.shorts_title_text, dashboard.show_pheromones, dashboard.viewport.zoom, on_progress=pump_dashboard,
+                                  checkpoint_dir=checkpoint_dir, checkpoint_interval=checkpoint_interval)
+    pygame.display.set_caption("ChromaPlasm Dashboard")
+    return completed and dashboard.is_recording
 
 def assemble_video(frame_dir, audio_path, output_filename, fps):
     """
@@ -79,6 +295,20 @@ def assemble_video(frame_dir, audio_path, output_filename, fps):
     except FileNotFoundError:
         print("!!! FFmpeg Error: command not found. Is FFmpeg installed and in your system's PATH? !!!")
 
+def mux_audio(video_path, audio_path, output_filename):
+    """Combines an already-encoded video stream with an audio track without re-encoding the video."""
+    command = ['ffmpeg', '-i', video_path, '-i', audio_path, '-c:v', 'copy', '-c:a', 'aac', '-shortest', '-y', output_filename]
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        print(f"Video saved to: {output_filename}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print("!!! FFmpeg Error !!!")
+        print(f"FFmpeg stderr:\n{e.stderr}")
+    except FileNotFoundError:
+        print("!!! FFmpeg Error: command not found. Is FFmpeg installed and in your system's PATH? !!!")
+    return False
+
 def cleanup_frames(frame_dir):
     """
     Deletes the entire frames directory and its contents.
@@ -8,6 +8,12 @@ class Viewport:
         self.offset_y = SIM_HEIGHT / 2
         self.zoom = 0.5
         self.panning = False
+        self.set_world((SIM_HEIGHT, SIM_WIDTH))
+
+    def set_world(self, grid_size):
+        """Maps screen positions onto a simulation grid of `grid_size`, placed in the video frame by arena_transform."""
+        self.grid_size = tuple(grid_size)
+        self.world_scale, self.world_x0, self.world_y0 = arena_transform(self.grid_size)
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 2:
@@ -60,13 +66,10 @@ class Viewport:
         if y_on_final_surf < VIDEO_TOP_MARGIN or y_on_final_surf >= (VIDEO_HEIGHT - VIDEO_BOTTOM_MARGIN):
             return None
             
-        x_in_game_area = x_on_final_surf
-        y_in_game_area = y_on_final_surf - VIDEO_TOP_MARGIN
-        
-        grid_x = x_in_game_area / PIXEL_SCALE
-        grid_y = y_in_game_area / PIXEL_SCALE
+        grid_x = (x_on_final_surf - self.world_x0) / self.world_scale
+        grid_y = (y_on_final_surf - self.world_y0) / self.world_scale
         
-        if 0 <= grid_x < SIM_WIDTH and 0 <= grid_y < SIM_HEIGHT:
+        if 0 <= grid_x < self.grid_size[1] and 0 <= grid_y < self.grid_size[0]:
             return int(grid_y), int(grid_x)
             
         return None
\ No newline at end of file
@@ -0,0 +1,322 @@
+import numpy as np
+from numba import jit, prange
+from types import SimpleNamespace
+from src.constants import *
+from src.pheromone import gaussian_weights, pheromone_shape, pheromone_dtype, kernel_view, pheromone_at, set_pheromone
+from src.replay import NO_WINNER, WIN_REASONS
+from src.simulation import (Simulation, NullEffects, TEAM_STATS, STAT_AGENTS, STAT_ARMOR, STAT_KILLS, STAT_SPAWNS, STAT_BASES,
+                            SPATIAL_GRID_CELL_SIZE, _agent_random, _index_agents, _update_agent)
+
+ELIMINATION, KILLS, DRAW = WIN_REASONS.index('elimination'), WIN_REASONS.index('kills'), WIN_REASONS.index('draw')
+# Draw streams of the spawn stage in _agent_random (the agent stage uses draws 0-7 with the agent index)
+SPAWN_DRAW = 1000
+
+@jit(nopython=True, cache=True)
+def _bin_agents(agent_count, agent_positions, agent_health, cells_h, cells_w):
+    """Serial counterpart of simulation._build_cell_lists (one tile): the same cells, in the same order."""
+    num_cells = cells_h * cells_w
+    cell_start = np.zeros(num_cells + 1, dtype=np.int64)
+    agent_cell = np.empty(agent_count, dtype=np.int64)
+    for i in range(agent_count):
+        if agent_health[i] > 0:
+            cell = int(agent_positions[i, 0] / SPATIAL_GRID_CELL_SIZE) * cells_w + int(agent_positions[i, 1] / SPATIAL_GRID_CELL_SIZE)
+            agent_cell[i] = cell; cell_start[cell + 1] += 1
+        else: agent_cell[i] = -1
+    for cell in range(num_cells): cell_start[cell + 1] += cell_start[cell]
+    fill = cell_start[:num_cells].copy()
+    cell_agents = np.empty(cell_start[num_cells], dtype=np.int32)
+    for i in range(agent_count):
+        cell = agent_cell[i]
+        if cell >= 0: cell_agents[fill[cell]] = i; fill[cell] += 1
+    return cell_start, cell_agents
+
+@jit(nopython=True, fastmath=True, cache=True)
+def _blur_layer(grid, weights):
+    """
+    Serial counterpart of pheromone.gaussian_blur, in place: the same passes, and every
+    cell sums its taps in the same order, so the results are identical. The horizontal
+    pass runs tap by tap over a whole row, which vectorises. The uint16 views of float16
+    grids are read and stored as float32.
+    """
+    h, w = grid.shape
+    radius = len(weights) // 2
+    vertical = np.empty((h, w), dtype=np.float32)
+    row = np.empty(w, dtype=np.float64)
+    for y in range(h):
+        row[:] = 0.0
+        for k in range(-radius, radius + 1):
+            yy = y + k
+            if yy < 0: yy = -yy - 1
+            elif yy >= h: yy = 2 * h - yy - 1
+            weight = weights[k + radius]
+            for x in range(w): row[x] += weight * pheromone_at(grid, yy, x)
+        for x in range(w): vertical[y, x] = row[x]
+    padded = np.empty(w + 2 * radius, dtype=np.float64)
+    for y in range(h):
+        for x in range(w): padded[x + radius] = vertical[y, x]
+        for k in range(radius):
+            padded[radius - 1 - k] = vertical[y, k]
+            padded[w + radius + k] = vertical[y, w - 1 - k]
+        row[:] = 0.0
+        for k in range(2 * radius + 1):
+            weight = weights[k]
+            for x in range(w): row[x] += weight * padded[x + k]
+        for x in range(w): set_pheromone(grid, y, x, row[x])
+
+@jit(nopython=True, fastmath=True, cache=True)
+def _step_world(frame_count, agent_count, occupied_count, agent_positions, agent_headings, agent_teams, agent_health,
+                vfx_events, base_damage_events, terrain, armor_owner, object_grid, occupied, pheromones, layer_empty, team_layer,
+                alliance_map, alliance_leader, team_motion, combat_chance, enemy_sense_radius_sq, base_attack_radius_sq,
+                ai_update_interval, seed, deposit_amounts, decay_rate, blur_weights, blur_interval, spawn_rates, units_per_spawn,
+                base_teams, base_ports, base_port_counts, spawn_cooldowns, base_armor, team_stats, total_frames, outcome):
+    """
+    One step of one world, in the order Simulation.step runs its stages: indexing, the agent
+    kernel, kills and armor loss, compaction, pheromone deposit and decay/blur, spawning and
+    winner detection. Returns the new (agent_count, occupied_count).
+    """
+    grid_h, grid_w = terrain.shape
+    occupied_count = _index_agents(object_grid, occupied, occupied_count, agent_positions, agent_health, agent_count)
+    cells_h, cells_w = grid_h // SPATIAL_GRID_CELL_SIZE + 1, grid_w // SPATIAL_GRID_CELL_SIZE + 1
+    cell_start, cell_agents = _bin_agents(agent_count, agent_positions, agent_health, cells_h, cells_w)
+    for i in range(agent_count):
+        _update_agent(i, agent_positions, agent_headings, agent_teams, agent_health, vfx_events, base_damage_events,
+                      terrain, object_grid, pheromones, team_layer, alliance_map, grid_h, grid_w, team_motion,
+                      combat_chance, frame_count, enemy_sense_radius_sq, base_attack_radius_sq, ai_update_interval, seed,
+                      cell_start, cell_agents, cells_h, cells_w)
+
+    # Agents run one after another within a world, so every armor hit cleared exactly one armor cell
+    for i in range(agent_count):
+        if base_damage_events[i, 0] == 1:
+            damaged_team, killer_team = base_damage_events[i, 1], base_damage_events[i, 2]
+            if frame_count < total_frames: team_stats[killer_team, STAT_KILLS] += 1
+            owner = armor_owner[vfx_events[i, 1], vfx_events[i, 2]]
+            if owner >= 0: base_armor[owner] -= 1; team_stats[damaged_team, STAT_ARMOR] -= 1
+            base_damage_events[i, 0] = 0
+        vfx_events[i, 0] = 0
+
+    alive = 0
+    for i in range(agent_count):
+        if agent_health[i] > 0:
+            agent_positions[alive, 0], agent_positions[alive, 1] = agent_positions[i, 0], agent_positions[i, 1]
+            agent_headings[alive], agent_teams[alive], agent_health[alive] = agent_headings[i], agent_teams[i], agent_health[i]
+            alive += 1
+        else: team_stats[agent_teams[i], STAT_AGENTS] -= 1
+    agent_count = alive
+
+    # Deposits read every cell before writing any, so agents sharing a cell add once, as NumPy's grid[ys, xs] += amount does
+    ph_h, ph_w = pheromones.shape[1], pheromones.shape[2]
+    deposit_cells = np.empty((agent_count, 2), dtype=np.int64)
+    deposits = np.empty(agent_count, dtype=np.float32)
+    for i in range(agent_count):
+        y, x = int(agent_positions[i, 0]), int(agent_positions[i, 1])
+        if ph_h != grid_h or ph_w != grid_w: y, x = y * ph_h // grid_h, x * ph_w // grid_w
+        y, x = min(max(y, 0), ph_h - 1), min(max(x, 0), ph_w - 1)
+        deposit_cells[i, 0], deposit_cells[i, 1] = y, x
+        deposits[i] = pheromone_at(pheromones[team_layer[agent_teams[i]]], y, x) + deposit_amounts[agent_teams[i]]
+    for i in range(agent_count):
+        y, x = deposit_cells[i, 0], deposit_cells[i, 1]
+        layer = team_layer[agent_teams[i]]
+        set_pheromone(pheromones[layer], y, x, deposits[i]); layer_empty[layer] = False
+    blur = len(blur_weights) > 0 and frame_count % blur_interval == 0
+    floor = np.float32(0.001)
+    for layer in range(pheromones.shape[0]):
+        if layer_empty[layer]: continue
+        grid = pheromones[layer]
+        for y in range(ph_h):
+            for x in range(ph_w): set_pheromone(grid, y, x, pheromone_at(grid, y, x) * decay_rate)
+        if blur: _blur_layer(grid, blur_weights)
+        peak = np.float32(0.0)
+        for y in range(ph_h):
+            for x in range(ph_w):
+                value = pheromone_at(grid, y, x)
+                if value < floor: set_pheromone(grid, y, x, 0.0)
+                elif value > peak: peak = value
+        layer_empty[layer] = peak == 0
+
+    max_agents = len(agent_health)
+    for b in range(len(base_teams)):
+        if base_armor[b] <= 0: continue
+        spawn_cooldowns[b] -= 1
+        if spawn_cooldowns[b] > 0: continue
+        team_id = base_teams[b]
+        for unit in range(units_per_spawn[team_id] if base_port_counts[b] > 0 else 0):
+            if agent_count >= max_agents: break
+            port = int(_agent_random(seed, frame_count, b, SPAWN_DRAW + 2 * unit) * base_port_counts[b])
+            agent_positions[agent_count, 0], agent_positions[agent_count, 1] = base_ports[b, port, 0], base_ports[b, port, 1]
+            agent_headings[agent_count] = _agent_random(seed, frame_count, b, SPAWN_DRAW + 2 * unit + 1) * 2 * np.pi
+            agent_teams[agent_count], agent_health[agent_count] = team_id, 100
+            agent_count += 1
+            team_stats[team_id, STAT_AGENTS] += 1; team_stats[team_id, STAT_SPAWNS] += 1
+        spawn_cooldowns[b] = spawn_rates[team_id]
+
+    if outcome[0] == NO_WINNER and frame_count > 0:
+        alliance_armor = np.zeros(len(alliance_map), dtype=np.int64)
+        for team_id in range(len(alliance_map)): alliance_armor[alliance_map[team_id]] += team_stats[team_id, STAT_ARMOR]
+        alive_alliances, last_alliance = 0, -1
+        for alliance_id in range(len(alliance_armor)):
+            if alliance_armor[alliance_id] > 0: alive_alliances += 1; last_alliance = alliance_id
+        if alive_alliances == 1: outcome[0], outcome[1], outcome[2] = alliance_leader[last_alliance], ELIMINATION, frame_count
+        elif frame_count >= total_frames: # Most kills wins, as in Simulation; a tie for the most is a draw
+            kills = team_stats[:, STAT_KILLS]; leader = np.argmax(kills)
+            if np.sum(kills == kills[leader]) == 1: outcome[0], outcome[1], outcome[2] = leader, KILLS, frame_count
+            else: outcome[0], outcome[1], outcome[2] = -1, DRAW, frame_count
+    return agent_count, occupied_count
+
+@jit(nopython=True, parallel=True, fastmath=True, cache=True)
+def _step_worlds(frame_count, agent_counts, occupied_counts, agent_positions, agent_headings, agent_teams, agent_health,
+                 vfx_events, base_damage_events, terrain, armor_owner, object_grids, occupied, pheromones, layer_empty, team_layer,
+                 alliance_maps, alliance_leaders, team_motion, combat_chance, enemy_sense_radius_sq, base_attack_radius_sq,
+                 ai_update_interval, seeds, deposit_amounts, decay_rates, blur_weights, blur_lengths, blur_interval, spawn_rates,
+                 units_per_spawn, base_teams, base_ports, base_port_counts, spawn_cooldowns, base_armor, team_stats, total_frames, outcomes):
+    """Steps every unfinished world, one world per thread at a time."""
+    for w in prange(len(agent_counts)):
+        if outcomes[w, 0] != NO_WINNER: continue
+        agent_counts[w], occupied_counts[w] = _step_world(
+            frame_count, agent_counts[w], occupied_counts[w], agent_positions[w], agent_headings[w], agent_teams[w], agent_health[w],
+            vfx_events[w], base_damage_events[w], terrain[w], armor_owner, object_grids[w], occupied[w], pheromones[w], layer_empty[w], team_layer,
+            alliance_maps[w], alliance_leaders[w], team_motion[w], combat_chance[w], enemy_sense_radius_sq[w], base_attack_radius_sq[w],
+            ai_update_interval[w], seeds[w], deposit_amounts[w], decay_rates[w], blur_weights[w, :blur_lengths[w]], blur_interval[w], spawn_rates[w],
+            units_per_spawn[w], base_teams, base_ports, base_port_counts, spawn_cooldowns[w], base_armor[w], team_stats[w], total_frames[w], outcomes[w])
+
+class WorldBatch:
+    """
+    Many independent matches on one layout and arena, stepped together: agent, terrain and
+    pheromone arrays carry a leading world dimension and one Numba call advances every
+    world, so the per-step Python overhead of a Simulation is paid once per batch.
+
+    Worlds follow Simulation's rules stage for stage, each with its own seed, config
+    overrides and per-team parameters. Spawning draws from the counter-based generator
+    instead of the Simulation's NumPy one, so a world matches a Simulation with the same
+    seed in distribution rather than frame for frame. Worlds stop once they have a winner.
+    Memory grows with worlds x arena area, so batches are meant for small arenas.
+    """
+    def __init__(self, config, seeds, layout_path='base_layouts.json', overrides=None, team_params=None):
+        num_worlds = len(seeds)
+        overrides = overrides or [{}] * num_worlds; team_params = team_params or [{}] * num_worlds
+        self.configs = [SimpleNamespace(**{**vars(config), **world_overrides}) for world_overrides in overrides]
+        self.grid_size = arena_size(config)
+        if any(arena_size(world_config) != self.grid_size for world_config in self.configs): raise ValueError("All worlds of a batch must share one arena size.")
+        self.pheromone_size = pheromone_shape(self.grid_size, config)
+        if any(pheromone_shape(self.grid_size, world_config) != self.pheromone_size or pheromone_dtype(world_config) != pheromone_dtype(config) for world_config in self.configs):
+            raise ValueError("All worlds of a batch must share one pheromone resolution and precision.")
+        self.frame_count = 0
+        # A template Simulation lays out the bases and draws the terrain every world starts from
+        effects = NullEffects()
+        template = Simulation(config, effects, effects, layout_path=layout_path, seed=0, render_pheromones=False)
+        template.rebuild_terrain()
+        self.bases, self.teams = template.bases, list(dict.fromkeys(base.team_id for base in template.bases))
+        teams, grid_h, grid_w = len(TEAMS), self.grid_size[0], self.grid_size[1]
+        max_agents = max(int(getattr(world_config, 'max_agents', 10000)) for world_config in self.configs)
+
+        # Armor cells owned by each base, as the first step of a Simulation filters its bases' armor lists against the grid
+        self.armor_owner = np.full(self.grid_size, -1, dtype=np.int16)
+        for b, base in enumerate(self.bases):
+            for y, x in base.current_armor_pixels:
+                if 0 <= y < grid_h and 0 <= x < grid_w and template.render_grid[y, x] == BASE_ARMOR_OFFSET + base.team_id: self.armor_owner[y, x] = b
+        initial_armor = np.bincount(self.armor_owner[self.armor_owner >= 0], minlength=len(self.bases)).astype(np.int64)
+        ports = [[(y, x) for y, x in base.exit_ports if 0 <= y < grid_h and 0 <= x < grid_w] for base in self.bases]
+        self.base_teams = np.array([base.team_id for base in self.bases], dtype=np.int64)
+        self.base_ports = np.zeros((len(self.bases), max([len(p) for p in ports] + [1]), 2), dtype=np.float32)
+        for b, base_ports in enumerate(ports): self.base_ports[b, :len(base_ports)] = base_ports
+        self.base_port_counts = np.array([len(p) for p in ports], dtype=np.int64)
+
+        self.seeds = np.array(seeds, dtype=np.int64)
+        self.agent_counts = np.zeros(num_worlds, dtype=np.int64); self.occupied_counts = np.zeros(num_worlds, dtype=np.int64)
+        self.agent_positions = np.zeros((num_worlds, max_agents, 2), dtype=np.float32)
+        self.agent_headings = np.zeros((num_worlds, max_agents), dtype=np.float32)
+        self.agent_teams = np.zeros((num_worlds, max_agents), dtype=np.int8)
+        self.agent_health = np.zeros((num_worlds, max_agents), dtype=np.int32)
+        self.vfx_events = np.zeros((num_worlds, max_agents, 3), dtype=np.int32)
+        self.base_damage_events = np.zeros((num_worlds, max_agents, 3), dtype=np.int32)
+        self.terrain = np.repeat(template.render_grid[None], num_worlds, axis=0)
+        self.object_grids = np.full((num_worlds,) + self.grid_size, -1, dtype=np.int32)
+        self.occupied = np.zeros((num_worlds, max_agents), dtype=np.int64)
+        # Pheromone layers only for the layout's teams; team_layer maps a team id to its layer
+        self.team_layer = np.zeros(teams, dtype=np.int64); self.team_layer[self.teams] = np.arange(len(self.teams))
+        self.pheromones = np.zeros((num_worlds, len(self.teams)) + self.pheromone_size, dtype=pheromone_dtype(config))
+        self.layer_empty = np.ones((num_worlds, len(self.teams)), dtype=np.bool_)
+        self.spawn_cooldowns = np.zeros((num_worlds, len(self.bases)), dtype=np.int64)
+        self.base_armor = np.repeat(initial_armor[None], num_worlds, axis=0)
+        self.team_stats = np.zeros((num_worlds, teams, len(TEAM_STATS)), dtype=np.int64)
+        np.add.at(self.team_stats[:, :, STAT_ARMOR], (slice(None), self.base_teams), initial_armor)
+        np.add.at(self.team_stats[:, :, STAT_BASES], (slice(None), self.base_teams), 1)
+        self.initial_armor = self.team_stats[:, :, STAT_ARMOR].copy()
+        self.outcomes = np.full((num_worlds, 3), NO_WINNER, dtype=np.int64) # winner team, WIN_REASONS index, frame
+
+        # Per-world parameters, resolved the way Simulation.get_param does
+        def param(w, team_id, key): return team_params[w].get(team_id, {}).get(key, getattr(self.configs[w], key))
+        self.alliance_maps = np.tile(np.arange(teams, dtype=np.int32), (num_worlds, 1))
+        # The team a Simulation names as winner for each alliance: the first base's team in layout order
+        self.alliance_leaders = np.zeros((num_worlds, teams), dtype=np.int64)
+        for w in range(num_worlds):
+            for base in reversed(self.bases): self.alliance_leaders[w, self.alliance_maps[w, base.team_id]] = base.team_id
+        self.team_motion = np.array([[[np.deg2rad(param(w, t, 'sensor_angle_degrees')), np.deg2rad(param(w, t, 'rotation_angle_degrees')), param(w, t, 'sensor_distance')]
+                                      for t in range(teams)] for w in range(num_worlds)], dtype=np.float64)
+        self.deposit_amounts = np.array([[param(w, t, 'pheromone_deposit_amount') for t in range(teams)] for w in range(num_worlds)], dtype=np.float32)
+        self.spawn_rates = np.array([[int(param(w, t, 'spawn_rate')) for t in range(teams)] for w in range(num_worlds)], dtype=np.int64)
+        self.units_per_spawn = np.array([[int(param(w, t, 'units_per_spawn')) for t in range(teams)] for w in range(num_worlds)], dtype=np.int64)
+        self.combat_chance = np.array([c.combat_chance for c in self.configs], dtype=np.float64)
+        self.enemy_sense_radius_sq = np.array([float(c.enemy_sense_radius) ** 2 for c in self.configs], dtype=np.float64)
+        self.base_attack_radius_sq = np.array([float(c.base_attack_radius) ** 2 for c in self.configs], dtype=np.float64)
+        self.ai_update_interval = np.array([max(1, int(getattr(c, 'ai_update_interval', 10))) for c in self.configs], dtype=np.int64)
+        self.decay_rates = np.array([c.pheromone_decay_rate for c in self.configs], dtype=np.float32)
+        self.blur_interval = np.array([max(1, int(getattr(c, 'pheromone_blur_interval', 2))) for c in self.configs], dtype=np.int64)
+        kernels = [gaussian_weights(c.pheromone_blur_sigma * self.pheromone_size[0] / grid_h) if c.pheromone_blur_sigma > 0 else np.zeros(0) for c in self.configs]
+        self.blur_lengths = np.array([len(k) for k in kernels], dtype=np.int64)
+        self.blur_weights = np.zeros((num_worlds, max(self.blur_lengths.max(initial=0), 1)), dtype=np.float64)
+        for w, kernel in enumerate(kernels): self.blur_weights[w, :len(kernel)] = kernel
+        self.total_frames = np.array([int(c.total_frames) for c in self.configs], dtype=np.int64)
+
+    @property
+    def num_worlds(self):
+        return len(self.seeds)
+
+    @property
+    def finished(self):
+        return self.outcomes[:, 0] != NO_WINNER
+
+    @property
+    def nbytes(self):
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    def add_agent(self, world, y, x, team_id, heading):
+        """Simulation.add_soldier for one world."""
+        n = self.agent_counts[world]
+        if n >= self.agent_health.shape[1]: return
+        if team_id not in self.teams: raise ValueError(f"Team {team_id} has no base in this batch's layout.")
+        self.agent_positions[world, n] = (y, x); self.agent_headings[world, n] = heading
+        self.agent_teams[world, n], self.agent_health[world, n] = team_id, 100
+        self.agent_counts[world] += 1
+        self.team_stats[world, team_id, STAT_AGENTS] += 1; self.team_stats[world, team_id, STAT_SPAWNS] += 1
+
+    def step(self):
+        """Advances every unfinished world by one frame in a single kernel call."""
+        _step_worlds(self.frame_count, self.agent_counts, self.occupied_counts, self.agent_positions, self.agent_headings, self.agent_teams, self.agent_health,
+                     self.vfx_events, self.base_damage_events, self.terrain, self.armor_owner, self.object_grids, self.occupied, kernel_view(self.pheromones), self.layer_empty, self.team_layer,
+                     self.alliance_maps, self.alliance_leaders, self.team_motion, self.combat_chance, self.enemy_sense_radius_sq, self.base_attack_radius_sq,
+                     self.ai_update_interval, self.seeds, self.deposit_amounts, self.decay_rates, self.blur_weights, self.blur_lengths, self.blur_interval, self.spawn_rates,
+                     self.units_per_spawn, self.base_teams, self.base_ports, self.base_port_counts, self.spawn_cooldowns, self.base_armor, self.team_stats, self.total_frames, self.outcomes)
+        self.frame_count += 1
+
+    def run(self):
+        """Steps until every world has a winner (at the latest on its total_frames, by kills)."""
+        while not self.finished.all() and self.frame_count <= self.total_frames.max(): self.step()
+
+    def outcome(self, world):
+        """A world's result in the shape of a sweep row: winner, time to win and per-team kills, deaths, armor and agents."""
+        winner_id, reason, frame = (int(v) for v in self.outcomes[world])
+        fps = self.configs[world].fps
+        row = {'winner': TEAM_ID_TO_NAME[winner_id] if winner_id >= 0 else None,
+               'win_reason': WIN_REASONS[reason] if winner_id != NO_WINNER else None,
+               'time_to_win': frame if winner_id != NO_WINNER else self.frame_count, 'time_to_win_seconds': (frame if winner_id != NO_WINNER else self.frame_count) / fps}
+        for team_id in self.teams:
+            stats, prefix = self.team_stats[world, team_id], TEAM_ID_TO_NAME[team_id].lower()
+            deaths = int(stats[STAT_SPAWNS] - stats[STAT_AGENTS])
+            initial_armor = self.initial_armor[world, team_id]
+            row.update({
+                f'{prefix}.kills': int(stats[STAT_KILLS]), f'{prefix}.deaths': deaths,
+                f'{prefix}.kill_ratio': stats[STAT_KILLS] / max(1, deaths),
+                f'{prefix}.armor_remaining': stats[STAT_ARMOR] / initial_armor if initial_armor else 0.0,
+                f'{prefix}.agents': int(stats[STAT_AGENTS]),
+            })
+        return row
@@ -0,0 +1,56 @@
+import os
+import json
+import time
+import argparse
+
+from src.batch import plan_workers, create_pool
+from src.columnar import rows_to_columns, write_columns, default_extension
+from src.sweep import build_jobs, run_match, run_batch, summarize_settings
+
+def run_sweep(args):
+    with open(args.spec, 'r') as f: spec = json.load(f)
+    output_root = args.output or spec.get('output_dir') or os.path.join("output", f"sweep_{int(time.time())}")
+    workers, threads_per_worker = plan_workers(args.workers or spec.get('workers'), args.threads_per_worker)
+    jobs = build_jobs(spec)
+    os.makedirs(output_root, exist_ok=True)
+
+    batch_worlds = args.batch_worlds or spec.get('batch_worlds', 1)
+    print(f"Playing {len(jobs)} matches on {workers} workers x {threads_per_worker} threads into {output_root}"
+          f"{f' in batches of {batch_worlds} worlds' if batch_worlds > 1 else ''}")
+    start = time.perf_counter(); last_report = start
+    rows = []
+    if batch_worlds > 1:
+        tasks, entry, chunksize = [jobs[i:i + batch_worlds] for i in range(0, len(jobs), batch_worlds)], run_batch, 1
+    else:
+        # Matches are short, so hand them out in chunks to keep the pool's per-task overhead small
+        tasks, entry, chunksize = jobs, run_match, max(1, min(16, len(jobs) // (workers * 8)))
+    with create_pool(workers, threads_per_worker) as pool:
+        for result in pool.map(entry, tasks, chunksize=chunksize):
+            for row in (result if batch_worlds > 1 else [result]):
+                rows.append(row)
+                if 'error' in row: print(f"[setting {row['setting']} seed {row['seed']}] FAILED: {row['error']}")
+            if time.perf_counter() - last_report >= 5.0 or len(rows) == len(jobs):
+                last_report = time.perf_counter()
+                print(f"{len(rows)}/{len(jobs)} matches, {len(rows) / (last_report - start):.1f} matches/s", flush=True)
+    elapsed = time.perf_counter() - start
+
+    results_path = write_columns(rows_to_columns(rows), os.path.join(output_root, f"results{args.format or default_extension()}"))
+    settings = summarize_settings(jobs, rows)
+    sweep_summary = {'workers': workers, 'threads_per_worker': threads_per_worker, 'wall_seconds': elapsed, 'matches': len(rows),
+                     'failed': sum('error' in row for row in rows), 'results': results_path, 'spec': spec, 'settings': settings}
+    with open(os.path.join(output_root, "sweep_summary.json"), 'w') as f: json.dump(sweep_summary, f, indent=4)
+    print(f"Sweep complete: {len(rows)} matches in {elapsed:.1f}s; results in {results_path}")
+    print("Most balanced settings (then fewest draws, longest matches):")
+    for s in settings[:5]:
+        shares = ' '.join(f"{team}={share:.0%}" for team, share in s['win_share'].items())
+        print(f"  setting {s['setting']}: balance {s['balance']:.2f}, {s['mean_time_to_win_seconds']:.1f}s to win, {shares} draw={s['draw_share']:.0%}  {s['parameters']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play many short headless matches across parameter settings and collect their outcomes.")
+    parser.add_argument('spec', help="JSON sweep spec: {\"method\": \"grid|random|lhs|tournament\", \"params\", \"team_params\", \"strategies\", \"seeds\", \"frames\", ...}")
+    parser.add_argument('--workers', type=int, default=None, help="Processes to run at once (defaults to one per core).")
+    parser.add_argument('--threads-per-worker', type=int, default=None, help="Numba threads per process (defaults to cores / workers).")
+    parser.add_argument('--batch-worlds', type=int, default=None, help="Matches each worker steps together in one WorldBatch (spec 'batch_worlds'; default 1 = one Simulation per match).")
+    parser.add_argument('--output', default=None, help="Output directory.")
+    parser.add_argument('--format', choices=['.parquet', '.npz', '.csv'], default=None, help="Results file format (defaults to Parquet when pyarrow is installed, else NPZ).")
+    run_sweep(parser.parse_args())
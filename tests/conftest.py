@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def make_sim():
+    """Builds a Simulation of the default config and layout without VFX, audio or pheromone colourisation."""
+    from src.headless import load_config
+    from src.simulation import Simulation, NullEffects
+    def make(seed, **overrides):
+        config, _ = load_config(os.path.join(ROOT, 'config.json'), overrides)
+        effects = NullEffects()
+        return Simulation(config, effects, effects, layout_path=os.path.join(ROOT, 'base_layouts.json'), seed=seed, render_pheromones=False)
+    return make
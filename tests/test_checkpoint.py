@@ -0,0 +1,33 @@
+import numpy as np
+
+SAVE_FRAME, END_FRAME = 200, 300 # Combat starts around frame 100
+
+def snapshot(sim):
+    n = sim.agent_count
+    return {
+        'agent_positions': sim.agent_positions[:n].copy(), 'agent_headings': sim.agent_headings[:n].copy(),
+        'agent_teams': sim.agent_teams[:n].copy(), 'pheromone_grids': sim.pheromone_grids.copy(),
+        'render_grid': sim.render_grid.copy(), 'team_stats': sim.team_stats.copy(),
+        'kill_counts': dict(sim.kill_counts), 'winner_info': sim.winner_info, 'frame_count': sim.frame_count,
+    }
+
+def test_restored_run_continues_identically(tmp_path, make_sim):
+    sim = make_sim(seed=7)
+    for frame in range(SAVE_FRAME): sim.step(frame, render=False)
+    path = str(tmp_path / 'checkpoint.npz')
+    sim.save_checkpoint(path, SAVE_FRAME)
+    explosions = 0
+    for frame in range(SAVE_FRAME, END_FRAME):
+        sim.step(frame, render=False); explosions += len(sim.last_explosions)
+    assert explosions > 0 # The compared stretch includes combat
+
+    restored = make_sim(seed=12345) # The checkpoint's seed and RNG state replace this one
+    next_frame = restored.load_checkpoint(path)
+    assert next_frame == SAVE_FRAME
+    for frame in range(next_frame, END_FRAME): restored.step(frame, render=False)
+
+    expected, actual = snapshot(sim), snapshot(restored)
+    assert actual['agent_positions'].shape == expected['agent_positions'].shape
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray): np.testing.assert_array_equal(actual[key], value, err_msg=key)
+        else: assert actual[key] == value, key
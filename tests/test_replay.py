@@ -0,0 +1,31 @@
+import numpy as np
+from src.replay import ReplayRecorder, ReplayReader, EVENT_EXPLOSION
+
+FRAMES = 300 # Combat starts around frame 100
+
+def test_replay_decodes_what_was_recorded(tmp_path, make_sim):
+    sim = make_sim(seed=7)
+    recorder = ReplayRecorder(str(tmp_path / 'replay'), sim, keyframe_interval=32)
+    scale = recorder.meta['position_scale']
+    expected_agents, expected_explosions = [], []
+    for frame in range(FRAMES):
+        sim.step(frame, render=False)
+        recorder.record(sim)
+        n = sim.agent_count
+        expected_agents.append((np.floor(sim.agent_positions[:n] * scale).astype(np.int16), sim.agent_teams[:n].copy()))
+        expected_explosions.append(sim.last_explosions.copy())
+    recorder.close()
+
+    reader = ReplayReader(str(tmp_path / 'replay'))
+    assert len(reader) == FRAMES
+    assert not reader.frames['keyframe'].all() # Deltas between keyframes were exercised
+    assert sum(len(e) for e in expected_explosions) > 0
+    for index, (positions, teams) in enumerate(expected_agents):
+        decoded_positions, decoded_teams = reader.agents(index)
+        np.testing.assert_array_equal(decoded_positions, positions, err_msg=f"frame {index}")
+        np.testing.assert_array_equal(decoded_teams, teams, err_msg=f"frame {index}")
+        events = reader.events(index)
+        explosions = events[events['kind'] == EVENT_EXPLOSION]
+        np.testing.assert_array_equal(np.column_stack((explosions['a'], explosions['b'], explosions['c'])).reshape(-1, 3), expected_explosions[index].reshape(-1, 3))
+    # Random access decodes forward from the nearest keyframe, not from the cached frame
+    np.testing.assert_array_equal(reader.agents(40)[0], expected_agents[40][0])
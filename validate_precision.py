@@ -0,0 +1,40 @@
+import sys
+import json
+import argparse
+
+from src.headless import load_config, parse_override
+
+def run_validation(args):
+    from src.simulation import Simulation, NullEffects
+    from src.precision import validate
+    config, _ = load_config(args.config, {**dict(parse_override(o) for o in args.override), 'pheromone_precision': 'float32'})
+    effects = NullEffects()
+    sim = Simulation(config, effects, effects, layout_path=args.layout, seed=args.seed, render_pheromones=False)
+    print(f"Stepping {args.frames} frames in float32, comparing against float16 pheromones every {args.every} frames...")
+    report = validate(sim, args.frames, args.every, args.seed)
+    for s in report['samples']:
+        print(f"  frame {s['frame']:5d}: {s['agents']:6d} agents, {s['agreement']:.4%} same steering, "
+              f"storage error {s['storage_error']:.2e}, update error {s['update_error']:.2e}")
+    print(f"Steering agreement: {report['agreement']:.4%} of {report['decisions']} decisions "
+          f"({', '.join(f'{team} {share:.3%}' for team, share in report['agreement_by_team'].items())})")
+    print(f"Largest error relative to the grid peak: storage {report['max_storage_error']:.2e}, one update {report['max_update_error']:.2e}")
+    if report['float32_update_ms'] is not None:
+        print(f"Pheromone update of the live grids: float32 {report['float32_update_ms']:.2f} ms, float16 {report['float16_update_ms']:.2f} ms")
+    print(f"Pheromone grids: float32 {report['float32_mb']:.1f} MB, float16 {report['float16_mb']:.1f} MB")
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=4)
+    if report['agreement'] < args.min_agreement:
+        print(f"FAILED: steering agreement below {args.min_agreement:.2%}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check that float16 pheromone storage (engine_settings.pheromone_precision) steers agents like float32.")
+    parser.add_argument('--layout', default='base_layouts.json', help="Layout to play.")
+    parser.add_argument('--frames', type=int, default=900, help="Frames to simulate.")
+    parser.add_argument('--every', type=int, default=60, help="Compare every N frames.")
+    parser.add_argument('--seed', type=int, default=1, help="Simulation seed.")
+    parser.add_argument('--min-agreement', type=float, default=0.99, help="Exit 1 when fewer steering decisions than this share agree.")
+    parser.add_argument('--config', default='config.json', help="Path to the config file.")
+    parser.add_argument('--override', action='append', default=[], metavar='KEY=VALUE', help="Override any config value, e.g. --override pheromone_blur_sigma=1.5")
+    parser.add_argument('--output', default=None, help="Also write the report to this JSON file.")
+    run_validation(parser.parse_args())